@@ -7,9 +7,43 @@ from functools import wraps
 from django.conf import settings
 from django.db import connection, reset_queries
 from django.core.cache import cache
+from django.dispatch import Signal
 
 logger = logging.getLogger(__name__)
 
+# Sent with (sender=<view class>, event=<str>, data=<dict>) by instrument()
+debug_event = Signal()
+
+
+def instrumentation_enabled():
+    """
+    Return True if structured debug instrumentation is switched on.
+    Controlled by settings.DEBUG_INSTRUMENTATION (off by default).
+    """
+    return getattr(settings, 'DEBUG_INSTRUMENTATION', False)
+
+
+def instrument(sender, event, **data):
+    """
+    Emit a structured debug event from a view.
+    
+    Does nothing unless instrumentation is enabled. When enabled the event is
+    logged at DEBUG level with the data attached as ``extra`` and sent through
+    the ``debug_event`` signal for any other listeners. Callers should only
+    pass values they have already computed so a disabled hook costs nothing.
+    """
+    if not instrumentation_enabled():
+        return
+    name = getattr(sender, '__name__', type(sender).__name__)
+    logger.debug(
+        "%s.%s %s",
+        name,
+        event,
+        ' '.join(f"{key}={value}" for key, value in data.items()),
+        extra={'event': event, 'data': data}
+    )
+    debug_event.send(sender=sender, event=event, data=data)
+
 def query_debugger(func):
     """
     Decorator to log SQL queries and execution time for a function.
@@ -32,6 +32,9 @@ SECRET_KEY = 'django-insecure-your-secret-key-here'  # Change this in production
 # Debug settings
 DEBUG = os.environ.get('DJANGO_DEBUG', 'False') == 'True'
 
+# Structured view debug events (angels_plants.performance.instrument)
+DEBUG_INSTRUMENTATION = os.environ.get('DJANGO_DEBUG_INSTRUMENTATION', 'False') == 'True'
+
 # Security settings
 ALLOWED_HOSTS = ['nithinrichard.pythonanywhere.com', 'www.angel-plants.com', 'localhost', '127.0.0.1']
 CSRF_COOKIE_SECURE = not DEBUG
@@ -73,6 +76,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'store.middleware.CartSnapshotMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -118,6 +122,37 @@ DATABASES = {
     }
 }
 
+# A second connection to the same database for reserving order number
+# blocks (store.sequences), so each reservation commits on its own instead
+# of keeping the counter row locked until the checkout transaction ends
+DATABASES['sequences'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+NUMBER_SEQUENCE_DATABASE = 'sequences'
+
+# Cache
+# The store's caches (catalog, blog, objects, facets, recommendations,
+# wishlist counts) are invalidated by deleting keys and bumping version keys.
+# That only reaches every worker process and management command if they all
+# share one cache, so never use a per-process backend (LocMemCache) here.
+# Use Redis when REDIS_URL is set, otherwise the database cache table
+# (created by `python manage.py createcachetable` in build.sh).
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'angels_plants',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'KEY_PREFIX': 'angels_plants',
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
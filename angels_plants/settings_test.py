@@ -11,6 +11,9 @@ DATABASES = {
     }
 }
 
+# A single in-memory connection, so reserve sequence blocks on it too
+NUMBER_SEQUENCE_DATABASE = 'default'
+
 # Disable password hashing for faster tests
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
@@ -48,3 +51,11 @@ EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 RAZORPAY_KEY_ID = 'test_key_id'
 RAZORPAY_KEY_SECRET = 'test_key_secret'
 RAZORPAY_WEBHOOK_SECRET = 'test_webhook_secret'
+
+# Keep the product search index out of the project directory
+import os
+import tempfile
+SEARCH_INDEX_PATH = os.path.join(tempfile.gettempdir(), 'angels_plants_test_search.sqlite3')
+
+# Rendered invoice PDFs
+INVOICE_ROOT = os.path.join(tempfile.gettempdir(), 'angels_plants_test_invoices')
@@ -38,6 +38,14 @@ python manage.py collectstatic --noinput --clear
 echo "Running database migrations..."
 python manage.py migrate --noinput
 
+# Shared cache table, used when REDIS_URL is not set
+echo "Creating cache table..."
+python manage.py createcachetable
+
+# Build the product search index; searches use the database until it exists
+echo "Building search index..."
+python manage.py rebuild_search_index
+
 # Create superuser (uncomment and modify as needed)
 # echo "from django.contrib.auth import get_user_model; User = get_user_model(); User.objects.create_superuser('admin', 'admin@example.com', 'password') if not User.objects.filter(username='admin').exists() else None" | python manage.py shell
 
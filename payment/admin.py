@@ -1,3 +1,19 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ReconciliationCheckpoint, WebhookEvent
+
+
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'event', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['status', 'event']
+    search_fields = ['event_id']
+    readonly_fields = ['received_at', 'processed_at', 'last_error']
+
+
+class ReconciliationCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['name', 'position', 'updated_at']
+    readonly_fields = ['updated_at']
+
+
+admin.site.register(WebhookEvent, WebhookEventAdmin)
+admin.site.register(ReconciliationCheckpoint, ReconciliationCheckpointAdmin)
@@ -0,0 +1,229 @@
+"""
+Shared Razorpay API client for the store and payment apps.
+
+``get_gateway_client()`` returns one process-wide ``razorpay.Client`` built
+on a ``GatewaySession``: a pooled, keep-alive ``requests.Session`` that
+applies a default (connect, read) timeout to every call, retries transient
+failures a bounded number of times with jittered exponential backoff, and
+records per-endpoint latency in ``gateway_metrics``.
+
+Only requests that cannot have been applied twice are retried: any call
+whose connection was never established, or that Razorpay rejected with 429,
+and idempotent (GET) calls after a read timeout or a 5xx response.
+
+Settings (all optional):
+    RAZORPAY_API_BASE_URL     API root, e.g. a local stand-in in tests
+    RAZORPAY_CONNECT_TIMEOUT  seconds to establish a connection (3.05)
+    RAZORPAY_READ_TIMEOUT     seconds to wait for a response (10)
+    RAZORPAY_MAX_RETRIES      retries after the first attempt (2)
+    RAZORPAY_RETRY_BACKOFF    base backoff in seconds (0.25)
+    RAZORPAY_POOL_SIZE        pooled connections per host (10)
+    RAZORPAY_SLOW_CALL_MS     calls slower than this are logged (2000)
+"""
+import logging
+import random
+import re
+import threading
+import time
+
+import razorpay
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from urllib3.exceptions import NewConnectionError
+
+from angels_plants.performance import instrument
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+# Razorpay IDs ("pay_Ab12", "order_Xy34") are collapsed in metric labels
+ID_SEGMENT_RE = re.compile(r'/[a-z]+_[A-Za-z0-9]+')
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+
+class GatewayMetrics:
+    """
+    Thread-safe call counts and latency per gateway endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, label, seconds, ok, retries):
+        with self._lock:
+            stats = self._stats.setdefault(label, {
+                'calls': 0, 'errors': 0, 'retries': 0, 'total_ms': 0.0, 'max_ms': 0.0
+            })
+            ms = seconds * 1000
+            stats['calls'] += 1
+            stats['errors'] += 0 if ok else 1
+            stats['retries'] += retries
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+
+    def snapshot(self):
+        """
+        Return {label: stats} with an added 'avg_ms' per endpoint.
+        """
+        with self._lock:
+            return {
+                label: dict(stats, avg_ms=stats['total_ms'] / stats['calls'])
+                for label, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+gateway_metrics = GatewayMetrics()
+
+
+class GatewaySession(requests.Session):
+    """
+    requests.Session with pooling, default timeouts and bounded retries.
+    """
+
+    def __init__(self, timeout=(3.05, 10), max_retries=2, backoff=0.25, max_backoff=2.0, pool_size=10):
+        super().__init__()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # Retries are handled in request() so the policy sees the method
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def _should_retry(self, method, error=None, response=None):
+        if error is not None:
+            if isinstance(error, requests.exceptions.ConnectTimeout):
+                return True
+            # Connection refused/unreachable: nothing reached the gateway
+            reason = getattr(error.args[0], 'reason', None) if error.args else None
+            if isinstance(reason, NewConnectionError):
+                return True
+            return method in IDEMPOTENT_METHODS and isinstance(
+                error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+            )
+        if response.status_code == 429:
+            return True
+        return method in IDEMPOTENT_METHODS and response.status_code in RETRY_STATUSES
+
+    def _sleep(self, attempt):
+        # Full jitter keeps workers that failed together from retrying together
+        time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt))))
+
+    def request(self, method, url, *args, **kwargs):
+        method = method.upper()
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        label = f"{method} {ID_SEGMENT_RE.sub('/:id', urlsplit(url).path)}"
+
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            error = response = None
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except requests.exceptions.RequestException as e:
+                error = e
+            retry = attempt < self.max_retries and self._should_retry(method, error, response)
+            if not retry:
+                break
+            logger.warning(
+                f"Retrying {label} after "
+                f"{type(error).__name__ if error else f'HTTP {response.status_code}'} (attempt {attempt + 1})"
+            )
+            if response is not None:
+                response.close()
+            self._sleep(attempt)
+            attempt += 1
+
+        elapsed = time.perf_counter() - start
+        ok = error is None and response.status_code < 500
+        gateway_metrics.record(label, elapsed, ok, attempt)
+        instrument(GatewaySession, 'gateway_call', endpoint=label, ms=round(elapsed * 1000, 1), retries=attempt, ok=ok)
+        if elapsed * 1000 > getattr(settings, 'RAZORPAY_SLOW_CALL_MS', 2000):
+            logger.warning(f"Slow payment gateway call {label}: {elapsed * 1000:.0f}ms ({attempt} retries)")
+
+        if error is not None:
+            raise error
+        return response
+
+
+def _settings_key():
+    return (
+        getattr(settings, 'RAZORPAY_KEY_ID', ''),
+        getattr(settings, 'RAZORPAY_KEY_SECRET', ''),
+        getattr(settings, 'RAZORPAY_API_BASE_URL', None),
+        getattr(settings, 'RAZORPAY_CONNECT_TIMEOUT', 3.05),
+        getattr(settings, 'RAZORPAY_READ_TIMEOUT', 10),
+        getattr(settings, 'RAZORPAY_MAX_RETRIES', 2),
+        getattr(settings, 'RAZORPAY_RETRY_BACKOFF', 0.25),
+        getattr(settings, 'RAZORPAY_POOL_SIZE', 10),
+    )
+
+
+def is_gateway_configured():
+    """Return True if Razorpay API keys are set."""
+    key_id, key_secret = _settings_key()[:2]
+    return bool(
+        isinstance(key_id, str) and key_id.strip()
+        and isinstance(key_secret, str) and key_secret.strip()
+    )
+
+
+def get_gateway_client():
+    """
+    Return the shared Razorpay client, building it on first use.
+
+    The client is rebuilt if the Razorpay settings change (e.g. in tests).
+
+    Raises:
+        ImproperlyConfigured: if the API keys are not set
+    """
+    global _client, _client_key
+    key = _settings_key()
+    if _client is not None and _client_key == key:
+        return _client
+
+    with _client_lock:
+        if _client is not None and _client_key == key:
+            return _client
+        if not is_gateway_configured():
+            raise ImproperlyConfigured("RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET must be set in settings")
+
+        key_id, key_secret, base_url, connect_timeout, read_timeout, max_retries, backoff, pool_size = key
+        session = GatewaySession(
+            timeout=(connect_timeout, read_timeout),
+            max_retries=max_retries,
+            backoff=backoff,
+            pool_size=pool_size
+        )
+        options = {'base_url': base_url} if base_url else {}
+        old_client = _client
+        _client = razorpay.Client(session=session, auth=(key_id, key_secret), **options)
+        _client_key = key
+        if old_client is not None:
+            old_client.session.close()
+        logger.info("Initialized Razorpay gateway client")
+        return _client
+
+
+def reset_gateway_client():
+    """Close the shared client's connections; the next call builds a new one."""
+    global _client, _client_key
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+        _client = _client_key = None
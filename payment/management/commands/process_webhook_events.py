@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payment.webhooks import process_webhook_events
+
+
+class Command(BaseCommand):
+    help = 'Process queued Razorpay webhook events from the webhook inbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Maximum number of events to process per batch'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the inbox instead of exiting after one pass'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the inbox is empty (with --loop)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is due before sleeping
+            while True:
+                counts = process_webhook_events(batch_size=options['batch_size'])
+                if any(counts.values()):
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Processed {counts['processed']} webhook events "
+                        f"({counts['ignored']} ignored, {counts['retried']} to retry, {counts['failed']} failed)"
+                    ))
+                if sum(counts.values()) < options['batch_size']:
+                    break
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,66 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from payment.reconciliation import MAX_PAGE_SIZE, reconcile_payments
+
+
+def _parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date or datetime: {value}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = 'Mark unpaid orders paid from the payments captured at Razorpay'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Start of the range (YYYY-MM-DD or ISO datetime); defaults to the last checkpoint'
+        )
+        parser.add_argument(
+            '--until',
+            help='End of the range, exclusive; defaults to RECONCILE_DELAY ago'
+        )
+        parser.add_argument(
+            '--window-hours',
+            type=float,
+            help='Hours of payments applied per transaction'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=MAX_PAGE_SIZE,
+            help=f'Payments fetched per API call (at most {MAX_PAGE_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many orders would be marked paid without changing anything'
+        )
+
+    def handle(self, *args, **options):
+        if options['window_hours'] is not None and options['window_hours'] <= 0:
+            raise CommandError('--window-hours must be positive')
+
+        counts = reconcile_payments(
+            start=_parse_moment(options['since']) if options['since'] else None,
+            end=_parse_moment(options['until']) if options['until'] else None,
+            window=timedelta(hours=options['window_hours']) if options['window_hours'] else None,
+            page_size=options['page_size'],
+            dry_run=options['dry_run']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would mark' if options['dry_run'] else 'Marked'} {counts['reconciled']} orders paid "
+            f"({counts['payments']} payments fetched, {counts['captured']} captured, "
+            f"{counts['windows']} windows up to {counts['position']:%Y-%m-%d %H:%M})"
+        ))
@@ -1,3 +1,69 @@
 from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class WebhookEvent(models.Model):
+    """
+    Razorpay webhook delivery waiting to be processed.
+    
+    The webhook view only verifies the signature and inserts a row keyed by
+    Razorpay's event ID, so redelivered events are stored once. The
+    process_webhook_events worker applies them, retrying failures with
+    exponential backoff.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        PROCESSING = 'processing', _('Processing')
+        PROCESSED = 'processed', _('Processed')
+        IGNORED = 'ignored', _('Ignored')
+        FAILED = 'failed', _('Failed')
+    
+    event_id = models.CharField(_('event ID'), max_length=100, unique=True)
+    event = models.CharField(_('event'), max_length=100)
+    payload = models.JSONField(_('payload'), default=dict)
+    status = models.CharField(
+        _('status'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(_('attempts'), default=0)
+    next_attempt_at = models.DateTimeField(
+        _('next attempt at'),
+        default=timezone.now,
+        help_text=_('When the event is next due; also the lease expiry while processing')
+    )
+    last_error = models.TextField(_('last error'), blank=True)
+    received_at = models.DateTimeField(_('received at'), auto_now_add=True)
+    processed_at = models.DateTimeField(_('processed at'), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('webhook event')
+        verbose_name_plural = _('webhook events')
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event} {self.event_id} ({self.get_status_display()})"
+
+
+class ReconciliationCheckpoint(models.Model):
+    """
+    How far a payment reconciliation job has read the gateway's payments.
+    
+    Everything created before ``position`` has been matched against the
+    store's orders, so the next run resumes from there.
+    """
+    name = models.CharField(_('name'), max_length=50, unique=True)
+    position = models.DateTimeField(_('position'))
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('reconciliation checkpoint')
+        verbose_name_plural = _('reconciliation checkpoints')
+    
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
@@ -0,0 +1,211 @@
+"""
+Bulk reconciliation of Razorpay payments against unpaid orders.
+
+Orders whose webhook never arrived stay unpaid. ``reconcile_payments()``
+pages through the payments Razorpay created in a time range (100 per API
+call), matches the captured ones to unpaid orders with one indexed lookup
+per window, and marks those orders paid with ``bulk_update``. Each window
+is applied in one transaction together with the checkpoint, so an
+interrupted run resumes after the last finished window.
+
+Run nightly with ``python manage.py reconcile_payments``.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from store import invoices, sales_rollups
+from store.models import Order, OrderActivity, OrderStatusUpdate, Payment
+from store.order_transitions import OrderTransition
+
+from .gateway import get_gateway_client
+from .models import ReconciliationCheckpoint
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'razorpay_payments'
+
+# Largest page the Razorpay payments API returns
+MAX_PAGE_SIZE = 100
+
+ORDER_FIELDS = ['payment_status', 'payment_id', 'status', 'status_changed', 'updated_at']
+PAYMENT_FIELDS = ['payment_id', 'transaction_id', 'amount', 'payment_method', 'status', 'payment_gateway_response']
+
+
+def fetch_gateway_payments(start, end, page_size=MAX_PAGE_SIZE):
+    """
+    Yield the Razorpay payments created in [start, end), a page at a time.
+
+    Args:
+        start: aware datetime
+        end: aware datetime
+        page_size: payments per API call (at most 100)
+    """
+    client = get_gateway_client()
+    page_size = min(page_size, MAX_PAGE_SIZE)
+    skip = 0
+    while True:
+        page = client.payment.all({
+            'from': int(start.timestamp()),
+            # 'to' is inclusive in the API
+            'to': int(end.timestamp()) - 1,
+            'count': page_size,
+            'skip': skip,
+        })
+        items = page.get('items') or []
+        yield from items
+        if len(items) < page_size:
+            return
+        skip += len(items)
+
+
+def _amount(paise):
+    return Decimal(paise or 0) / 100
+
+
+def _payment_defaults(payment):
+    return {
+        'payment_id': payment['id'],
+        'transaction_id': payment['id'],
+        'amount': _amount(payment.get('amount')),
+        'payment_method': (payment.get('method') or 'razorpay')[:20],
+        'status': 'completed',
+        'payment_gateway_response': payment,
+    }
+
+
+def apply_captured_payments(payments):
+    """
+    Mark the unpaid orders of captured payments as paid.
+
+    Must run inside a transaction. Writes the orders, their Payment rows
+    and status history in bulk, then applies the changes the Order
+    post_save signals would have made (sales rollups, invoice rendering).
+
+    Args:
+        payments: Razorpay payment dicts
+
+    Returns:
+        list: the orders marked paid
+    """
+    by_order_id = {}
+    for payment in payments:
+        if payment.get('status') == 'captured' and payment.get('order_id'):
+            by_order_id.setdefault(payment['order_id'], payment)
+    if not by_order_id:
+        return []
+
+    orders = list(
+        Order.objects.select_for_update().filter(
+            razorpay_order_id__in=list(by_order_id),
+            payment_status=False
+        )
+    )
+    if not orders:
+        return []
+
+    now = timezone.now()
+    status_updates, activities = [], []
+    for order in orders:
+        payment = by_order_id[order.razorpay_order_id]
+        transition = OrderTransition(order, note=f"Payment {payment['id']} captured (reconciled)")
+        transition.set(payment_status=True, payment_id=payment['id'])
+        if order.status == Order.Status.PENDING:
+            # bulk_update skips Order.save(), which stamps status changes
+            transition.set(status=Order.Status.PROCESSING, status_changed=now)
+        order_updates, order_activities = transition.history()
+        status_updates += order_updates
+        activities += order_activities
+        order.updated_at = now
+
+    Order.objects.bulk_update(orders, ORDER_FIELDS)
+    OrderStatusUpdate.objects.bulk_create(status_updates)
+    OrderActivity.objects.bulk_create(activities)
+
+    existing = {p.order_id: p for p in Payment.objects.filter(order__in=orders)}
+    created, updated = [], []
+    for order in orders:
+        defaults = _payment_defaults(by_order_id[order.razorpay_order_id])
+        if order.pk in existing:
+            row = existing[order.pk]
+            for name, value in defaults.items():
+                setattr(row, name, value)
+            updated.append(row)
+        else:
+            created.append(Payment(order=order, **defaults))
+    Payment.objects.bulk_update(updated, PAYMENT_FIELDS)
+    Payment.objects.bulk_create(created)
+
+    for order in orders:
+        # bulk_update skips post_save; the trackers still hold the old values
+        sales_rollups.record_order_saved(order, False, ORDER_FIELDS)
+        invoices.schedule_invoice(order.pk)
+    return orders
+
+
+def get_checkpoint():
+    """Return the position the next run starts from, or None if it never ran."""
+    return ReconciliationCheckpoint.objects.filter(name=CHECKPOINT_NAME).values_list('position', flat=True).first()
+
+
+def reconcile_payments(start=None, end=None, window=None, page_size=MAX_PAGE_SIZE, dry_run=False):
+    """
+    Reconcile the gateway's payments created in [start, end) with our orders.
+
+    Args:
+        start: defaults to the checkpoint, or RECONCILE_LOOKBACK (2 days) ago
+        end: defaults to RECONCILE_DELAY (15 minutes) ago, leaving recent
+            payments to their webhooks
+        window: timedelta covered per transaction (RECONCILE_WINDOW, 6 hours)
+        page_size: payments per API call
+        dry_run: report matches without writing anything
+
+    Returns:
+        dict: counts of 'windows', 'payments', 'captured' and 'reconciled',
+        and the 'position' reached
+    """
+    now = timezone.now()
+    if end is None:
+        end = now - timedelta(seconds=getattr(settings, 'RECONCILE_DELAY', 15 * 60))
+    if start is None:
+        start = get_checkpoint() or now - timedelta(seconds=getattr(settings, 'RECONCILE_LOOKBACK', 2 * 24 * 60 * 60))
+    if window is None:
+        window = timedelta(seconds=getattr(settings, 'RECONCILE_WINDOW', 6 * 60 * 60))
+
+    counts = {'windows': 0, 'payments': 0, 'captured': 0, 'reconciled': 0, 'position': start}
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + window, end)
+        # Fetch outside the transaction so no locks are held during API calls
+        payments = list(fetch_gateway_payments(window_start, window_end, page_size))
+        captured = [p for p in payments if p.get('status') == 'captured']
+
+        if dry_run:
+            reconciled = Order.objects.filter(
+                razorpay_order_id__in={p['order_id'] for p in captured if p.get('order_id')},
+                payment_status=False
+            ).count()
+        else:
+            with transaction.atomic():
+                reconciled = len(apply_captured_payments(captured))
+                ReconciliationCheckpoint.objects.update_or_create(
+                    name=CHECKPOINT_NAME, defaults={'position': window_end}
+                )
+
+        counts['windows'] += 1
+        counts['payments'] += len(payments)
+        counts['captured'] += len(captured)
+        counts['reconciled'] += reconciled
+        counts['position'] = window_end
+        window_start = window_end
+
+    logger.info(
+        f"Reconciled payments up to {counts['position']}: {counts['payments']} fetched, "
+        f"{counts['captured']} captured, {counts['reconciled']} orders marked paid"
+        f"{' (dry run)' if dry_run else ''}"
+    )
+    return counts
@@ -0,0 +1,107 @@
+"""
+Tests for the shared Razorpay gateway client.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import razorpay
+import requests
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from payment.gateway import gateway_metrics, get_gateway_client, reset_gateway_client
+
+
+class GatewayStubHandler(BaseHTTPRequestHandler):
+    """Replays the server's ``responses`` queue as (status, delay) pairs."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.server.calls.append((self.command, self.path, self.client_address[1]))
+        status, delay = self.server.responses.pop(0) if self.server.responses else (200, 0)
+        time.sleep(delay)
+        body = json.dumps({'id': 'pay_test123', 'status': 'captured'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+class GatewayClientTest(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), GatewayStubHandler)
+        self.server.daemon_threads = True
+        self.server.calls = []
+        self.server.responses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        settings_override = override_settings(
+            RAZORPAY_KEY_ID='rzp_test_key',
+            RAZORPAY_KEY_SECRET='rzp_test_secret',
+            RAZORPAY_API_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}',
+            RAZORPAY_READ_TIMEOUT=0.5,
+            RAZORPAY_MAX_RETRIES=2,
+            RAZORPAY_RETRY_BACKOFF=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(reset_gateway_client)
+        gateway_metrics.reset()
+
+    def test_client_is_shared_and_reuses_its_connection(self):
+        client = get_gateway_client()
+        self.assertIs(get_gateway_client(), client)
+
+        client.payment.fetch('pay_test123')
+        client.payment.fetch('pay_test456')
+
+        self.assertEqual(len(self.server.calls), 2)
+        self.assertEqual(len({port for _, _, port in self.server.calls}), 1)
+        stats = gateway_metrics.snapshot()['GET /v1/payments/:id']
+        self.assertEqual((stats['calls'], stats['errors'], stats['retries']), (2, 0, 0))
+
+    def test_idempotent_calls_are_retried(self):
+        self.server.responses = [(503, 0), (200, 0)]
+
+        self.assertEqual(get_gateway_client().payment.fetch('pay_test123')['status'], 'captured')
+
+        self.assertEqual(len(self.server.calls), 2)
+        self.assertEqual(gateway_metrics.snapshot()['GET /v1/payments/:id']['retries'], 1)
+
+    def test_writes_are_not_retried_on_server_errors(self):
+        self.server.responses = [(503, 0), (200, 0)]
+
+        with self.assertRaises(razorpay.errors.ServerError):
+            get_gateway_client().order.create({'amount': 50000, 'currency': 'INR'})
+
+        self.assertEqual([call[0] for call in self.server.calls], ['POST'])
+        self.assertEqual(gateway_metrics.snapshot()['POST /v1/orders']['errors'], 1)
+
+    def test_hung_gateway_times_out(self):
+        self.server.responses = [(200, 1), (200, 1), (200, 1)]
+
+        start = time.monotonic()
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            get_gateway_client().payment.fetch('pay_test123')
+
+        self.assertLess(time.monotonic() - start, 3)
+        self.assertEqual(len(self.server.calls), 3)
+
+    @override_settings(RAZORPAY_KEY_ID='')
+    def test_missing_keys(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_gateway_client()
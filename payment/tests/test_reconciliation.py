@@ -0,0 +1,142 @@
+"""
+Tests for bulk payment reconciliation.
+"""
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from payment.gateway import reset_gateway_client
+from payment.models import ReconciliationCheckpoint
+from payment.reconciliation import reconcile_payments
+from store.models import DailySales, Order, OrderStatusUpdate, Payment
+
+
+class PaymentListHandler(BaseHTTPRequestHandler):
+    """Serves GET /v1/payments from the server's ``payments`` list."""
+
+    def do_GET(self):
+        query = {name: int(values[0]) for name, values in parse_qs(urlsplit(self.path).query).items()}
+        self.server.queries.append(query)
+        matching = [
+            p for p in self.server.payments
+            if query['from'] <= p['created_at'] <= query['to']
+        ]
+        items = matching[query['skip']:query['skip'] + query['count']]
+        body = json.dumps({'entity': 'collection', 'count': len(items), 'items': items}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ReconcilePaymentsTest(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), PaymentListHandler)
+        self.server.daemon_threads = True
+        self.server.payments = []
+        self.server.queries = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        settings_override = override_settings(
+            RAZORPAY_API_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}'
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(reset_gateway_client)
+
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=12)
+        self.end = self.start + timedelta(hours=12)
+        self.unpaid = self._order('order_lost_webhook')
+        self.paid = self._order('order_already_paid', payment_status=True)
+        self.abandoned = self._order('order_abandoned')
+
+        self._payment('pay_1', 'order_lost_webhook', 'captured', hours=1)
+        self._payment('pay_2', 'order_already_paid', 'captured', hours=2)
+        self._payment('pay_3', 'order_abandoned', 'failed', hours=3)
+        self._payment('pay_4', 'order_not_ours', 'captured', hours=7)
+
+    def _order(self, razorpay_order_id, **fields):
+        return Order.objects.create(
+            first_name='Test',
+            last_name='User',
+            email='buyer@example.com',
+            address='123 Test St',
+            postal_code='12345',
+            city='Test City',
+            state='Kerala',
+            total_amount=500,
+            razorpay_order_id=razorpay_order_id,
+            **fields
+        )
+
+    def _payment(self, payment_id, order_id, status, hours):
+        self.server.payments.append({
+            'id': payment_id,
+            'order_id': order_id,
+            'status': status,
+            'amount': 50000,
+            'method': 'upi',
+            'created_at': int((self.start + timedelta(hours=hours)).timestamp()),
+        })
+
+    def test_captured_payments_mark_unpaid_orders_paid(self):
+        status_changed = self.unpaid.status_changed
+        counts = reconcile_payments(self.start, self.end, window=timedelta(hours=6), page_size=2)
+
+        self.assertEqual(
+            {name: counts[name] for name in ('windows', 'payments', 'captured', 'reconciled')},
+            {'windows': 2, 'payments': 4, 'captured': 3, 'reconciled': 1}
+        )
+        # First window pages through three payments two at a time
+        self.assertEqual([q['skip'] for q in self.server.queries], [0, 2, 0])
+
+        self.unpaid.refresh_from_db()
+        self.assertTrue(self.unpaid.payment_status)
+        self.assertEqual((self.unpaid.payment_id, self.unpaid.status), ('pay_1', Order.Status.PROCESSING))
+        self.assertGreater(self.unpaid.status_changed, status_changed)
+        payment = Payment.objects.get(order=self.unpaid)
+        self.assertEqual((payment.payment_id, str(payment.amount), payment.status), ('pay_1', '500.00', 'completed'))
+        self.assertEqual(OrderStatusUpdate.objects.filter(order=self.unpaid).count(), 1)
+        self.assertEqual(
+            DailySales.objects.get(status=Order.Status.PROCESSING).order_count, 1
+        )
+
+        self.abandoned.refresh_from_db()
+        self.assertFalse(self.abandoned.payment_status)
+        self.assertEqual(ReconciliationCheckpoint.objects.get().position, self.end)
+
+    def test_next_run_resumes_from_checkpoint(self):
+        reconcile_payments(self.start, self.end)
+        self.server.queries.clear()
+
+        counts = reconcile_payments(end=self.end + timedelta(hours=1))
+
+        self.assertEqual(counts['reconciled'], 0)
+        self.assertEqual(self.server.queries[0]['from'], int(self.end.timestamp()))
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command(
+            'reconcile_payments', '--dry-run',
+            '--since', self.start.isoformat(), '--until', self.end.isoformat(),
+            stdout=out
+        )
+
+        self.assertIn('Would mark 1 orders paid (4 payments fetched', out.getvalue())
+        self.unpaid.refresh_from_db()
+        self.assertFalse(self.unpaid.payment_status)
+        self.assertFalse(ReconciliationCheckpoint.objects.exists())
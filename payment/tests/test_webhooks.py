@@ -0,0 +1,144 @@
+"""
+Tests for the Razorpay webhook inbox.
+"""
+import hashlib
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from payment.models import WebhookEvent
+from payment.utils import razorpay_client
+from payment.webhooks import process_webhook_events
+from store.models import Order, OrderStatusUpdate, Payment
+
+WEBHOOK_SECRET = 'test_webhook_secret'
+
+
+class RazorpayStubHandler(BaseHTTPRequestHandler):
+    """Answers GET /v1/payments/<id> from the server's ``payments`` dict."""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        payment_id = self.path.rstrip('/').rsplit('/', 1)[-1]
+        payment = self.server.payments.get(payment_id)
+        status = 200 if payment else 404
+        body = json.dumps(payment or {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'not found'}})
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookInboxTest(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), RazorpayStubHandler)
+        self.server.daemon_threads = True
+        self.server.payments = {}
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        settings_override = override_settings(
+            RAZORPAY_WEBHOOK_SECRET=WEBHOOK_SECRET,
+            RAZORPAY_API_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}'
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        razorpay_client.client = None
+        self.addCleanup(setattr, razorpay_client, 'client', None)
+
+        self.order = Order.objects.create(
+            first_name='Test',
+            last_name='User',
+            email='buyer@example.com',
+            address='123 Test St',
+            postal_code='12345',
+            city='Test City',
+            state='Kerala',
+            razorpay_order_id='order_test123',
+        )
+        self.client = Client()
+
+    def _post(self, payload, event_id='evt_1', secret=WEBHOOK_SECRET):
+        body = json.dumps(payload).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            reverse('payment:payment_webhook'),
+            data=body,
+            content_type='application/json',
+            HTTP_X_RAZORPAY_SIGNATURE=signature,
+            HTTP_X_RAZORPAY_EVENT_ID=event_id,
+            secure=True,
+        )
+
+    def _captured(self, payment_id='pay_test123'):
+        return {
+            'event': 'payment.captured',
+            'payload': {'payment': {'entity': {
+                'id': payment_id, 'order_id': 'order_test123', 'amount': 50000, 'status': 'captured',
+            }}},
+        }
+
+    def test_webhook_is_stored_once_without_processing(self):
+        response = self._post(self._captured())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'queued'})
+        self.assertEqual(self._post(self._captured()).json(), {'status': 'duplicate'})
+
+        self.assertEqual(WebhookEvent.objects.get().event, 'payment.captured')
+        self.assertEqual(self.server.requests, [])
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.payment_status)
+
+    def test_invalid_signature_is_rejected(self):
+        response = self._post(self._captured(), secret='wrong')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_worker_verifies_with_gateway_and_marks_order_paid(self):
+        self.server.payments['pay_test123'] = {
+            'id': 'pay_test123', 'order_id': 'order_test123', 'amount': 50000, 'status': 'captured', 'method': 'upi',
+        }
+        self._post(self._captured())
+        self._post({'event': 'order.paid', 'payload': {
+            'order': {'entity': {'id': 'order_test123'}},
+            'payment': {'entity': {'id': 'pay_test123'}},
+        }}, event_id='evt_2')
+
+        out = StringIO()
+        call_command('process_webhook_events', stdout=out)
+
+        self.assertIn('Processed 1 webhook events (1 ignored', out.getvalue())
+        self.assertEqual(self.server.requests, ['/v1/payments/pay_test123'])
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.payment_status)
+        self.assertEqual(self.order.status, Order.Status.PROCESSING)
+        payment = Payment.objects.get(order=self.order)
+        self.assertEqual((payment.payment_id, str(payment.amount), payment.status), ('pay_test123', '500.00', 'completed'))
+        self.assertEqual(OrderStatusUpdate.objects.filter(order=self.order).count(), 1)
+        self.assertFalse(WebhookEvent.objects.exclude(status__in=['processed', 'ignored']).exists())
+
+    def test_gateway_errors_are_retried(self):
+        # The stub does not know this payment, so verification fails
+        self._post(self._captured('pay_unknown'))
+
+        self.assertEqual(process_webhook_events(max_attempts=2)['retried'], 1)
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), (WebhookEvent.Status.PENDING, 1))
+        self.assertNotEqual(event.last_error, '')
+
+        WebhookEvent.objects.update(next_attempt_at=event.received_at)
+        self.assertEqual(process_webhook_events(max_attempts=2)['failed'], 1)
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.payment_status)
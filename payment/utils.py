@@ -1,14 +1,16 @@
-import razorpay
+import hashlib
+import hmac
 import logging
 import os
 import json
 import uuid
 from functools import lru_cache
-from django.conf import settings
 from django.http import JsonResponse, HttpResponseServerError
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ImproperlyConfigured
 
+from .gateway import get_gateway_client
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -28,43 +30,18 @@ class RazorpayClient:
             self._initialized = True
     
     def get_client(self):
-        if self.client is not None:
-            return self.client
-            
-        logger.info("Initializing Razorpay client...")
-        
-        # Get keys from Django settings
-        razorpay_key_id = getattr(settings, 'RAZORPAY_KEY_ID', '')
-        razorpay_key_secret = getattr(settings, 'RAZORPAY_KEY_SECRET', '')
-        
-        # Debug logging
-        logger.debug(f"RAZORPAY_KEY_ID from settings: {'set' if razorpay_key_id else 'not set'}")
-        
-        # Validate keys
-        if not razorpay_key_id or not razorpay_key_secret:
-            error_msg = "RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET must be set in settings"
-            logger.critical(error_msg)
-            raise ImproperlyConfigured(error_msg)
-            
-        if not isinstance(razorpay_key_id, str) or not razorpay_key_id.strip():
-            error_msg = "RAZORPAY_KEY_ID is empty or not a valid string"
-            logger.critical(error_msg)
-            raise ImproperlyConfigured(error_msg)
-            
-        if not isinstance(razorpay_key_secret, str) or not razorpay_key_secret.strip():
-            error_msg = "RAZORPAY_KEY_SECRET is empty or not a valid string"
-            logger.critical(error_msg)
-            raise ImproperlyConfigured(error_msg)
-        
+        """
+        Return the shared, pooled Razorpay client (see payment.gateway).
+
+        Raises:
+            ImproperlyConfigured: if the Razorpay keys are not set
+        """
         try:
-            self.client = razorpay.Client(auth=(razorpay_key_id, razorpay_key_secret))
-            logger.info("Successfully initialized Razorpay client")
-            return self.client
-            
-        except Exception as e:
-            error_msg = f"Failed to initialize Razorpay client: {str(e)}"
-            logger.critical(error_msg)
-            raise ImproperlyConfigured(error_msg)
+            self.client = get_gateway_client()
+        except ImproperlyConfigured as e:
+            logger.critical(str(e))
+            raise
+        return self.client
 
 # Initialize the client wrapper (doesn't create the client yet)
 razorpay_client = RazorpayClient()
@@ -161,6 +138,28 @@ def verify_payment_signature(payload, signature, secret):
         logger.error(f"Signature verification failed: {str(e)}")
         return False
 
+def verify_webhook_signature(body, signature, secret):
+    """
+    Verify a webhook signature against the raw request body
+    
+    Razorpay signs the exact bytes it sends, so the body must not be
+    re-serialized. No API client is needed to check the HMAC.
+    
+    Args:
+        body (bytes or str): The raw request body
+        signature (str): The X-Razorpay-Signature header
+        secret (str): The webhook secret from Razorpay
+        
+    Returns:
+        bool: True if signature is valid, False otherwise
+    """
+    if not body or not signature or not secret:
+        return False
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
 def capture_payment(payment_id, amount):
     """
     Capture a payment
@@ -13,7 +13,9 @@ from django.db import transaction
 from django.utils import timezone
 from django.views.decorators.cache import never_cache
 from store.models import Order, Payment, OrderItem
-from .utils import create_razorpay_order, verify_payment_signature, get_payment_details, capture_payment
+from .utils import create_razorpay_order, verify_webhook_signature, get_payment_details, capture_payment
+from .gateway import get_gateway_client
+from .webhooks import get_event_id, store_webhook_event
 import time
 import razorpay
 
@@ -224,7 +226,7 @@ def create_order(request):
                 
                 # Enable auto-capture for the order
                 try:
-                    client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+                    client = get_gateway_client()
                     payment_id = razorpay_order.get('id')
                     if payment_id:
                         client.payment.capture(payment_id, amount)
@@ -314,200 +316,35 @@ def create_order(request):
 @require_http_methods(["POST"])
 def payment_webhook(request):
     """
-    Handle Razorpay webhook events for payment processing
+    Receive Razorpay webhook events.
+    
+    The event is verified and stored in the webhook inbox, then processed by
+    the process_webhook_events worker; nothing else happens in the request.
     """
+    body = request.body
+    webhook_secret = getattr(settings, 'RAZORPAY_WEBHOOK_SECRET', '')
+    if not webhook_secret:
+        logger.error("RAZORPAY_WEBHOOK_SECRET is not configured")
+        return HttpResponseServerError("Server configuration error")
+    
+    if not verify_webhook_signature(body, request.headers.get('X-Razorpay-Signature', ''), webhook_secret):
+        logger.warning("Rejected webhook with an invalid signature")
+        return HttpResponseBadRequest("Invalid signature")
+    
     try:
-        # Get the webhook payload
-        payload = json.loads(request.body.decode('utf-8'))
-        logger.info(f"Received webhook payload: {json.dumps(payload, indent=2)}")
-        
-        # Verify the webhook signature
-        webhook_signature = request.headers.get('X-Razorpay-Signature')
-        webhook_secret = settings.RAZORPAY_WEBHOOK_SECRET
-        
-        if not webhook_secret:
-            logger.error("RAZORPAY_WEBHOOK_SECRET is not configured")
-            return HttpResponseServerError("Server configuration error")
-            
-        if not verify_payment_signature(payload, webhook_signature, webhook_secret):
-            logger.warning(f"Invalid webhook signature. Received: {webhook_signature}")
-            return HttpResponseBadRequest("Invalid signature")
-        
-        # Handle different webhook events
-        event = payload.get('event')
-        
-        if event == 'payment.captured':
-            return handle_payment_captured(payload)
-        elif event == 'payment.failed':
-            return handle_payment_failed(payload)
-        elif event == 'order.paid':
-            return handle_order_paid(payload)
-        else:
-            logger.info(f"Unhandled webhook event: {event}")
-            return JsonResponse({'status': 'ignored', 'event': event}, status=200)
-            
-    except json.JSONDecodeError as e:
+        payload = json.loads(body.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
         logger.error(f"Invalid JSON payload in webhook: {str(e)}")
         return HttpResponseBadRequest("Invalid JSON payload")
-    except Exception as e:
-        logger.error(f"Error in payment webhook: {str(e)}", exc_info=True)
-        return HttpResponseServerError("Internal server error")
-
-def handle_payment_captured(payload):
-    """Handle payment.captured webhook event"""
-    try:
-        payment_data = payload.get('payload', {}).get('payment', {})
-        payment_id = payment_data.get('entity', {}).get('id')
-        order_id = payment_data.get('entity', {}).get('order_id')
-        
-        if not payment_id or not order_id:
-            logger.error(f"Missing payment_id or order_id in webhook payload: {payload}")
-            return HttpResponseBadRequest("Missing required fields")
-        
-        logger.info(f"Processing payment.captured for payment_id: {payment_id}, order_id: {order_id}")
-        
-        with transaction.atomic():
-            # Get the order with select_for_update to prevent race conditions
-            try:
-                order = Order.objects.select_for_update().get(
-                    razorpay_order_id=order_id,
-                    payment_status=False  # Only process if not already paid
-                )
-            except Order.DoesNotExist:
-                logger.warning(f"Order not found or already paid: {order_id}")
-                return JsonResponse({'status': 'ignored', 'reason': 'order_not_found_or_paid'}, status=200)
-            
-            # Verify payment with Razorpay
-            try:
-                payment = get_payment_details(payment_id)
-                if payment.get('status') != 'captured':
-                    logger.warning(f"Payment {payment_id} status is not captured: {payment.get('status')}")
-                    return JsonResponse({'status': 'ignored', 'reason': 'payment_not_captured'}, status=200)
-            except Exception as e:
-                logger.error(f"Error verifying payment {payment_id}: {str(e)}")
-                return HttpResponseServerError("Error verifying payment")
-            
-            # Update order status
-            order.payment_status = True
-            order.status = 'processing'
-            order.payment_date = timezone.now()
-            order.save(update_fields=['payment_status', 'status', 'payment_date', 'updated_at'])
-            
-            # Create or update payment record
-            payment_amount = payment_data.get('entity', {}).get('amount', 0) / 100  # Convert from paise to rupees
-            Payment.objects.update_or_create(
-                transaction_id=payment_id,
-                defaults={
-                    'order': order,
-                    'amount': payment_amount,
-                    'payment_method': 'razorpay',
-                    'status': 'completed',
-                    'raw_data': json.dumps(payment_data),
-                    'created_at': timezone.now()
-                }
-            )
-            
-            logger.info(f"Successfully processed payment {payment_id} for order {order.id}")
-            
-            # TODO: Send order confirmation email
-            # send_order_confirmation_email(order)
-            
-            return JsonResponse({'status': 'success'})
-            
-    except Exception as e:
-        logger.error(f"Error in handle_payment_captured: {str(e)}", exc_info=True)
-        return HttpResponseServerError("Internal server error")
-
-def handle_payment_failed(payload):
-    """Handle payment.failed webhook event"""
-    try:
-        payment_data = payload.get('payload', {}).get('payment', {}).get('entity', {})
-        payment_id = payment_data.get('id')
-        order_id = payment_data.get('order_id')
-        error_code = payment_data.get('error_code')
-        error_description = payment_data.get('error_description')
-        
-        logger.warning(f"Payment failed - ID: {payment_id}, Order: {order_id}, "
-                     f"Error: {error_code} - {error_description}")
-        
-        if order_id:
-            try:
-                order = Order.objects.get(razorpay_order_id=order_id)
-                order.status = 'payment_failed'
-                order.save(update_fields=['status', 'updated_at'])
-                
-                # Log the failed payment attempt
-                Payment.objects.create(
-                    order=order,
-                    transaction_id=payment_id,
-                    amount=payment_data.get('amount', 0) / 100,
-                    payment_method='razorpay',
-                    status='failed',
-                    error_code=error_code,
-                    error_description=error_description,
-                    raw_data=json.dumps(payment_data)
-                )
-                
-                # TODO: Send payment failure notification to admin
-                
-            except Order.DoesNotExist:
-                logger.warning(f"Order not found for failed payment: {order_id}")
-        
-        return JsonResponse({'status': 'processed'})
-        
-    except Exception as e:
-        logger.error(f"Error in handle_payment_failed: {str(e)}", exc_info=True)
-        return HttpResponseServerError("Internal server error")
-
-def handle_order_paid(payload):
-    """Handle order.paid webhook event"""
-    try:
-        order_data = payload.get('payload', {}).get('order', {}).get('entity', {})
-        order_id = order_data.get('id')
-        payment_id = order_data.get('payment_id')
-        
-        if not order_id or not payment_id:
-            logger.error(f"Missing order_id or payment_id in order.paid webhook: {payload}")
-            return HttpResponseBadRequest("Missing required fields")
-            
-        logger.info(f"Processing order.paid for order_id: {order_id}, payment_id: {payment_id}")
-        
-        # In most cases, payment.captured will handle this, but we'll log it
-        try:
-            with transaction.atomic():
-                order = Order.objects.select_for_update().get(
-                    razorpay_order_id=order_id,
-                    payment_status=False
-                )
-                logger.info(f"Order {order.id} marked as paid via order.paid webhook")
-                
-                # If for some reason payment wasn't captured yet, capture it
-                if not order.payment_status:
-                    payment = get_payment_details(payment_id)
-                    if payment.get('status') == 'captured':
-                        order.payment_status = True
-                        order.status = 'processing'
-                        order.payment_date = timezone.now()
-                        order.save(update_fields=['payment_status', 'status', 'payment_date', 'updated_at'])
-                        
-                        Payment.objects.update_or_create(
-                            transaction_id=payment_id,
-                            defaults={
-                                'order': order,
-                                'amount': payment.get('amount', 0) / 100,
-                                'payment_method': 'razorpay',
-                                'status': 'completed',
-                                'raw_data': json.dumps(payment)
-                            }
-                        )
-        except Order.DoesNotExist:
-            logger.warning(f"Order {order_id} not found or already paid")
-        
-        return JsonResponse({'status': 'processed'})
-        
-    except Exception as e:
-        logger.error(f"Error in handle_order_paid: {str(e)}", exc_info=True)
-        return HttpResponseServerError("Internal server error")
+    if not isinstance(payload, dict):
+        return HttpResponseBadRequest("Invalid JSON payload")
+    
+    event, created = store_webhook_event(get_event_id(request, body), payload)
+    if created:
+        logger.info(f"Queued webhook {event.event_id} ({event.event})")
+    else:
+        logger.info(f"Duplicate webhook {event.event_id} ignored")
+    return JsonResponse({'status': 'queued' if created else 'duplicate'})
 
 @login_required
 @require_GET
@@ -539,7 +376,7 @@ def payment_success(request):
             payment = get_payment_details(payment_id)
             
             # Verify the payment signature
-            client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+            client = get_gateway_client()
             params = {
                 'razorpay_payment_id': payment_id,
                 'razorpay_order_id': order_id,
@@ -684,7 +521,7 @@ def verify_payment(request):
             })
         
         # Initialize Razorpay client
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+        client = get_gateway_client()
         
         try:
             # Verify the payment signature
@@ -0,0 +1,236 @@
+"""
+Razorpay webhook inbox.
+
+``payment_webhook`` verifies the signature, stores the event with
+``store_webhook_event()`` and answers immediately; redeliveries of the same
+event ID are stored once. The process_webhook_events worker claims due
+events in batches with ``process_webhook_events()``.
+
+Handlers call the Razorpay API before taking any row lock, so a slow
+gateway never holds an order locked; the order is then re-checked and
+updated in a short transaction.
+"""
+import hashlib
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from store import work_queue
+from store.models import Order, Payment
+from store.order_transitions import OrderTransition
+
+from .models import WebhookEvent
+from .utils import get_payment_details
+
+logger = logging.getLogger(__name__)
+
+
+def get_event_id(request, body):
+    """
+    Return Razorpay's ID for a webhook delivery.
+
+    Falls back to a hash of the body when the X-Razorpay-Event-Id header is
+    missing, so a replayed body is still stored once.
+    """
+    event_id = request.headers.get('X-Razorpay-Event-Id', '').strip()
+    if event_id:
+        return event_id[:100]
+    return f"sha256:{hashlib.sha256(body).hexdigest()}"
+
+
+def store_webhook_event(event_id, payload):
+    """
+    Add a verified webhook event to the inbox.
+
+    Returns:
+        tuple: (WebhookEvent, created)
+    """
+    defaults = {'event': str(payload.get('event') or '')[:100], 'payload': payload}
+    try:
+        return WebhookEvent.objects.get_or_create(event_id=event_id, defaults=defaults)
+    except IntegrityError:
+        # Stored concurrently by another delivery of the same event
+        return WebhookEvent.objects.get(event_id=event_id), False
+
+
+def get_retry_delay(attempts):
+    """
+    Return the backoff before retry number ``attempts`` (1-based).
+
+    Exponential from WEBHOOK_RETRY_DELAY seconds, capped at
+    WEBHOOK_MAX_RETRY_DELAY.
+    """
+    return work_queue.get_retry_delay(
+        attempts,
+        getattr(settings, 'WEBHOOK_RETRY_DELAY', 30),
+        getattr(settings, 'WEBHOOK_MAX_RETRY_DELAY', 60 * 60),
+    )
+
+
+def claim_webhook_events(batch_size):
+    """
+    Claim a batch of due events for this worker.
+
+    Claimed events are marked as processing and leased for WEBHOOK_LEASE
+    seconds; events whose lease expired (a crashed worker) become due again.
+    """
+    return work_queue.claim_due(
+        WebhookEvent.objects.all(),
+        WebhookEvent.Status.PROCESSING,
+        getattr(settings, 'WEBHOOK_LEASE', 5 * 60),
+        batch_size,
+    )
+
+
+def _entity(payload, name):
+    return (payload.get('payload') or {}).get(name, {}).get('entity') or {}
+
+
+def _amount(paise):
+    return Decimal(paise or 0) / 100
+
+
+def _mark_paid(razorpay_order_id, payment_id, event):
+    """
+    Verify a payment with Razorpay and record it on its order.
+
+    Returns:
+        str: the resulting WebhookEvent status
+    """
+    if not Order.objects.filter(razorpay_order_id=razorpay_order_id, payment_status=False).exists():
+        logger.info(f"Webhook {event.event_id}: order {razorpay_order_id} not found or already paid")
+        return WebhookEvent.Status.IGNORED
+
+    # Remote call before any lock is taken; errors propagate and are retried
+    payment = get_payment_details(payment_id)
+    if payment.get('status') != 'captured':
+        logger.warning(f"Webhook {event.event_id}: payment {payment_id} is {payment.get('status')}, not captured")
+        return WebhookEvent.Status.IGNORED
+    if payment.get('order_id') and payment['order_id'] != razorpay_order_id:
+        logger.warning(f"Webhook {event.event_id}: payment {payment_id} belongs to order {payment['order_id']}")
+        return WebhookEvent.Status.IGNORED
+
+    with transaction.atomic():
+        try:
+            order = Order.objects.select_for_update().get(
+                razorpay_order_id=razorpay_order_id,
+                payment_status=False  # Another delivery may have won the race
+            )
+        except Order.DoesNotExist:
+            return WebhookEvent.Status.IGNORED
+
+        OrderTransition(order, note=f"Payment {payment_id} captured").set(
+            payment_status=True,
+            payment_id=payment_id,
+            status=Order.Status.PROCESSING,
+        ).save()
+        Payment.objects.update_or_create(
+            order=order,
+            defaults={
+                'payment_id': payment_id,
+                'transaction_id': payment_id,
+                'amount': _amount(payment.get('amount')),
+                'payment_method': (payment.get('method') or 'razorpay')[:20],
+                'status': 'completed',
+                'payment_gateway_response': payment,
+            }
+        )
+
+    logger.info(f"Webhook {event.event_id}: recorded payment {payment_id} for order {order.order_number}")
+    return WebhookEvent.Status.PROCESSED
+
+
+def handle_payment_captured(event):
+    payment = _entity(event.payload, 'payment')
+    if not payment.get('id') or not payment.get('order_id'):
+        logger.error(f"Webhook {event.event_id}: payment.captured without payment or order ID")
+        return WebhookEvent.Status.IGNORED
+    return _mark_paid(payment['order_id'], payment['id'], event)
+
+
+def handle_order_paid(event):
+    order = _entity(event.payload, 'order')
+    payment_id = _entity(event.payload, 'payment').get('id') or order.get('payment_id')
+    if not order.get('id') or not payment_id:
+        logger.error(f"Webhook {event.event_id}: order.paid without order or payment ID")
+        return WebhookEvent.Status.IGNORED
+    return _mark_paid(order['id'], payment_id, event)
+
+
+def handle_payment_failed(event):
+    payment = _entity(event.payload, 'payment')
+    razorpay_order_id = payment.get('order_id')
+    logger.warning(
+        f"Webhook {event.event_id}: payment {payment.get('id')} failed for order {razorpay_order_id}: "
+        f"{payment.get('error_code')} - {payment.get('error_description')}"
+    )
+    order = Order.objects.filter(razorpay_order_id=razorpay_order_id, payment_status=False).first() if razorpay_order_id else None
+    if order is None or not payment.get('id'):
+        return WebhookEvent.Status.IGNORED
+
+    Payment.objects.update_or_create(
+        order=order,
+        defaults={
+            'payment_id': payment['id'],
+            'transaction_id': payment['id'],
+            'amount': _amount(payment.get('amount')),
+            'payment_method': (payment.get('method') or 'razorpay')[:20],
+            'status': 'failed',
+            'payment_gateway_response': payment,
+        }
+    )
+    return WebhookEvent.Status.PROCESSED
+
+
+EVENT_HANDLERS = {
+    'payment.captured': handle_payment_captured,
+    'order.paid': handle_order_paid,
+    'payment.failed': handle_payment_failed,
+}
+
+
+def _record_failure(event, error, max_attempts):
+    work_queue.record_failure(event, error, max_attempts, get_retry_delay, f"Webhook {event.event_id}")
+
+
+def process_webhook_events(batch_size=50, max_attempts=None):
+    """
+    Process one batch of due webhook events.
+
+    Args:
+        batch_size: maximum number of events to process
+        max_attempts: attempts before an event is marked failed
+            (default WEBHOOK_MAX_ATTEMPTS or 8)
+
+    Returns:
+        dict: counts of 'processed', 'ignored', 'retried' and 'failed' events
+    """
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 8)
+    counts = {'processed': 0, 'ignored': 0, 'retried': 0, 'failed': 0}
+
+    for event in claim_webhook_events(batch_size):
+        handler = EVENT_HANDLERS.get(event.event)
+        try:
+            status = handler(event) if handler else WebhookEvent.Status.IGNORED
+        except Exception as e:
+            logger.error(f"Error processing webhook {event.event_id}: {str(e)}", exc_info=True)
+            _record_failure(event, str(e), max_attempts)
+            counts['failed' if event.status == WebhookEvent.Status.FAILED else 'retried'] += 1
+            continue
+        event.status = status
+        event.attempts += 1
+        event.last_error = ''
+        event.processed_at = timezone.now()
+        event.save(update_fields=['status', 'attempts', 'last_error', 'processed_at'])
+        counts[status] += 1
+
+    if any(counts.values()):
+        logger.info(
+            f"Webhook batch: {counts['processed']} processed, {counts['ignored']} ignored, "
+            f"{counts['retried']} retried, {counts['failed']} failed"
+        )
+    return counts
@@ -7,7 +7,8 @@ from .models import (
     Category, Product, Order, OrderItem, 
     Wishlist, Review, Cart, CartItem,
     Payment, BlogPost, BlogCategory, BlogTag,
-    Variation, VariationOption, ProductVariation, Address
+    Variation, VariationOption, ProductVariation, Address,
+    EmailOutbox
 )
 
 # Custom admin site
@@ -128,6 +129,13 @@ class WishlistAdmin(admin.ModelAdmin):
     get_username.short_description = 'User'
     get_username.admin_order_field = 'user__username'
 
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'to_email', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['to_email', 'dedupe_key', 'order__order_number']
+    raw_id_fields = ['order']
+    readonly_fields = ['created_at', 'sent_at', 'last_error']
+
 # Register models with the default admin site
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Product, ProductAdmin)
@@ -136,6 +144,7 @@ admin.site.register(OrderItem, OrderItemAdmin)
 admin.site.register(Cart, CartAdmin)
 admin.site.register(CartItem, CartItemAdmin)
 admin.site.register(Wishlist, WishlistAdmin)
+admin.site.register(EmailOutbox, EmailOutboxAdmin)
 
 # Register models with the custom admin site
 angel_plants_admin.register(Category, CategoryAdmin)
@@ -145,3 +154,4 @@ angel_plants_admin.register(OrderItem, OrderItemAdmin)
 angel_plants_admin.register(Cart, CartAdmin)
 angel_plants_admin.register(CartItem, CartItemAdmin)
 angel_plants_admin.register(Wishlist, WishlistAdmin)
+angel_plants_admin.register(EmailOutbox, EmailOutboxAdmin)
@@ -3,13 +3,18 @@ from django.views.generic import ListView, DetailView, UpdateView
 from django.urls import reverse_lazy
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
+from django.http import JsonResponse
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q, Count, Sum, F
+from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta
 
-from .models import Order, OrderStatusUpdate, Product
+from .models import DailySales, Order, OrderStatusUpdate, Product
 from .forms import UpdateOrderStatusForm
+from .order_transitions import OrderTransition
+from .order_search import created_range, search_orders
+from .keyset import KeysetPaginationMixin
+from .sales_rollups import get_status_distribution
 
 
 class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, ListView):
@@ -28,21 +33,18 @@ class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         context = super().get_context_data(**kwargs)
         now = timezone.now()
         
-        # Order statistics
-        total_orders = Order.objects.count()
-        today_orders = Order.objects.filter(created_at__date=now.date()).count()
-        pending_orders = Order.objects.filter(status__in=['pending', 'processing']).count()
-        
-        # Sales statistics
-        total_sales = Order.objects.aggregate(
-            total=Sum('total_paid')
-        )['total'] or 0
+        # Order status distribution and totals, from the per-status rollups
+        status_distribution = get_status_distribution()
+        total_orders = sum(item['count'] for item in status_distribution)
+        pending_orders = sum(
+            item['count'] for item in status_distribution
+            if item['status'] in ('pending', 'processing')
+        )
+        total_sales = sum(item['total_amount'] for item in status_distribution)
         
-        # Order status distribution
-        status_distribution = Order.objects.values('status').annotate(
-            count=Count('id'),
-            percentage=Count('id') * 100 / total_orders if total_orders > 0 else 0
-        ).order_by('-count')
+        today_orders = DailySales.objects.filter(
+            day=timezone.localdate(now)
+        ).aggregate(count=Sum('order_count'))['count'] or 0
         
         # Recent status updates
         recent_updates = OrderStatusUpdate.objects.select_related('order').order_by('-created_at')[:5]
@@ -63,7 +65,7 @@ class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         return context
 
 
-class AdminOrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class AdminOrderListView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     """Admin view to list all orders with filtering and search."""
     model = Order
     template_name = 'store/admin/order_list.html'
@@ -74,34 +76,24 @@ class AdminOrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         return self.request.user.is_staff
     
     def get_queryset(self):
-        queryset = Order.objects.all().order_by('-created_at')
+        # Paged newest first by KeysetPaginationMixin
+        queryset = Order.objects.all()
         
         # Filter by status
         status = self.request.GET.get('status')
         if status and status in dict(Order.Status.choices):
             queryset = queryset.filter(status=status)
             
-        # Search by order number, customer name, or email
+        # Search by order number, customer name, email or phone
         search = self.request.GET.get('q')
         if search:
-            queryset = queryset.filter(
-                Q(order_number__icontains=search) |
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(phone__icontains=search)
-            )
+            queryset = search_orders(queryset, search)
             
         # Date range filter
-        date_from = self.request.GET.get('date_from')
-        date_to = self.request.GET.get('date_to')
-        
-        if date_from:
-            queryset = queryset.filter(created_at__date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(created_at__date__lte=date_to)
-            
-        return queryset
+        return queryset.filter(created_range(
+            self.request.GET.get('date_from'),
+            self.request.GET.get('date_to')
+        ))
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -151,24 +143,23 @@ class AdminUpdateOrderStatusView(LoginRequiredMixin, UserPassesTestMixin, Update
         return reverse_lazy('admin_order_detail', kwargs={'pk': self.object.pk})
     
     def form_valid(self, form):
-        old_status = self.get_object().status
-        response = super().form_valid(form)
-        new_status = self.object.status
+        # The form already applied its values; the tracker still knows the old status
+        self.object = form.instance
+        old_status = self.object.tracker.previous('status')
+        transition = OrderTransition(
+            self.object,
+            user=self.request.user,
+            note=form.cleaned_data.get('status_note', ''),
+            request=self.request
+        )
+        transition.touch(*form.changed_data).save()
         
-        # Create status update if status changed
-        if old_status != new_status:
-            OrderStatusUpdate.objects.create(
-                order=self.object,
-                status=new_status,
-                note=form.cleaned_data.get('status_note', ''),
-                created_by=self.request.user
-            )
-            
+        if transition.status_updates:
             # Send notification to customer if needed
-            self._send_status_notification(old_status, new_status)
+            self._send_status_notification(old_status, self.object.status)
             
         messages.success(self.request, _('Order status updated successfully.'))
-        return response
+        return redirect(self.get_success_url())
     
     def _send_status_notification(self, old_status, new_status):
         """Send notification to customer about status change."""
@@ -186,17 +177,12 @@ def update_order_status_ajax(request, order_id):
         new_status = request.POST.get('status')
         
         if new_status in dict(Order.Status.choices):
-            old_status = order.status
-            order.status = new_status
-            order.save()
-            
-            # Create status update
-            OrderStatusUpdate.objects.create(
-                order=order,
-                status=new_status,
+            OrderTransition(
+                order,
+                user=request.user,
                 note=f'Status updated via quick action by {request.user.get_full_name() or request.user.email}',
-                created_by=request.user
-            )
+                request=request
+            ).set(status=new_status).save()
             
             return JsonResponse({
                 'success': True,
@@ -11,7 +11,7 @@ class StoreConfig(AppConfig):
         # Import signals and connect them
         from . import signals
         from .cart_signals import create_user_cart, update_cart_totals_on_item_change, \
-            update_cart_on_item_delete, convert_cart_to_order, merge_guest_cart_with_user
+            update_cart_on_item_delete, convert_cart_to_order, merge_guest_cart_on_login
         
         # Connect the profile and cart creation signal
         signals.ready()
@@ -25,8 +25,7 @@ class StoreConfig(AppConfig):
         # Import models here to avoid AppRegistryNotReady error
         from .models import CartItem, Order
         
-        # Connect cart item signals
-        post_save.connect(update_cart_totals_on_item_change, sender=CartItem)
+        # Connect cart item signals (CartItem.save maintains the cart totals itself)
         post_save.connect(update_cart_totals_on_item_change, sender=Order)
         
         # Connect cart item deletion signal
@@ -37,4 +36,5 @@ class StoreConfig(AppConfig):
         post_save.connect(convert_cart_to_order, sender=Order)
         
         # Connect guest cart merge signal
-        post_save.connect(merge_guest_cart_with_user, sender=User)
+        from django.contrib.auth.signals import user_logged_in
+        user_logged_in.connect(merge_guest_cart_on_login)
@@ -0,0 +1,103 @@
+"""
+Cached blog sidebar (categories, popular tags and archive months).
+
+The sidebar data is stored under a key embedding the blog version, and the
+rendered sidebar HTML is fragment-cached under the same version (see
+templates/blog/sidebar.html). Saving or deleting a post, category or tag,
+or changing a post's categories or tags, bumps the version, so publishing
+a post refreshes every sidebar while ordinary page views run no sidebar
+queries at all.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.functional import SimpleLazyObject
+
+from .catalog_cache import bump_version, get_version
+from .models import BlogCategory, BlogPost, BlogTag
+
+logger = logging.getLogger(__name__)
+
+BLOG_VERSION_KEY = 'blog:version'
+SIDEBAR_KEY = 'blog:sidebar:v{version}'
+
+POPULAR_TAG_LIMIT = 10
+
+
+def get_cache_timeout():
+    """Return the timeout used for the cached sidebar data and HTML."""
+    return getattr(settings, 'BLOG_SIDEBAR_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_blog_version():
+    """
+    Return the current blog version, initialising it if missing.
+    """
+    return get_version(BLOG_VERSION_KEY)
+
+
+def bump_blog_version():
+    """
+    Invalidate the cached sidebar data and HTML by incrementing the version.
+    """
+    return bump_version(BLOG_VERSION_KEY)
+
+
+def build_blog_sidebar():
+    """
+    Query the database for the sidebar data.
+    """
+    published_posts = Count('blog_posts', filter=Q(blog_posts__status=BlogPost.PUBLISHED))
+    categories = BlogCategory.objects.filter(is_active=True).annotate(
+        post_count=published_posts
+    ).filter(post_count__gt=0)
+    tags = BlogTag.objects.annotate(
+        post_count=published_posts
+    ).filter(post_count__gt=0).order_by('-post_count')[:POPULAR_TAG_LIMIT]
+
+    return {
+        'categories': [
+            {'name': c.name, 'slug': c.slug, 'post_count': c.post_count} for c in categories
+        ],
+        'popular_tags': [
+            {'name': t.name, 'slug': t.slug, 'post_count': t.post_count} for t in tags
+        ],
+        'archive_dates': list(
+            BlogPost.objects.filter(status=BlogPost.PUBLISHED).dates('publish_date', 'month', order='DESC')
+        ),
+    }
+
+
+def get_blog_sidebar(version=None):
+    """
+    Return the sidebar data, served from the cache when warm.
+
+    Returns:
+        dict: 'categories', 'popular_tags' and 'archive_dates'
+    """
+    key = SIDEBAR_KEY.format(version=version or get_blog_version())
+    sidebar = cache.get(key)
+    if sidebar is None:
+        sidebar = build_blog_sidebar()
+        cache.set(key, sidebar, get_cache_timeout())
+    return sidebar
+
+
+def get_sidebar_context():
+    """
+    Return the template context for blog/sidebar.html.
+
+    The data is loaded lazily, so a fragment cache hit in the template
+    never reads it.
+    """
+    version = get_blog_version()
+    sidebar = SimpleLazyObject(lambda: get_blog_sidebar(version))
+    return {
+        'blog_version': version,
+        'blog_sidebar_timeout': get_cache_timeout(),
+        'categories': SimpleLazyObject(lambda: sidebar['categories']),
+        'popular_tags': SimpleLazyObject(lambda: sidebar['popular_tags']),
+        'archive_dates': SimpleLazyObject(lambda: sidebar['archive_dates']),
+    }
@@ -0,0 +1,123 @@
+"""
+Bulk reconciliation of cart items against current product stock.
+
+Used by the cart page and checkout. Instead of refreshing and saving each
+item separately, the cart's items are loaded in one query, their products are
+re-read and locked in a second, every adjustment is computed in memory, and
+the changes are written back with one bulk_update, one totals update and one
+delete.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cart, CartItem, Product
+
+logger = logging.getLogger(__name__)
+
+# Reasons an item is removed from the cart
+REMOVED_INACTIVE = 'inactive'
+REMOVED_OUT_OF_STOCK = 'out_of_stock'
+
+
+class CartReconciliation:
+    """
+    Outcome of reconciling a cart.
+
+    Attributes:
+        active_items: CartItems that stay in the cart, with current products
+        adjusted: list of (item, old_quantity) for items capped to stock
+        removed: list of (item, reason) for items deleted from the cart
+    """
+
+    def __init__(self, cart):
+        self.cart = cart
+        self.active_items = []
+        self.adjusted = []
+        self.removed = []
+
+    @property
+    def subtotal(self):
+        return sum((item.total_price for item in self.active_items), Decimal('0.00'))
+
+    @property
+    def item_count(self):
+        return sum(item.quantity for item in self.active_items)
+
+    @property
+    def changed(self):
+        return bool(self.adjusted or self.removed)
+
+
+def reconcile_cart(cart):
+    """
+    Bring a cart in line with current product availability.
+
+    Items whose product is inactive or out of stock are deleted, items asking
+    for more than the tracked stock are reduced to it. Products are locked for
+    the duration of the caller's transaction (or this function's own).
+
+    Args:
+        cart: Cart instance
+
+    Returns:
+        CartReconciliation
+    """
+    result = CartReconciliation(cart)
+
+    with transaction.atomic():
+        items = list(CartItem.objects.filter(cart=cart).order_by('pk'))
+        if not items:
+            return result
+
+        # Lock in primary key order so concurrent checkouts can't deadlock
+        products = Product.objects.select_for_update().filter(
+            pk__in={item.product_id for item in items}
+        ).order_by('pk').in_bulk()
+
+        now = timezone.now()
+        for item in items:
+            product = products.get(item.product_id)
+            if product is None or not product.is_active:
+                if product is not None:
+                    item.product = product
+                result.removed.append((item, REMOVED_INACTIVE))
+                continue
+            item.product = product
+
+            if product.track_quantity and item.quantity > product.quantity:
+                if product.quantity > 0:
+                    result.adjusted.append((item, item.quantity))
+                    item.quantity = product.quantity
+                    item.updated_at = now
+                else:
+                    result.removed.append((item, REMOVED_OUT_OF_STOCK))
+                    continue
+            result.active_items.append(item)
+
+        if result.adjusted:
+            CartItem.objects.bulk_update(
+                [item for item, _ in result.adjusted],
+                ['quantity', 'updated_at']
+            )
+            # bulk_update bypasses CartItem.save, so apply the totals delta here
+            Cart.apply_totals_delta(
+                cart.pk,
+                sum((item.quantity - old) * item.price for item, old in result.adjusted),
+                sum(item.quantity - old for item, old in result.adjusted)
+            )
+        if result.removed:
+            # Deletion signals take the removed items off the cart totals
+            CartItem.objects.filter(pk__in=[item.pk for item, _ in result.removed]).delete()
+        if result.changed:
+            cart.total = result.subtotal
+            cart.total_quantity = result.item_count
+
+    if result.changed:
+        logger.info(
+            f"Reconciled cart {cart.id}: {len(result.adjusted)} adjusted, "
+            f"{len(result.removed)} removed"
+        )
+    return result
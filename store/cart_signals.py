@@ -4,9 +4,11 @@ Signals related to the shopping cart functionality.
 from django.db.models.signals import post_save, pre_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
 from django.db import transaction
 from django.conf import settings
 from .models import Cart, CartItem, Order, OrderItem
+from .cart_utils import invalidate_cart_snapshot, merge_guest_cart
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -21,10 +23,12 @@ def create_user_cart(sender, instance, created, **kwargs):
         )
 
 
-@receiver(post_save, sender=CartItem)
 def update_cart_totals_on_item_change(sender, instance, **kwargs):
     """
-    Update cart's updated_at timestamp when a cart item is added or updated.
+    Update cart's updated_at timestamp when an order referencing it is saved.
+    
+    Cart items keep their cart's totals and timestamp current in
+    CartItem.save, so this is no longer connected for CartItem.
     """
     if instance.cart:
         instance.cart.save()
@@ -33,10 +37,11 @@ def update_cart_totals_on_item_change(sender, instance, **kwargs):
 @receiver(pre_delete, sender=CartItem)
 def update_cart_on_item_delete(sender, instance, **kwargs):
     """
-    Update cart's updated_at timestamp when a cart item is deleted.
+    Remove a deleted cart item from its cart's stored totals.
     """
-    if instance.cart:
-        instance.cart.save()
+    quantity = instance.tracker.previous('quantity') or 0
+    price = instance.tracker.previous('price') or 0
+    Cart.apply_totals_delta(instance.cart_id, -(quantity * price), -quantity)
 
 
 @receiver(post_save, sender=Order)
@@ -67,33 +72,21 @@ def convert_cart_to_order(sender, instance, created, **kwargs):
                     exc_info=True)
 
 
-@receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def merge_guest_cart_with_user(sender, instance, created, **kwargs):
+@receiver(user_logged_in)
+def merge_guest_cart_on_login(sender, request, user, **kwargs):
     """
-    If a user had a guest cart before logging in, merge it with their user cart.
+    Merge the guest cart kept in the session into the user's cart at login.
     """
-    if not created and hasattr(instance, '_guest_cart'):
-        guest_cart = instance._guest_cart
-        user_cart, created = Cart.objects.get_or_create(
-            user=instance,
-            defaults={'status': 'active'}
-        )
-        
-        if not created:
-            # Merge guest cart items into user cart
-            for item in guest_cart.items.all():
-                cart_item, created = CartItem.objects.get_or_create(
-                    cart=user_cart,
-                    product=item.product,
-                    defaults={
-                        'quantity': item.quantity,
-                        'price': item.price
-                    }
-                )
-                if not created:
-                    cart_item.quantity += item.quantity
-                    cart_item.save()
-            
-            # Delete the guest cart
-            guest_cart.delete()
-            del instance._guest_cart
+    session = getattr(request, 'session', None)
+    guest_cart = session.pop('guest_cart', None) if session is not None else None
+    if not guest_cart:
+        return
+    
+    try:
+        merge_guest_cart(user, guest_cart)
+    except Exception as e:
+        # Log the error but don't fail the login
+        import logging
+        logger = logging.getLogger(__name__)
+        logger.error(f"Error merging guest cart for user {user.pk}: {str(e)}", exc_info=True)
+    invalidate_cart_snapshot(request)
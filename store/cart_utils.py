@@ -1,12 +1,137 @@
 """
 Utility functions for cart operations.
 """
+import logging
 from decimal import Decimal
 from django.conf import settings
 from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
 from .models import Cart, CartItem, Product
 
+logger = logging.getLogger(__name__)
+
+
+class CartSnapshot:
+    """
+    Lazily loaded view of the current request's cart.
+    
+    Attached to every request as ``request.cart_snapshot`` by
+    ``store.middleware.CartSnapshotMiddleware``. Nothing is queried until
+    ``cart``, ``items``, ``count`` or ``total`` is first read; after that the
+    context processor, views and API endpoints all share the same data.
+    Code that changes the cart must call ``invalidate()`` (or
+    ``invalidate_cart_snapshot(request)``) so later readers reload it.
+    
+    ``items`` holds CartItem instances for authenticated users and dicts
+    (product, quantity, price, total_price) for session based guest carts.
+    """
+    
+    def __init__(self, request):
+        self.request = request
+        self._loaded = False
+    
+    @property
+    def is_guest(self):
+        return not (hasattr(self.request, 'user') and self.request.user.is_authenticated)
+    
+    def _load(self):
+        if self.is_guest:
+            self._cart = None
+            self._items = self._load_guest_items()
+            quantities = [item['quantity'] for item in self._items]
+            totals = [item['total_price'] for item in self._items]
+        else:
+            from .context_processors import get_or_create_cart
+            
+            self._cart = get_or_create_cart(self.request)
+            self._items = list(
+                CartItem.objects.filter(cart=self._cart).select_related('product')
+            )
+            quantities = [item.quantity for item in self._items]
+            totals = [Decimal(str(item.price)) * item.quantity for item in self._items]
+        self._count = sum(quantities)
+        self._total = sum(totals, Decimal('0.00'))
+        self._loaded = True
+    
+    def _load_guest_items(self):
+        guest_cart = self.request.session.get('guest_cart', {})
+        product_ids = [pid for pid in guest_cart.keys() if str(pid).isdigit()]
+        if not product_ids:
+            return []
+        products = Product.objects.filter(id__in=product_ids, is_active=True).in_bulk()
+        
+        items = []
+        for product_id, item in guest_cart.items():
+            if not str(product_id).isdigit() or int(product_id) not in products:
+                continue
+            quantity = int(item.get('quantity', 1))
+            price = Decimal(str(item.get('price', 0)))
+            items.append({
+                'product': products[int(product_id)],
+                'quantity': quantity,
+                'price': price,
+                'total_price': price * quantity,
+                'is_guest_item': True
+            })
+        return items
+    
+    def _get(self, name):
+        if not self._loaded:
+            self._load()
+        return getattr(self, name)
+    
+    @property
+    def cart(self):
+        return self._get('_cart')
+    
+    @property
+    def items(self):
+        return self._get('_items')
+    
+    @property
+    def count(self):
+        return self._get('_count')
+    
+    @property
+    def total(self):
+        return self._get('_total')
+    
+    def prime(self, cart, items):
+        """
+        Fill the snapshot from a cart and CartItems a view already loaded.
+        """
+        self._cart = cart
+        self._items = list(items)
+        self._count = sum(item.quantity for item in self._items)
+        self._total = sum(
+            (Decimal(str(item.price)) * item.quantity for item in self._items),
+            Decimal('0.00')
+        )
+        self._loaded = True
+    
+    def invalidate(self):
+        """Forget loaded data so the next read reflects cart changes."""
+        self._loaded = False
+
+
+def get_cart_snapshot(request):
+    """
+    Return the request's CartSnapshot, attaching one if the middleware
+    didn't (e.g. requests built with RequestFactory).
+    """
+    snapshot = getattr(request, 'cart_snapshot', None)
+    if snapshot is None:
+        snapshot = request.cart_snapshot = CartSnapshot(request)
+    return snapshot
+
+
+def invalidate_cart_snapshot(request):
+    """Mark the request's cart snapshot stale after a cart write."""
+    snapshot = getattr(request, 'cart_snapshot', None)
+    if snapshot is not None:
+        snapshot.invalidate()
+
 
 def get_cart_for_request(request):
     """
@@ -28,6 +153,93 @@ def get_cart_for_request(request):
         return request.session['guest_cart'], True  # True indicates this is a guest cart
 
 
+def bulk_add_to_cart(cart, quantities):
+    """
+    Add several products to a cart with a fixed number of queries.
+    
+    Products are loaded with one in_bulk and the cart's existing lines for
+    them with one query. New lines are inserted with one bulk_create, bumped
+    quantities written with one bulk_update and the cart totals adjusted with
+    one UPDATE. Quantities are capped to tracked stock; missing, inactive and
+    out of stock products are skipped.
+    
+    Args:
+        cart: Cart instance
+        quantities: dict of product ID -> quantity to add
+    
+    Returns:
+        list: IDs of the products now in the cart, sorted
+    """
+    with transaction.atomic():
+        products = Product.objects.filter(is_active=True).in_bulk(list(quantities))
+        in_cart = {
+            item.product_id: item
+            for item in CartItem.objects.filter(cart=cart, product_id__in=list(products))
+        }
+        
+        now = timezone.now()
+        created, updated, added_ids = [], [], []
+        amount, count = Decimal('0.00'), 0
+        for product_id in sorted(products):
+            product = products[product_id]
+            if product.track_quantity and product.quantity <= 0:
+                continue
+            item = in_cart.get(product_id)
+            current = item.quantity if item else 0
+            wanted = current + quantities[product_id]
+            if product.track_quantity:
+                wanted = min(wanted, product.quantity)
+            added = max(wanted - current, 0)
+            
+            if item is None:
+                item = CartItem(cart=cart, product=product, quantity=added, price=product.price)
+                created.append(item)
+            elif added:
+                item.quantity = wanted
+                item.updated_at = now
+                updated.append(item)
+            amount += added * item.price
+            count += added
+            added_ids.append(product_id)
+        
+        # Both bypass CartItem.save, so the totals delta is applied here
+        CartItem.objects.bulk_create(created)
+        CartItem.objects.bulk_update(updated, ['quantity', 'updated_at'])
+        if count:
+            Cart.apply_totals_delta(cart.pk, amount, count)
+            cart.total += amount
+            cart.total_quantity += count
+    return added_ids
+
+
+def merge_guest_cart(user, guest_cart):
+    """
+    Merge a session guest cart into the user's active cart.
+    
+    Args:
+        user: the User who just logged in
+        guest_cart: the session's guest cart, product ID -> item dict
+    
+    Returns:
+        Cart: the user's active cart
+    """
+    quantities = {}
+    for product_id, item in guest_cart.items():
+        try:
+            product_id, quantity = int(product_id), int(item.get('quantity', 1))
+        except (TypeError, ValueError, AttributeError):
+            continue
+        if quantity > 0:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+    
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user=user, status='active')
+        merged = bulk_add_to_cart(cart, quantities) if quantities else []
+    
+    logger.info(f"Merged {len(merged)} of {len(guest_cart)} guest cart items into cart {cart.pk}")
+    return cart
+
+
 def add_to_cart(request, product_id, quantity=1, update_quantity=False):
     """
     Add a product to the cart or update the quantity if it already exists.
@@ -75,6 +287,7 @@ def add_to_cart(request, product_id, quantity=1, update_quantity=False):
         
         # Save the session
         request.session.modified = True
+        invalidate_cart_snapshot(request)
         return True, "Product added to cart", None
     else:
         # Handle authenticated user's cart (database-based)
@@ -98,7 +311,8 @@ def add_to_cart(request, product_id, quantity=1, update_quantity=False):
             # Update cart timestamps
             cart.save()
             
-            return True, "Product added to cart", cart_item
+        invalidate_cart_snapshot(request)
+        return True, "Product added to cart", cart_item
 
 
 def remove_from_cart(request, product_id):
@@ -120,6 +334,7 @@ def remove_from_cart(request, product_id):
         if product_id_str in cart:
             del cart[product_id_str]
             request.session.modified = True
+            invalidate_cart_snapshot(request)
             return True, "Product removed from cart"
         return False, "Product not found in cart"
     else:
@@ -131,6 +346,7 @@ def remove_from_cart(request, product_id):
             )
             cart_item.delete()
             cart.save()  # Update cart timestamps
+            invalidate_cart_snapshot(request)
             return True, "Product removed from cart"
         except CartItem.DoesNotExist:
             return False, "Product not found in cart"
@@ -147,68 +363,34 @@ def get_cart_items(request):
             'count': total number of items in cart
         }
     """
-    cart, is_guest_cart = get_cart_for_request(request)
+    snapshot = get_cart_snapshot(request)
     
-    if is_guest_cart:
-        # Handle guest cart (session-based)
-        product_ids = list(cart.keys())
-        products = Product.objects.filter(id__in=product_ids).in_bulk()
-        
-        items = []
-        total = Decimal('0.00')
-        count = 0
-        
-        for product_id, item in cart.items():
-            if product_id in products:
-                product = products[product_id]
-                quantity = int(item.get('quantity', 0))
-                price = Decimal(str(item.get('price', '0.00')))
-                item_total = price * quantity
-                
-                items.append({
-                    'product': product,
-                    'quantity': quantity,
-                    'price': price,
-                    'total_price': item_total,
-                    'is_guest_item': True
-                })
-                
-                total += item_total
-                count += quantity
-        
+    if snapshot.is_guest:
+        # Guest cart items are already dicts built from the session
         return {
-            'items': items,
-            'total': total,
-            'count': count,
+            'items': list(snapshot.items),
+            'total': snapshot.total,
+            'count': snapshot.count,
             'is_guest_cart': True
         }
-    else:
-        # Handle authenticated user's cart (database-based)
-        cart_items = CartItem.objects.filter(cart=cart).select_related('product')
-        
-        items = []
-        total = Decimal('0.00')
-        count = 0
-        
-        for item in cart_items:
-            item_total = item.price * item.quantity
-            
-            items.append({
-                'product': item.product,
-                'quantity': item.quantity,
-                'price': item.price,
-                'total_price': item_total,
-                'is_guest_item': False,
-                'id': item.id
-            })
-            
-            total += item_total
-            count += item.quantity
-        
-        return {
-            'items': items,
-            'total': total,
-            'count': count,
-            'is_guest_cart': False,
-            'cart_id': cart.id
+    
+    # Handle authenticated user's cart (database-based)
+    items = [
+        {
+            'product': item.product,
+            'quantity': item.quantity,
+            'price': item.price,
+            'total_price': item.price * item.quantity,
+            'is_guest_item': False,
+            'id': item.id
         }
+        for item in snapshot.items
+    ]
+    
+    return {
+        'items': items,
+        'total': snapshot.total,
+        'count': snapshot.count,
+        'is_guest_cart': False,
+        'cart_id': snapshot.cart.id
+    }
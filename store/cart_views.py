@@ -5,6 +5,7 @@ from django.http import JsonResponse
 from django.urls import reverse
 from decimal import Decimal
 from .models import Product, Cart, CartItem
+from .cart_utils import invalidate_cart_snapshot
 
 @login_required
 def add_to_cart(request, product_id):
@@ -50,6 +51,8 @@ def add_to_cart(request, product_id):
                 quantity=quantity,
                 price=product.price
             )
+        cart.refresh_from_db(fields=['total', 'total_quantity'])
+        invalidate_cart_snapshot(request)
         
         # Prepare response data
         response_data = {
@@ -121,6 +124,7 @@ def update_cart(request):
             # Update quantity
             cart_item.quantity = max(1, int(quantity))  # Ensure quantity is at least 1
             cart_item.save()
+            invalidate_cart_snapshot(request)
             
             # Refresh the cart to get updated totals
             cart.refresh_from_db()
@@ -208,6 +212,8 @@ def remove_from_cart(request, product_id):
             
             # Remove the item from the cart
             cart_item.delete()
+            cart.refresh_from_db(fields=['total', 'total_quantity'])
+            invalidate_cart_snapshot(request)
             
             # Prepare success response with all required data
             response_data = {
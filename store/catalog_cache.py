@@ -0,0 +1,172 @@
+"""
+Versioned cache for catalog data rendered on high-traffic pages.
+
+Every cached catalog entry is stored under a key that embeds the current
+catalog version. Product and Category save/delete signals (and rating
+changes) bump the version, so stale entries are never read again and simply
+expire from the cache.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'catalog:version'
+HOME_RAILS_KEY = 'catalog:home_rails:v{version}'
+
+# Number of items shown in each home page rail
+HOME_RAIL_LIMITS = {
+    'featured_products': 8,
+    'bestsellers': 4,
+    'new_arrivals': 4,
+    'categories': 8,
+}
+
+
+def get_cache_timeout():
+    """Return the timeout used for versioned catalog entries."""
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_version(key):
+    """
+    Return the version counter stored under ``key``, initialising it if missing.
+
+    Versioned caches (catalog, blog, recommendations) embed the counter in
+    their entry keys; bumping it makes every older entry unreachable.
+    """
+    version = cache.get(key)
+    if version is None:
+        # add() is a no-op if another process initialised it first
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_version(key):
+    """
+    Increment the version counter stored under ``key``.
+
+    Returns:
+        int: the new version
+    """
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        # Key expired or was evicted; start a fresh version sequence
+        version = (cache.get(key) or 1) + 1
+        cache.set(key, version, timeout=None)
+    logger.debug(f"Cache version {key} bumped to {version}")
+    return version
+
+
+def get_catalog_version():
+    """
+    Return the current catalog version, initialising it if missing.
+    """
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """
+    Invalidate all versioned catalog entries by incrementing the version.
+    """
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def _image_payload(image):
+    """Return a template friendly ``{'url': ..., 'name': ...}`` dict for an image field."""
+    try:
+        return {'url': image.url, 'name': image.name} if image else None
+    except ValueError:
+        # Field has no file associated with it
+        return None
+
+
+def product_payload(product):
+    """
+    Serialize a product into the compact form used by cached rails.
+
+    The keys mirror the Product attributes the templates read, so the
+    payload can be rendered by the same templates as a model instance.
+    """
+    return {
+        'id': product.id,
+        'name': product.name,
+        'slug': product.slug,
+        'price': product.price,
+        'compare_at_price': product.compare_at_price,
+        'quantity': product.quantity,
+        'allow_backorder': product.allow_backorder,
+        'is_featured': product.is_featured,
+        'is_bestseller': product.is_bestseller,
+        'average_rating': product.average_rating,
+        'review_count': product.review_count,
+        'image': _image_payload(product.image),
+    }
+
+
+def category_payload(category):
+    """Serialize a category into the compact form used by cached rails."""
+    return {
+        'id': category.id,
+        'name': category.name,
+        'slug': category.slug,
+        'image': _image_payload(category.image),
+        'product_count': getattr(category, 'product_count', 0),
+    }
+
+
+def _rail(items):
+    return {
+        'ids': [item['id'] for item in items],
+        'items': items,
+    }
+
+
+def build_home_rails():
+    """
+    Query the database for every home page rail.
+    """
+    available = Product.objects.filter(is_active=True).filter(
+        Q(quantity__gt=0) | Q(allow_backorder=True)
+    )
+
+    featured = available.filter(is_featured=True)[:HOME_RAIL_LIMITS['featured_products']]
+    bestsellers = available.filter(is_bestseller=True)[:HOME_RAIL_LIMITS['bestsellers']]
+    new_arrivals = available.order_by('-created_at')[:HOME_RAIL_LIMITS['new_arrivals']]
+
+    # Categories with at least one active, in-stock product
+    categories = Category.objects.annotate(
+        product_count=Count(
+            'products',
+            filter=Q(products__is_active=True, products__quantity__gt=0)
+        )
+    ).filter(product_count__gt=0).order_by('name')[:HOME_RAIL_LIMITS['categories']]
+
+    return {
+        'featured_products': _rail([product_payload(p) for p in featured]),
+        'bestsellers': _rail([product_payload(p) for p in bestsellers]),
+        'new_arrivals': _rail([product_payload(p) for p in new_arrivals]),
+        'categories': _rail([category_payload(c) for c in categories]),
+    }
+
+
+def get_home_rails():
+    """
+    Return the home page rails, served from the cache when warm.
+
+    Returns:
+        dict: rail name -> {'ids': [...], 'items': [...]}
+    """
+    key = HOME_RAILS_KEY.format(version=get_catalog_version())
+    rails = cache.get(key)
+    if rails is None:
+        rails = build_home_rails()
+        cache.set(key, rails, get_cache_timeout())
+    return rails
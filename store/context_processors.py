@@ -1,13 +1,19 @@
-from .models import Category, Cart, CartItem, Wishlist
+from .models import Cart
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 
 
 def categories(request):
     """
     Context processor for categories.
+    
+    The list is lazy and comes from the object cache, so pages that don't
+    show categories don't read it at all.
     """
+    from .object_cache import get_categories
+    
     return {
-        'categories': Category.objects.all().order_by('name')
+        'categories': SimpleLazyObject(get_categories)
     }
 
 
@@ -15,9 +21,10 @@ def get_or_create_cart(request):
     """
     Helper function to get or create a cart for the current user.
     Handles both authenticated and anonymous users.
-    """
-    from .models import Cart, CartItem
     
+    A guest cart is merged into the user's cart at login (see
+    store.cart_signals.merge_guest_cart_on_login), not here.
+    """
     if hasattr(request, 'user') and request.user.is_authenticated:
         # For authenticated users, get or create a cart in the database
         cart, created = Cart.objects.get_or_create(
@@ -26,34 +33,6 @@ def get_or_create_cart(request):
             defaults={'status': 'active'}
         )
         
-        # If user had a guest cart, merge it with their user cart
-        if 'guest_cart' in request.session:
-            from django.utils import timezone
-            from decimal import Decimal
-            
-            guest_cart = request.session['guest_cart']
-            for product_id, item in guest_cart.items():
-                try:
-                    from .models import Product
-                    product = Product.objects.get(id=product_id)
-                    cart_item, created = CartItem.objects.get_or_create(
-                        cart=cart,
-                        product=product,
-                        defaults={
-                            'quantity': item['quantity'],
-                            'price': Decimal(str(item['price']))
-                        }
-                    )
-                    if not created:
-                        cart_item.quantity += item['quantity']
-                        cart_item.save()
-                except (Product.DoesNotExist, (ValueError, KeyError)):
-                    continue
-            
-            # Remove the guest cart from the session
-            del request.session['guest_cart']
-            request.session.modified = True
-        
         return cart
     else:
         # For anonymous users, use a session-based cart
@@ -66,98 +45,57 @@ def cart(request):
     """
     Context processor for cart information.
     Handles both authenticated and anonymous users.
-    """
-    from decimal import Decimal
-    from .models import Product, CartItem
     
-    context = {
-        'cart': None,
-        'cart_count': 0,
-        'cart_total': 0,
-        'cart_items': [],
-        'is_guest_cart': False
-    }
+    Values are lazy and backed by the request's CartSnapshot, so a page
+    only queries the cart if its template actually uses them.
+    """
+    from .cart_utils import get_cart_snapshot
     
     if not hasattr(request, 'user'):
-        return context
-        
-    try:
-        if request.user.is_authenticated:
-            # For authenticated users
-            cart = get_or_create_cart(request)
-            if cart:
-                cart_items = list(CartItem.objects.filter(cart=cart).select_related('product'))
-                cart_count = sum(item.quantity for item in cart_items)
-                cart_total = sum(
-                    Decimal(str(item.price)) * item.quantity 
-                    for item in cart_items
-                    if hasattr(item, 'price')
-                )
-                
-                context.update({
-                    'cart': cart,
-                    'cart_count': cart_count,
-                    'cart_total': cart_total,
-                    'cart_items': cart_items,
-                    'is_guest_cart': False
-                })
-        else:
-            # For anonymous users, use session-based cart
-            guest_cart = request.session.get('guest_cart', {})
-            cart_items = []
-            cart_total = Decimal('0.00')
-            
-            # Get product details for items in the guest cart
-            product_ids = [pid for pid in guest_cart.keys() if pid.isdigit()]
-            if product_ids:
-                products = Product.objects.filter(id__in=product_ids, is_active=True).in_bulk()
-                
-                for product_id, item in guest_cart.items():
-                    if not product_id.isdigit():
-                        continue
-                        
-                    product_id = int(product_id)
-                    if product_id in products:
-                        product = products[product_id]
-                        quantity = int(item.get('quantity', 1))
-                        price = Decimal(str(item.get('price', 0)))
-                        total_price = price * quantity
-                        
-                        cart_items.append({
-                            'product': product,
-                            'quantity': quantity,
-                            'price': price,
-                            'total_price': total_price,
-                            'is_guest_item': True
-                        })
-                        
-                        cart_total += total_price
-            
-            context.update({
-                'cart_count': sum(item['quantity'] for item in cart_items),
-                'cart_total': cart_total,
-                'cart_items': cart_items,
-                'is_guest_cart': True
-            })
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error in cart context processor: {str(e)}")
-        # Return empty context on error to prevent template errors
-        return context
+        return {
+            'cart': None,
+            'cart_count': 0,
+            'cart_total': 0,
+            'cart_items': [],
+            'is_guest_cart': False
+        }
+    
+    snapshot = get_cart_snapshot(request)
+    
+    def read(name, default):
+        def value():
+            try:
+                return getattr(snapshot, name)
+            except Exception as e:
+                import logging
+                logger = logging.getLogger(__name__)
+                logger.error(f"Error in cart context processor: {str(e)}")
+                # Fall back to an empty cart to prevent template errors
+                return default
+        return SimpleLazyObject(value)
     
-    return context
+    return {
+        'cart': read('cart', None),
+        'cart_count': read('count', 0),
+        'cart_total': read('total', 0),
+        'cart_items': read('items', []),
+        'is_guest_cart': snapshot.is_guest
+    }
 
 
 def wishlist_count(request):
     """
     Context processor for wishlist count.
+    
+    Reads the user's cached wishlist counter rather than counting their items.
     """
+    from .wishlist import get_wishlist_count
+    
     if not hasattr(request, 'user') or not request.user.is_authenticated:
         return {'wishlist_count': 0}
     
     try:
-        wishlist_count = Wishlist.objects.filter(user=request.user).count()
+        wishlist_count = get_wishlist_count(request.user)
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -0,0 +1,130 @@
+"""
+Buffered, write-coalescing counters.
+
+Incrementing a counter column on every page view turns popular rows into
+write hot spots. A ``BufferedCounter`` adds increments to a process-local
+buffer instead and writes them with ``F()`` updates at most every
+VIEW_COUNT_FLUSH_INTERVAL seconds (or once VIEW_COUNT_MAX_PENDING rows are
+pending), one UPDATE per distinct increment rather than one per view.
+The first buffered increment also starts a timer, so an idle process still
+writes its views within the interval. Buffers are flushed when the process
+exits too.
+
+Counts are approximate: increments still buffered when a process is killed
+are lost. Use ``displayed()`` to show a count including the pending views.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+
+from .models import BlogPost
+
+logger = logging.getLogger(__name__)
+
+_counters = []
+
+
+class BufferedCounter:
+    """
+    Buffered increments of an integer field.
+
+    Usage::
+
+        post_views = BufferedCounter(BlogPost, 'view_count')
+        post_views.increment(post.pk)
+    """
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._timer = None
+        _counters.append(self)
+
+    def __repr__(self):
+        return f"<BufferedCounter {self.model._meta.label}.{self.field}>"
+
+    def increment(self, pk, amount=1):
+        """Add ``amount`` to the row's counter, flushing if the buffer is due."""
+        interval = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 30)
+        with self._lock:
+            self._pending[pk] += amount
+            due = (
+                len(self._pending) >= getattr(settings, 'VIEW_COUNT_MAX_PENDING', 1000)
+                or time.monotonic() - self._last_flush >= interval
+            )
+            if not due and self._timer is None:
+                # Flush even if no further view arrives to trigger it
+                self._timer = threading.Timer(interval, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread opened its own database connection
+            connections.close_all()
+
+    def pending(self, pk):
+        """Return the increments for a row that are not written yet."""
+        with self._lock:
+            return self._pending.get(pk, 0)
+
+    def displayed(self, instance):
+        """Return an instance's count including its buffered increments."""
+        return getattr(instance, self.field) + self.pending(instance.pk)
+
+    def flush(self):
+        """
+        Write the buffered increments.
+
+        Returns:
+            int: number of rows updated
+        """
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._last_flush = time.monotonic()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+
+        # Rows with the same increment share one UPDATE
+        by_amount = defaultdict(list)
+        for pk, amount in pending.items():
+            by_amount[amount].append(pk)
+
+        updated = 0
+        for amount, pks in by_amount.items():
+            try:
+                updated += self.model.objects.filter(pk__in=pks).update(**{self.field: F(self.field) + amount})
+            except Exception as e:
+                logger.error(f"Error flushing {self!r}: {str(e)}", exc_info=True)
+                # Keep the increments for the next flush
+                with self._lock:
+                    for pk in pks:
+                        self._pending[pk] += amount
+        logger.debug(f"Flushed {self!r}: {updated} rows")
+        return updated
+
+
+def flush_counters():
+    """Flush every buffered counter in this process."""
+    return sum(counter.flush() for counter in _counters)
+
+
+atexit.register(flush_counters)
+
+blog_post_views = BufferedCounter(BlogPost, 'view_count')
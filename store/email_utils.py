@@ -3,9 +3,13 @@ import smtplib
 from decimal import Decimal
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import IntegrityError, transaction
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.html import strip_tags
 
+from . import work_queue
+
 logger = logging.getLogger(__name__)
 
 def test_email_connection():
@@ -25,9 +29,74 @@ def test_email_connection():
         logger.error(f"SMTP Connection Error: {str(e)}")
         return False, f"SMTP Connection failed: {str(e)}"
 
+def get_order_email(order):
+    """
+    Return the address order emails go to, falling back to the user's email.
+    """
+    email = getattr(order, 'email', None)
+    if not email and hasattr(order, 'user') and order.user and hasattr(order.user, 'email'):
+        email = order.user.email
+        logger.info(f"Using user's email from account: {email}")
+    return email.strip() if email else ''
+
+
+def build_order_confirmation_email(order, connection=None):
+    """
+    Render the order confirmation message for an order.
+    
+    Args:
+        order: Order instance
+        connection: optional email backend connection to send it with
+    
+    Returns:
+        EmailMultiAlternatives: message with plain text and HTML parts
+    """
+    # Read the total without writing it back to the order
+    subtotal = order.get_total_cost(update_db=False)
+    context = {
+        'order': order,
+        'order_items': order.items.all(),
+        'shipping_address': {
+            'name': f"{order.first_name} {order.last_name}",
+            'email': order.email,
+            'phone': order.phone or 'N/A',
+            'address': f"{order.address}",
+            'address2': f"{order.address2}" if order.address2 else '',
+            'city': order.city,
+            'state': order.state,
+            'postal_code': order.postal_code,
+            'country': order.country,
+        },
+        'subtotal': subtotal,
+        'shipping_cost': Decimal('99.00'),  # Fixed shipping cost as Decimal
+        'total': subtotal + Decimal('99.00')  # Including shipping
+    }
+    
+    # Render HTML content and a plain text version
+    html_content = render_to_string('emails/order_confirmation.html', context)
+    text_content = strip_tags(html_content)
+    
+    # Create email subject with order number
+    order_identifier = getattr(order, 'order_number', None) or f"#{getattr(order, 'id', 'N/A')}"
+    subject = f"Order Confirmation - {order_identifier}"
+    
+    msg = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[get_order_email(order)],
+        connection=connection
+    )
+    msg.attach_alternative(html_content, "text/html")
+    return msg
+
+
 def send_order_confirmation_email(order):
     """
-    Send order confirmation email to the customer with enhanced error handling
+    Send order confirmation email to the customer immediately.
+    
+    Prefer queue_order_confirmation_email in request handlers; this opens
+    an SMTP connection and waits for the send.
     
     Args:
         order: Order instance
@@ -41,122 +110,19 @@ def send_order_confirmation_email(order):
         error_msg = "No order provided"
         logger.error(error_msg)
         return False, error_msg
-        
-    # Get email from order or user if available
-    email = getattr(order, 'email', None)
-    if not email and hasattr(order, 'user') and order.user and hasattr(order.user, 'email'):
-        email = order.user.email
-        logger.info(f"Using user's email from account: {email}")
     
-    if not email or not email.strip():
+    email = get_order_email(order)
+    if not email:
         error_msg = f"No valid email address found for order {getattr(order, 'id', 'unknown')}. Email: {email}"
         logger.error(error_msg)
         return False, error_msg
-
+    
     try:
-        logger.info("Testing SMTP connection...")
-        smtp_success, smtp_message = test_email_connection()
-        logger.info(f"SMTP Connection Test: {'Success' if smtp_success else 'Failed'} - {smtp_message}")
-        if not smtp_success:
-            return False, f"SMTP Connection Error: {smtp_message}"
-            
-        logger.info(f"Preparing email for order {getattr(order, 'id', 'unknown')}")
-        logger.info(f"Recipient: {order.email}")
-
-        # Prepare context for the email template
-        try:
-            context = {
-                'order': order,
-                'order_items': order.items.all(),
-                'shipping_address': {
-                    'name': f"{order.first_name} {order.last_name}",
-                    'email': order.email,
-                    'phone': order.phone or 'N/A',
-                    'address': f"{order.address}",
-                    'address2': f"{order.address2}" if order.address2 else '',
-                    'city': order.city,
-                    'state': order.state,
-                    'postal_code': order.postal_code,
-                    'country': order.country,
-                },
-                'subtotal': order.get_total_cost(),
-                'shipping_cost': Decimal('99.00'),  # Fixed shipping cost as Decimal
-                'total': order.get_total_cost() + Decimal('99.00')  # Including shipping
-            }
-            
-            # Render HTML content
-            html_content = render_to_string('emails/order_confirmation.html', context)
-            
-            # Create plain text version
-            text_content = strip_tags(html_content)
-            
-            # Create email subject with order number
-            order_identifier = getattr(order, 'order_number', None) or f"#{getattr(order, 'id', 'N/A')}"
-            subject = f"Order Confirmation - {order_identifier}"
-            
-            # Get email settings
-            from_email = settings.DEFAULT_FROM_EMAIL
-            to_email = [order.email]
-            
-            logger.info(f"Email settings - From: {from_email}, To: {to_email}, Host: {settings.EMAIL_HOST}, Port: {settings.EMAIL_PORT}")
-            logger.info(f"Using TLS: {settings.EMAIL_USE_TLS}, Username: {settings.EMAIL_HOST_USER}")
-            logger.info(f"Subject: {subject}")
-            
-            logger.info(f"Preparing to send order confirmation email to {to_email} for order {order_identifier}")
-            
-            # Create email message with explicit connection
-            logger.info("Creating SMTP connection...")
-            try:
-                connection = get_connection(
-                    host=settings.EMAIL_HOST,
-                    port=settings.EMAIL_PORT,
-                    username=settings.EMAIL_HOST_USER,
-                    password=settings.EMAIL_HOST_PASSWORD,
-                    use_tls=settings.EMAIL_USE_TLS,
-                    timeout=10
-                )
-                logger.info("SMTP connection created successfully")
-                
-                # Create and send email
-                msg = EmailMultiAlternatives(
-                    subject=subject,
-                    body=text_content,
-                    from_email=from_email,
-                    to=to_email,
-                    connection=connection
-                )
-                msg.attach_alternative(html_content, "text/html")
-                
-                # Send email with timeout
-                logger.info("Sending email...")
-                try:
-                    msg.send(fail_silently=False)
-                    logger.info("Email sent successfully")
-                    
-                    # Close the connection
-                    connection.close()
-                    
-                    logger.info(f"Successfully sent order confirmation email for order {order_identifier} to {order.email}")
-                    return True, "Email sent successfully"
-                    
-                except Exception as e:
-                    logger.error(f"Failed to send email: {str(e)}", exc_info=True)
-                    return False, f"Failed to send email: {str(e)}"
-                finally:
-                    try:
-                        connection.close()
-                    except Exception as e:
-                        logger.warning(f"Error closing connection: {str(e)}")
-            
-            except Exception as e:
-                logger.error(f"Failed to create SMTP connection: {str(e)}", exc_info=True)
-                return False, f"Failed to create SMTP connection: {str(e)}"
-            
-        except Exception as e:
-            error_msg = f"Error preparing email for order {getattr(order, 'id', 'unknown')}: {str(e)}"
-            logger.error(error_msg, exc_info=True)
-            return False, error_msg
-            
+        msg = build_order_confirmation_email(order)
+        msg.send(fail_silently=False)
+        logger.info(f"Successfully sent order confirmation email for order {getattr(order, 'order_number', order.id)} to {email}")
+        return True, "Email sent successfully"
+    
     except smtplib.SMTPAuthenticationError as e:
         error_msg = f"SMTP Authentication failed for order {getattr(order, 'id', 'unknown')}: {str(e)}"
         logger.error(error_msg, exc_info=True)
@@ -171,3 +137,144 @@ def send_order_confirmation_email(order):
         error_msg = f"Unexpected error sending email for order {getattr(order, 'id', 'unknown')}: {str(e)}"
         logger.error(error_msg, exc_info=True)
         return False, error_msg
+
+
+# Builders used by the outbox worker, keyed by EmailOutbox.kind
+OUTBOX_BUILDERS = {
+    'order_confirmation': lambda entry, connection: build_order_confirmation_email(entry.order, connection),
+}
+
+
+def queue_order_confirmation_email(order):
+    """
+    Queue the order confirmation email in the outbox.
+    
+    Only inserts a row; the send_queued_emails worker sends it. Queuing the
+    same order twice (e.g. a refreshed success page) is a no-op.
+    
+    Returns:
+        tuple: (queued: bool, message: str)
+    """
+    from .models import EmailOutbox
+    
+    email = get_order_email(order)
+    if not email:
+        error_msg = f"No valid email address found for order {getattr(order, 'id', 'unknown')}"
+        logger.error(error_msg)
+        return False, error_msg
+    
+    try:
+        with transaction.atomic():
+            _, created = EmailOutbox.objects.get_or_create(
+                dedupe_key=f"order_confirmation:{order.pk}",
+                defaults={
+                    'kind': EmailOutbox.Kind.ORDER_CONFIRMATION,
+                    'order': order,
+                    'to_email': email,
+                }
+            )
+    except IntegrityError:
+        # Queued concurrently by another request
+        created = False
+    
+    if created:
+        logger.info(f"Queued order confirmation email for order {order.pk} to {email}")
+        return True, "Email queued"
+    return True, "Email already queued"
+
+
+def get_retry_delay(attempts):
+    """
+    Return the backoff before retry number ``attempts`` (1-based).
+    
+    Exponential from EMAIL_OUTBOX_RETRY_DELAY seconds, capped at
+    EMAIL_OUTBOX_MAX_RETRY_DELAY.
+    """
+    return work_queue.get_retry_delay(
+        attempts,
+        getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60),
+        getattr(settings, 'EMAIL_OUTBOX_MAX_RETRY_DELAY', 6 * 60 * 60),
+    )
+
+
+def claim_queued_emails(batch_size):
+    """
+    Claim a batch of due outbox entries for this worker.
+    
+    Claimed entries are marked as sending and leased for
+    EMAIL_OUTBOX_LEASE seconds; entries whose lease expired (a crashed
+    worker) become due again.
+    """
+    from .models import EmailOutbox
+    
+    return work_queue.claim_due(
+        EmailOutbox.objects.select_related('order'),
+        EmailOutbox.Status.SENDING,
+        getattr(settings, 'EMAIL_OUTBOX_LEASE', 5 * 60),
+        batch_size,
+    )
+
+
+def _record_failure(entry, error, max_attempts):
+    work_queue.record_failure(entry, error, max_attempts, get_retry_delay, f"Email {entry.pk}")
+
+
+def send_queued_emails(batch_size=50, max_attempts=None):
+    """
+    Send one batch of due outbox emails over a single connection.
+    
+    Args:
+        batch_size: maximum number of emails to send
+        max_attempts: attempts before an email is marked failed
+            (default EMAIL_OUTBOX_MAX_ATTEMPTS or 5)
+    
+    Returns:
+        dict: counts of 'sent', 'retried' and 'failed' emails
+    """
+    from .models import EmailOutbox
+    
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    counts = {'sent': 0, 'retried': 0, 'failed': 0}
+    
+    entries = claim_queued_emails(batch_size)
+    if not entries:
+        return counts
+    
+    def fail(entry, error):
+        _record_failure(entry, error, max_attempts)
+        counts['failed' if entry.status == EmailOutbox.Status.FAILED else 'retried'] += 1
+    
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not open email connection: {str(e)}", exc_info=True)
+        for entry in entries:
+            fail(entry, f"Connection failed: {str(e)}")
+        return counts
+    
+    try:
+        for entry in entries:
+            try:
+                msg = OUTBOX_BUILDERS[entry.kind](entry, connection)
+                msg.to = [entry.to_email]
+                if not connection.send_messages([msg]):
+                    raise smtplib.SMTPException("Message was not accepted")
+            except Exception as e:
+                fail(entry, str(e))
+                continue
+            entry.status = EmailOutbox.Status.SENT
+            entry.sent_at = timezone.now()
+            entry.attempts += 1
+            entry.last_error = ''
+            entry.save(update_fields=['status', 'sent_at', 'attempts', 'last_error'])
+            counts['sent'] += 1
+    finally:
+        try:
+            connection.close()
+        except Exception as e:
+            logger.warning(f"Error closing connection: {str(e)}")
+    
+    logger.info(f"Email outbox batch: {counts['sent']} sent, {counts['retried']} retried, {counts['failed']} failed")
+    return counts
@@ -0,0 +1,292 @@
+"""
+In-memory facet index for the product listing filters.
+
+Each facet value of ``store.filters.ProductFilter`` (category, price range,
+care level, featured, bestseller, in stock) is kept as a bitset of product
+IDs, using plain Python ints with bit ``n`` set for product ``n``. Combined
+filters are bitwise ANDs and facet counts are popcounts, so any selection and
+every option count are answered in one pass without touching the database.
+
+The index lives in each process. Product signals apply changes to it
+incrementally once they commit; changes made by other processes are picked
+up through the catalog cache version, which triggers a rebuild on next use.
+Writes that bypass the signals (e.g. stock reserved with ``update()``) are
+picked up by rebuilding any index older than FACET_INDEX_MAX_AGE seconds.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .catalog_cache import get_catalog_version
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of each ProductFilter price bucket; None means unbounded
+PRICE_BUCKETS = (
+    ('0-500', 500),
+    ('500-1000', 1000),
+    ('1000-2000', 2000),
+    ('2000-5000', 5000),
+    ('5000-', None),
+)
+
+FACETS = ('category', 'price_range', 'difficulty', 'featured', 'bestseller', 'in_stock')
+
+INDEX_FIELDS = (
+    'id', 'category_id', 'price', 'difficulty_level', 'is_featured',
+    'is_bestseller', 'quantity', 'allow_backorder',
+)
+
+# Product fields that decide a product's facet values and whether it is indexed
+FACET_FIELDS = frozenset({
+    'category', 'category_id', 'price', 'difficulty_level', 'is_featured',
+    'is_bestseller', 'quantity', 'allow_backorder', 'is_active',
+})
+
+
+def price_bucket(price):
+    """Return the ProductFilter price range key a price falls into."""
+    for key, upper in PRICE_BUCKETS:
+        if upper is None or price <= upper:
+            return key
+    return None
+
+
+def iter_ids(bits):
+    """Yield the product IDs set in a bitset, in ascending order."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def facet_values(row):
+    """
+    Return ``(facet, value)`` pairs describing one product row.
+
+    Args:
+        row: dict with the fields listed in INDEX_FIELDS
+
+    Boolean facets only record the True value, as in ProductFilter an
+    unticked checkbox means "don't filter".
+    """
+    values = [
+        ('price_range', price_bucket(row['price'])),
+        ('difficulty', row['difficulty_level']),
+    ]
+    if row['category_id'] is not None:
+        values.append(('category', row['category_id']))
+    if row['is_featured']:
+        values.append(('featured', True))
+    if row['is_bestseller']:
+        values.append(('bestseller', True))
+    if row['quantity'] > 0 or row['allow_backorder']:
+        values.append(('in_stock', True))
+    return values
+
+
+class FacetResult:
+    """Products matching a facet selection, plus per-option counts."""
+
+    def __init__(self, bits, counts):
+        self.bits = bits
+        self.counts = counts
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def ids(self):
+        return list(iter_ids(self.bits))
+
+
+class FacetIndex:
+    """
+    Bitsets of active product IDs for every facet option.
+
+    ``on_hand`` holds products with stock (``quantity > 0``), the base set
+    shown on the product list pages.
+    """
+
+    def __init__(self, rows=(), version=None):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.universe = 0
+        self.on_hand = 0
+        self.facets = {facet: {} for facet in FACETS}
+        self._lock = threading.Lock()
+        for row in rows:
+            self._add(row)
+
+    @classmethod
+    def build(cls):
+        """Build an index of all active products from the database."""
+        # Read the version first so a concurrent change forces another rebuild
+        version = get_catalog_version()
+        rows = Product.objects.filter(is_active=True).values(*INDEX_FIELDS)
+        index = cls(rows, version=version)
+        logger.debug(f"Built facet index for {index.universe.bit_count()} products (v{version})")
+        return index
+
+    def _add(self, row):
+        bit = 1 << row['id']
+        self.universe |= bit
+        if row['quantity'] > 0:
+            self.on_hand |= bit
+        for facet, value in facet_values(row):
+            options = self.facets[facet]
+            options[value] = options.get(value, 0) | bit
+
+    def _discard(self, product_id):
+        mask = ~(1 << product_id)
+        self.universe &= mask
+        self.on_hand &= mask
+        for options in self.facets.values():
+            for value in list(options):
+                options[value] &= mask
+                if not options[value]:
+                    del options[value]
+
+    def update_product(self, product_id, row=None):
+        """
+        Replace a product's entries with a fresh row.
+
+        Args:
+            product_id: ID of the changed product
+            row: current values (INDEX_FIELDS), or None if the product was
+                deleted or deactivated
+        """
+        with self._lock:
+            self._discard(product_id)
+            if row is not None:
+                self._add(row)
+
+    def _selection_masks(self, selection):
+        """Return the bitset allowed by each selected facet."""
+        masks = {}
+        for facet, values in selection.items():
+            if facet not in self.facets or values in (None, '', [], ()):
+                continue
+            if not isinstance(values, (list, tuple, set, frozenset)):
+                values = [values]
+            options = self.facets[facet]
+            mask = 0
+            # Options within a facet are alternatives (e.g. several care levels)
+            for value in values:
+                mask |= options.get(value, 0)
+            masks[facet] = mask
+        return masks
+
+    def query(self, selection, base=None):
+        """
+        Match a facet selection and count every facet option.
+
+        Counts are disjunctive: an option's count applies every selected
+        facet except its own, so it tells how many products the user would
+        see after picking that option.
+
+        Args:
+            selection: dict of facet name -> value or list of values
+            base: optional bitset restricting the candidate products
+
+        Returns:
+            FacetResult
+        """
+        with self._lock:
+            base = self.universe if base is None else base & self.universe
+            masks = self._selection_masks(selection)
+
+            bits = base
+            for mask in masks.values():
+                bits &= mask
+
+            counts = {}
+            for facet, options in self.facets.items():
+                others = base
+                for other, mask in masks.items():
+                    if other != facet:
+                        others &= mask
+                counts[facet] = {
+                    value: count
+                    for value, count in (
+                        (value, (option & others).bit_count())
+                        for value, option in options.items()
+                    )
+                    if count
+                }
+        return FacetResult(bits, counts)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _is_current(index):
+    if index is None:
+        return False
+    if time.monotonic() - index.built_at >= getattr(settings, 'FACET_INDEX_MAX_AGE', 300):
+        return False
+    return index.version == get_catalog_version()
+
+
+def get_facet_index():
+    """
+    Return this process's facet index, rebuilding it if the catalog changed
+    or the index is older than FACET_INDEX_MAX_AGE.
+    """
+    global _index
+    index = _index
+    if not _is_current(index):
+        with _index_lock:
+            index = _index
+            if not _is_current(index):
+                index = _index = FacetIndex.build()
+    return index
+
+
+def affects_facets(product, update_fields=None):
+    """
+    Return whether saving a product can change its facet values.
+
+    Must run inside save() (post_save), while the tracker still holds the
+    quantity the product was loaded with.
+
+    Args:
+        product: the Product being saved
+        update_fields: the ``update_fields`` passed to save(), if any
+
+    Returns:
+        bool: False for saves limited to other fields, and for stock
+        changes that leave the product on the same side of zero
+    """
+    fields = FACET_FIELDS if update_fields is None else FACET_FIELDS.intersection(update_fields)
+    if fields == {'quantity'}:
+        previous = product.tracker.previous('quantity') or 0
+        return (previous > 0) != (product.quantity > 0)
+    return bool(fields)
+
+
+def apply_product_change(product_id, refresh=True):
+    """
+    Refresh one product in the local index after its change committed.
+
+    Runs after the catalog version bump for the same change. If that bump is
+    the only one since the index was built, the index adopts the new version
+    instead of being rebuilt; otherwise it is left to rebuild on next use.
+
+    Args:
+        product_id: ID of the changed product
+        refresh: False when the change can't affect the product's facets, so
+            only the version is adopted and the product row isn't re-read
+    """
+    index = _index
+    if index is None:
+        return
+    if refresh:
+        row = Product.objects.filter(pk=product_id, is_active=True).values(*INDEX_FIELDS).first()
+        index.update_product(product_id, row)
+    version = get_catalog_version()
+    if index.version is not None and version == index.version + 1:
+        index.version = version
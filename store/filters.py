@@ -46,6 +46,7 @@ class ProductFilter(django_filters.FilterSet):
     featured = django_filters.BooleanFilter(
         field_name='is_featured',
         label='Featured Items Only',
+        method='filter_checked',
         widget=forms.CheckboxInput
     )
     
@@ -53,6 +54,7 @@ class ProductFilter(django_filters.FilterSet):
     bestseller = django_filters.BooleanFilter(
         field_name='is_bestseller',
         label='Bestsellers Only',
+        method='filter_checked',
         widget=forms.CheckboxInput
     )
     
@@ -86,3 +88,25 @@ class ProductFilter(django_filters.FilterSet):
             # Check if the product is in stock based on quantity > 0 or allow_backorder is True
             return queryset.filter(Q(quantity__gt=0) | Q(allow_backorder=True))
         return queryset
+    
+    def filter_checked(self, queryset, name, value):
+        # An unticked checkbox means "don't filter", not "exclude"
+        if value:
+            return queryset.filter(**{name: True})
+        return queryset
+    
+    def facet_selection(self):
+        """
+        Return the bound filter values as a selection for the facet index
+        (see store.facets). Call only after is_valid().
+        """
+        data = self.form.cleaned_data
+        category = data.get('category')
+        return {
+            'category': category.pk if category else None,
+            'price_range': data.get('price_range') or None,
+            'difficulty': data.get('difficulty') or None,
+            'featured': True if data.get('featured') else None,
+            'bestseller': True if data.get('bestseller') else None,
+            'in_stock': True if data.get('in_stock') else None,
+        }
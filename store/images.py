@@ -0,0 +1,278 @@
+"""
+Resized and WebP derivatives of uploaded images.
+
+Product, product gallery and profile images are uploaded at whatever size
+the camera produced. Once an upload commits, ``schedule_derivatives()``
+hands the file to a background process pool that writes each
+IMAGE_DERIVATIVE_WIDTHS size in the source format (JPEG, or PNG for images
+with transparency) and as WebP. Derivatives are named after a hash of the
+source content::
+
+    <IMAGE_DERIVATIVE_ROOT>/<hash[:2]>/<hash>-<width>.<jpg|png|webp>
+
+so identical uploads share files and a replaced image never serves stale
+ones. A small JSON index per source file records the hash and the widths
+written; ``get_derivatives()`` reads it once and caches it, and the
+``responsive_image`` template tag turns it into ``srcset`` attributes
+(``{% load image_tags %}``).
+Until an image's derivatives exist the original is served.
+
+``python manage.py build_image_derivatives`` builds them for existing images.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_KEY = 'images:derivatives:{digest}'
+
+DEFAULT_WIDTHS = {'thumbnail': 160, 'card': 400, 'large': 800}
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def get_derivative_root():
+    """Return the directory holding image derivatives."""
+    return str(getattr(settings, 'IMAGE_DERIVATIVE_ROOT', os.path.join(settings.MEDIA_ROOT, 'derivatives')))
+
+
+def get_derivative_url():
+    return getattr(settings, 'IMAGE_DERIVATIVE_URL', f"{settings.MEDIA_URL}derivatives/")
+
+
+def get_derivative_widths():
+    """Return the named derivative widths, e.g. {'card': 400}."""
+    return getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', DEFAULT_WIDTHS)
+
+
+def _name_digest(name):
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()
+
+
+def _index_path(root, name):
+    return os.path.join(root, 'index', f"{_name_digest(name)}.json")
+
+
+def _write_atomic(path, content):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _encode(image, ext):
+    buffer = BytesIO()
+    if ext == 'webp':
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    elif ext == 'png':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def build_derivatives(name, source_path, root=None, widths=None):
+    """
+    Write the derivatives of one image and its index; runs in worker processes.
+
+    Images are never upscaled: widths at or above the source width are
+    replaced by a single re-encode at the source width.
+
+    Args:
+        name: storage name of the source (the image field's ``name``)
+        source_path: filesystem path of the source
+        root: derivative directory, IMAGE_DERIVATIVE_ROOT by default
+        widths: iterable of widths, the IMAGE_DERIVATIVE_WIDTHS values by default
+
+    Returns:
+        dict: the index entry ('hash', 'ext', 'width', 'widths')
+    """
+    root = root or get_derivative_root()
+    widths = sorted(set(widths or get_derivative_widths().values()))
+
+    with open(source_path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()[:32]
+    directory = os.path.join(root, digest[:2])
+
+    with Image.open(BytesIO(content)) as source:
+        image = ImageOps.exif_transpose(source)
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        ext = 'png' if has_alpha else 'jpg'
+
+        targets = [width for width in widths if width < image.width]
+        if len(targets) < len(widths):
+            targets.append(image.width)
+        for width in targets:
+            resized = None
+            for target_ext in (ext, 'webp'):
+                path = os.path.join(directory, f"{digest}-{width}.{target_ext}")
+                if os.path.exists(path):
+                    continue
+                if resized is None:
+                    height = max(1, round(image.height * width / image.width))
+                    resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                _write_atomic(path, _encode(resized, target_ext))
+        source_width = image.width
+
+    entry = {'hash': digest, 'ext': ext, 'width': source_width, 'widths': targets}
+    _write_atomic(_index_path(root, name), json.dumps(entry).encode('utf-8'))
+    return entry
+
+
+def build_derivatives_for(name, source_path):
+    """
+    Build one image's derivatives, logging instead of raising; used by pools.
+
+    Returns:
+        dict or None if the source is missing or could not be processed
+    """
+    try:
+        return build_derivatives(name, source_path)
+    except FileNotFoundError:
+        logger.warning(f"Image derivatives not built: {name} does not exist")
+    except Exception as e:
+        logger.error(f"Error building derivatives for {name}: {str(e)}", exc_info=True)
+    return None
+
+
+def get_derivatives(name):
+    """
+    Return the index entry of an image's derivatives, reading the cache first.
+
+    Args:
+        name: storage name of the source image
+
+    Returns:
+        dict or None if the derivatives have not been built
+    """
+    if not name:
+        return None
+    key = DERIVATIVES_KEY.format(digest=_name_digest(name))
+    entry = cache.get(key)
+    if entry is None:
+        try:
+            with open(_index_path(get_derivative_root(), name), 'rb') as f:
+                entry = json.loads(f.read())
+            timeout = getattr(settings, 'IMAGE_DERIVATIVE_CACHE_TIMEOUT', 60 * 60 * 24)
+        except (OSError, ValueError):
+            # Not built yet; check again soon
+            entry = {}
+            timeout = getattr(settings, 'IMAGE_DERIVATIVE_MISSING_TIMEOUT', 60)
+        cache.set(key, entry, timeout)
+    return entry or None
+
+
+def _derivative_url(entry, width, ext):
+    digest = entry['hash']
+    return f"{get_derivative_url()}{digest[:2]}/{digest}-{width}.{ext}"
+
+
+def get_image_sources(name, size='card'):
+    """
+    Return the URLs a responsive ``<img>`` needs for an image.
+
+    Args:
+        name: storage name of the source image
+        size: a key of IMAGE_DERIVATIVE_WIDTHS; ``src`` is the derivative
+            closest to it, for browsers that ignore ``srcset``
+
+    Returns:
+        dict: 'src', 'srcset' and 'webp_srcset', or None if the derivatives
+        have not been built
+    """
+    entry = get_derivatives(name)
+    if not entry or not entry.get('widths'):
+        return None
+    widths = entry['widths']
+    wanted = get_derivative_widths().get(size, max(widths))
+    # The smallest width covering the wanted size, else the largest there is
+    src_width = min(widths, key=lambda width: (width < wanted, abs(width - wanted)))
+    return {
+        'src': _derivative_url(entry, src_width, entry['ext']),
+        'srcset': ', '.join(f"{_derivative_url(entry, width, entry['ext'])} {width}w" for width in widths),
+        'webp_srcset': ', '.join(f"{_derivative_url(entry, width, 'webp')} {width}w" for width in widths),
+    }
+
+
+def forget_derivatives(names):
+    """Drop cached index entries, such as cached "not built yet" markers."""
+    cache.delete_many([DERIVATIVES_KEY.format(digest=_name_digest(name)) for name in names])
+
+
+def _built(name, future):
+    with _executor_lock:
+        _pending.discard(name)
+    if future.exception() is not None:
+        logger.error(f"Error building derivatives for {name}: {str(future.exception())}")
+    # Readers may have cached the image as not built yet
+    forget_derivatives([name])
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 1))
+        return _executor
+
+
+def _submit(name, source_path):
+    if not getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 1):
+        # No pool: build in this process (development and tests)
+        build_derivatives_for(name, source_path)
+        forget_derivatives([name])
+        return
+    executor = _get_executor()
+    with _executor_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    future = executor.submit(build_derivatives_for, name, source_path)
+    future.add_done_callback(lambda f: _built(name, f))
+
+
+def schedule_derivatives(image):
+    """
+    Build an image field's derivatives in the background once the current
+    transaction commits. Does nothing if they already exist.
+
+    Args:
+        image: ImageField value (FieldFile)
+    """
+    name = getattr(image, 'name', None)
+    if not name or get_derivatives(name):
+        return
+    try:
+        source_path = image.path
+    except NotImplementedError:
+        # Remote storage; derivatives are only built for local files
+        return
+    if not os.path.exists(source_path):
+        return
+    transaction.on_commit(lambda: _submit(name, source_path))
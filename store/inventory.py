@@ -0,0 +1,169 @@
+"""
+Inventory reservation for order placement.
+
+Stock is decremented with conditional, set-based UPDATEs
+(``quantity = quantity - n WHERE quantity >= n``), so concurrent checkouts
+can never oversell and no row is read before it is written. All lines of an
+order are reserved in one transaction: if any line fails, every decrement is
+rolled back and the caller gets per-line results explaining why.
+``release_stock()`` returns a reservation whose order could not be placed.
+"""
+import logging
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .catalog_cache import bump_catalog_version
+from .facets import apply_product_change
+from .models import Product
+from .object_cache import invalidate_products
+
+logger = logging.getLogger(__name__)
+
+
+class LineReservation:
+    """Result of reserving stock for one product."""
+
+    def __init__(self, product_id, quantity):
+        self.product_id = product_id
+        self.quantity = quantity
+        self.reserved = False
+        self.tracked = True
+        # Stock left for this product when a reservation fails
+        self.available = None
+        self.name = None
+
+    def __repr__(self):
+        return (
+            f"LineReservation(product_id={self.product_id}, quantity={self.quantity}, "
+            f"reserved={self.reserved})"
+        )
+
+
+class ReservationResult:
+    """Per-line outcome of reserve_stock()."""
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    @property
+    def success(self):
+        return all(line.reserved for line in self.lines)
+
+    @property
+    def failed(self):
+        return [line for line in self.lines if not line.reserved]
+
+    def __bool__(self):
+        return self.success
+
+
+def _group_lines(items):
+    """Sum quantities per product, ordered by product ID to keep lock order stable."""
+    quantities = {}
+    for product_id, quantity in items:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return OrderedDict(sorted(quantities.items()))
+
+
+def _stock_changed(product_ids):
+    """Refresh catalog caches after a committed stock change."""
+    bump_catalog_version()
+    invalidate_products(product_ids)
+    for product_id in product_ids:
+        apply_product_change(product_id)
+
+
+def reserve_stock(items):
+    """
+    Atomically decrement stock for a set of order lines.
+
+    Products that don't track quantity are accepted without being
+    decremented. Inactive products are never reserved.
+
+    Args:
+        items: iterable of (product_id, quantity) pairs; a product may appear
+            more than once
+
+    Returns:
+        ReservationResult: ``success`` is True only if every line was
+        reserved; otherwise nothing was changed
+    """
+    lines = [
+        LineReservation(product_id, quantity)
+        for product_id, quantity in _group_lines(items).items()
+    ]
+    if not lines:
+        return ReservationResult(lines)
+
+    now = timezone.now()
+    with transaction.atomic():
+        products = Product.objects.filter(is_active=True)
+        tracking = dict(
+            products.filter(pk__in=[line.product_id for line in lines]).values_list(
+                'pk', 'track_quantity'
+            )
+        )
+
+        for line in lines:
+            if line.product_id not in tracking:
+                continue
+            if not tracking[line.product_id]:
+                line.tracked = False
+                line.reserved = True
+                continue
+            # The WHERE clause does the stock check in the same statement
+            line.reserved = bool(
+                products.filter(
+                    pk=line.product_id,
+                    track_quantity=True,
+                    quantity__gte=line.quantity
+                ).update(quantity=F('quantity') - line.quantity, updated_at=now)
+            )
+
+        result = ReservationResult(lines)
+        if not result.success:
+            transaction.set_rollback(True)
+        else:
+            reserved_ids = [line.product_id for line in lines if line.tracked]
+            if reserved_ids:
+                transaction.on_commit(lambda: _stock_changed(reserved_ids))
+
+    if not result.success:
+        # Report what is actually left, read after the rollback
+        failed = {line.product_id: line for line in result.failed}
+        for pk, name, quantity in Product.objects.filter(pk__in=failed).values_list(
+            'pk', 'name', 'quantity'
+        ):
+            failed[pk].name = name
+            failed[pk].available = quantity
+        logger.warning(
+            "Stock reservation failed for products "
+            f"{', '.join(str(pk) for pk in failed)}; no stock was changed"
+        )
+    return result
+
+
+def release_stock(items):
+    """
+    Return reserved stock, e.g. when payment setup fails after reserve_stock().
+
+    Args:
+        items: iterable of (product_id, quantity) pairs
+
+    Returns:
+        list: IDs of the products whose stock was increased
+    """
+    now = timezone.now()
+    released = []
+    with transaction.atomic():
+        for product_id, quantity in _group_lines(items).items():
+            if Product.objects.filter(pk=product_id, track_quantity=True).update(
+                quantity=F('quantity') + quantity, updated_at=now
+            ):
+                released.append(product_id)
+        if released:
+            transaction.on_commit(lambda: _stock_changed(released))
+    return released
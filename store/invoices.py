@@ -0,0 +1,281 @@
+"""
+Invoice PDFs, rendered once per order version and served from disk.
+
+Everything printed on an invoice is collected by ``get_invoice_data()``
+(one query for the order lines) and hashed. The PDF is stored as
+``<INVOICE_ROOT>/<order id>/<hash>.pdf``, so a download only renders when
+no file exists for the current data, and the hash doubles as the ETag.
+
+Paid orders are rendered in a background thread after the payment commits
+(see ``schedule_invoice()``); ``python manage.py prerender_invoices`` renders
+a date range with a process pool.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import BytesIO
+
+from django.conf import settings
+from django.db import connection, transaction
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes so existing invoices are re-rendered
+INVOICE_LAYOUT_VERSION = 1
+
+GST_RATE = Decimal('0.18')
+SHIPPING_FEE = Decimal('99.00')
+
+COMPANY_INFO = {
+    'name': 'Angel Plants',
+    'address': '123 Plant Street, Garden City',
+    'phone': '+91 1234567890',
+    'email': 'info@angelplants.com',
+    'gstin': '27AABCU1234C1Z5'
+}
+
+StoredInvoice = namedtuple('StoredInvoice', ['path', 'digest', 'rendered'])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_invoice_root():
+    """Return the directory holding rendered invoices."""
+    return str(getattr(settings, 'INVOICE_ROOT', os.path.join(settings.BASE_DIR, 'invoices')))
+
+
+def get_invoice_data(order):
+    """
+    Collect everything printed on an order's invoice.
+
+    Args:
+        order: Order instance
+
+    Returns:
+        dict: customer details, lines as (name, quantity, price, amount)
+        tuples, and subtotal, tax, shipping and total
+    """
+    lines = []
+    subtotal = Decimal('0')
+    for name, quantity, price in order.items.order_by('id').values_list('product__name', 'quantity', 'price'):
+        amount = quantity * price
+        lines.append((name, quantity, price, amount))
+        subtotal += amount
+    tax = (subtotal * GST_RATE).quantize(Decimal('0.01'))
+
+    return {
+        'order_number': order.order_number,
+        'date': order.created_at.strftime("%B %d, %Y"),
+        'name': f"{order.first_name} {order.last_name}",
+        'address': order.address,
+        'city_line': f"{order.city}, {order.state} {order.postal_code}",
+        'country': order.country,
+        'paid': bool(order.payment_status),
+        'lines': lines,
+        'subtotal': subtotal,
+        'tax': tax,
+        'shipping': SHIPPING_FEE,
+        'total': (subtotal + tax + SHIPPING_FEE).quantize(Decimal('0.01')),
+    }
+
+
+def get_invoice_digest(data):
+    """Return the content hash identifying one version of an invoice."""
+    payload = json.dumps([INVOICE_LAYOUT_VERSION, COMPANY_INFO, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _table_style(*extra):
+    return TableStyle([
+        ('TEXTCOLOR', (0,0), (-1,-1), colors.black),
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+        ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
+        ('FONTSIZE', (0,0), (-1,-1), 10),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 8),
+        ('GRID', (0,0), (-1,-1), 1, colors.black),
+        *extra
+    ])
+
+
+def render_invoice_pdf(data):
+    """
+    Render invoice data (from get_invoice_data) to PDF.
+
+    Returns:
+        bytes: the PDF document
+    """
+    buffer = BytesIO()
+    # invariant drops the timestamps ReportLab embeds, so equal data gives equal bytes
+    doc = SimpleDocTemplate(buffer, pagesize=A4, invariant=True)
+
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='CenterAlign', parent=styles['Normal'], alignment=1, fontSize=14, spaceAfter=20))
+
+    story = [
+        Paragraph(f"<strong>{COMPANY_INFO['name']}</strong>", styles['CenterAlign']),
+        Paragraph(COMPANY_INFO['address'], styles['Normal']),
+        Paragraph(f"Phone: {COMPANY_INFO['phone']}", styles['Normal']),
+        Paragraph(f"Email: {COMPANY_INFO['email']}", styles['Normal']),
+        Paragraph(f"GSTIN: {COMPANY_INFO['gstin']}", styles['Normal']),
+        Spacer(1, 20),
+        Paragraph("INVOICE", styles['CenterAlign']),
+        Spacer(1, 20),
+    ]
+
+    billing_table = Table([
+        ["Bill To:", data['name']],
+        ["", data['address']],
+        ["", data['city_line']],
+        ["", data['country']],
+        ["Invoice Number:", data['order_number']],
+        ["Date:", data['date']],
+        ["Payment Status:", "Paid" if data['paid'] else "Unpaid"]
+    ], colWidths=[100, 400])
+    billing_table.setStyle(_table_style())
+    story += [billing_table, Spacer(1, 20)]
+
+    items_data = [['Item', 'Quantity', 'Price', 'Subtotal']]
+    for name, quantity, price, amount in data['lines']:
+        items_data.append([name, str(quantity), f"₹{price}", f"₹{amount}"])
+    items_table = Table(items_data)
+    items_table.setStyle(_table_style(
+        ('BACKGROUND', (0,0), (-1,0), colors.grey),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ))
+    story += [items_table, Spacer(1, 20)]
+
+    totals_table = Table([
+        ["Subtotal", f"₹{data['subtotal']}"],
+        ["Shipping", f"₹{data['shipping']}"],
+        ["GST (18%)", f"₹{data['tax']}"],
+        ["Total Amount", f"₹{data['total']}"]
+    ], colWidths=[300, 200])
+    totals_table.setStyle(_table_style(
+        ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
+    ))
+    story.append(totals_table)
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _write_atomic(path, content):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _prune_versions(directory, keep):
+    """Remove the invoice versions older than the one ``keep`` replaced."""
+    versions = []
+    for name in os.listdir(directory):
+        if name.endswith('.pdf') and name != keep:
+            try:
+                versions.append((os.path.getmtime(os.path.join(directory, name)), name))
+            except OSError:
+                # Pruned by a concurrent render
+                pass
+    # The newest of the others is the previous version
+    for _, name in sorted(versions, reverse=True)[1:]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def get_invoice(order):
+    """
+    Return the stored PDF for the current version of an order's invoice,
+    rendering it if needed.
+
+    Rendering keeps the version it replaces, which a concurrent download
+    may be about to open, and removes any older ones.
+
+    Args:
+        order: Order instance
+
+    Returns:
+        StoredInvoice: path, digest and whether it was rendered by this call
+    """
+    data = get_invoice_data(order)
+    digest = get_invoice_digest(data)
+    directory = os.path.join(get_invoice_root(), str(order.pk))
+    path = os.path.join(directory, f"{digest}.pdf")
+    if os.path.exists(path):
+        return StoredInvoice(path, digest, False)
+
+    _write_atomic(path, render_invoice_pdf(data))
+    _prune_versions(directory, keep=os.path.basename(path))
+    logger.info(f"Rendered invoice for order {order.order_number} ({digest[:12]})")
+    return StoredInvoice(path, digest, True)
+
+
+def render_invoice_for(order_id):
+    """
+    Render the invoice of an order by ID; used by background workers.
+
+    Returns:
+        StoredInvoice or None if the order does not exist or rendering failed
+    """
+    try:
+        order = Order.objects.get(pk=order_id)
+        return get_invoice(order)
+    except Order.DoesNotExist:
+        logger.warning(f"Invoice not rendered: order {order_id} does not exist")
+    except Exception as e:
+        logger.error(f"Error rendering invoice for order {order_id}: {str(e)}", exc_info=True)
+    return None
+
+
+def _render_in_background(order_id):
+    try:
+        render_invoice_for(order_id)
+    finally:
+        # Each worker thread holds its own connection; don't leak it
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'INVOICE_RENDER_WORKERS', 1),
+                thread_name_prefix='invoice-render'
+            )
+        return _executor
+
+
+def schedule_invoice(order_id):
+    """
+    Render an order's invoice in a background thread once the current
+    transaction commits.
+    """
+    transaction.on_commit(lambda: _get_executor().submit(_render_in_background, order_id))
+
+
+def close_worker_connections():
+    """Process pool initializer: drop database connections inherited from the parent."""
+    from django.db import connections
+    connections.close_all()
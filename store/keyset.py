@@ -0,0 +1,171 @@
+"""
+Keyset (cursor) pagination for long, newest-first lists.
+
+Instead of skipping rows with OFFSET, each page continues from the
+(timestamp, id) of the last row of the page before it, so any page costs
+the same indexed range scan as the first one. Pages are addressed by an
+opaque cursor rather than a number, and the rows are never counted.
+"""
+import base64
+import binascii
+import logging
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Cursor directions: rows older than the key, or newer than it
+AFTER = 'a'
+BEFORE = 'b'
+
+
+class InvalidCursor(InvalidPage):
+    """Raised when a cursor cannot be decoded."""
+
+
+def encode_cursor(direction, value, pk):
+    """Return an opaque, URL-safe cursor for a (timestamp, pk) position."""
+    raw = f"{direction}|{value.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor().
+
+    Returns:
+        tuple: (direction, timestamp, pk)
+
+    Raises:
+        InvalidCursor: if the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, value, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    if direction not in (AFTER, BEFORE) or value is None:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return direction, value, pk
+
+
+class KeysetPage:
+    """
+    One page of a KeysetPaginator, usable like a Django Page in templates.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} rows>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset newest first on (``key``, pk).
+
+    ``key`` should be a DateTimeField backed by an index on (key, id) so
+    that every page is a range scan over ``per_page + 1`` index entries.
+    """
+
+    def __init__(self, queryset, per_page, key='created_at'):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.key = key
+
+    def _cursor(self, direction, row):
+        return encode_cursor(direction, getattr(row, self.key), row.pk)
+
+    def page(self, cursor=None):
+        """
+        Return the page at ``cursor``, or the newest page if it is empty.
+
+        Raises:
+            InvalidCursor: if the cursor is malformed
+        """
+        if not cursor:
+            return self._older_than(None)
+        direction, value, pk = decode_cursor(cursor)
+        if direction == AFTER:
+            return self._older_than((value, pk))
+        return self._newer_than((value, pk))
+
+    def _older_than(self, position):
+        queryset = self.queryset
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{self.key}__lt': value}) | Q(**{self.key: value, 'pk__lt': pk})
+            )
+        rows = list(queryset.order_by(f'-{self.key}', '-pk')[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return KeysetPage(
+            rows,
+            self,
+            next_cursor=self._cursor(AFTER, rows[-1]) if has_more else None,
+            previous_cursor=self._cursor(BEFORE, rows[0]) if position is not None and rows else None
+        )
+
+    def _newer_than(self, position):
+        value, pk = position
+        rows = list(self.queryset.filter(
+            Q(**{f'{self.key}__gt': value}) | Q(**{self.key: value, 'pk__gt': pk})
+        ).order_by(self.key, 'pk')[:self.per_page + 1])
+        if len(rows) <= self.per_page:
+            # Reached the newest rows; show a full first page instead of a short one
+            return self._older_than(None)
+        rows = rows[:self.per_page][::-1]
+        return KeysetPage(
+            rows,
+            self,
+            next_cursor=self._cursor(AFTER, rows[-1]),
+            previous_cursor=self._cursor(BEFORE, rows[0])
+        )
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that pages with a KeysetPaginator instead of page numbers.
+
+    The page is selected with the ``cursor`` query parameter; the context
+    keeps the usual ``paginator``, ``page_obj`` and ``is_paginated`` names.
+    """
+    cursor_kwarg = 'cursor'
+    keyset_key = 'created_at'
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, key=self.keyset_key)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            logger.warning(f"Rejected list cursor: {str(e)}")
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
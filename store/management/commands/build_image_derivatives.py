@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.images import build_derivatives_for, forget_derivatives, get_derivatives
+from store.models import Product, ProductImage, Profile
+
+
+class Command(BaseCommand):
+    help = 'Build resized and WebP derivatives of product, gallery and profile images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild images whose derivatives already exist'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of resizing processes (1 resizes in this process)'
+        )
+
+    def _sources(self):
+        """Yield (name, path) for each distinct local image file."""
+        seen = set()
+        for model, field in ((Product, 'image'), (ProductImage, 'image'), (Profile, 'profile_picture')):
+            storage = model._meta.get_field(field).storage
+            names = model.objects.exclude(**{field: ''}).values_list(field, flat=True).distinct()
+            for name in names.iterator():
+                if name in seen:
+                    continue
+                seen.add(name)
+                try:
+                    path = storage.path(name)
+                except NotImplementedError:
+                    continue
+                if os.path.exists(path):
+                    yield name, path
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        sources = [
+            (name, path) for name, path in self._sources()
+            if options['force'] or not get_derivatives(name)
+        ]
+        names = [name for name, _ in sources]
+        paths = [path for _, path in sources]
+
+        if options['workers'] == 1 or len(sources) < 2:
+            results = [build_derivatives_for(name, path) for name, path in sources]
+        else:
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                chunksize = max(1, len(sources) // (options['workers'] * 4))
+                results = list(pool.map(build_derivatives_for, names, paths, chunksize=chunksize))
+
+        # Drop cached "not built yet" entries
+        forget_derivatives(names)
+
+        failed = sum(1 for result in results if result is None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Built derivatives for {len(results) - failed} images ({failed} failed)"
+        ))
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from store.models import Order
+from store.recommendations import TOP_K, build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "bought together" product recommendations from order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=TOP_K,
+            help='Recommendations kept per product'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Only use orders from the last N days (default: all orders)'
+        )
+
+    def handle(self, *args, **options):
+        if options['top_k'] < 1:
+            raise CommandError('--top-k must be at least 1')
+
+        orders = Order.objects.exclude(status=Order.Status.CANCELLED)
+        if options['days']:
+            orders = orders.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+
+        counts = build_recommendations(top_k=options['top_k'], orders=orders)
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {counts['recommendations']} recommendations for {counts['products']} products"
+        ))
@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from store.invoices import close_worker_connections, render_invoice_for
+from store.models import Order
+from store.order_search import created_range
+
+
+class Command(BaseCommand):
+    help = 'Render and store invoice PDFs for orders created in a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date-from',
+            help='First order date to include (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--date-to',
+            help='Last order date to include (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--paid-only',
+            action='store_true',
+            help='Only render invoices of paid orders'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of rendering processes (1 renders in this process)'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        orders = Order.objects.filter(created_range(options['date_from'], options['date_to']))
+        if options['paid_only']:
+            orders = orders.filter(payment_status=True)
+        order_ids = list(orders.order_by('created_at', 'id').values_list('id', flat=True))
+
+        if options['workers'] == 1 or len(order_ids) < 2:
+            results = [render_invoice_for(order_id) for order_id in order_ids]
+        else:
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=close_worker_connections) as pool:
+                chunksize = max(1, len(order_ids) // (options['workers'] * 4))
+                results = list(pool.map(render_invoice_for, order_ids, chunksize=chunksize))
+
+        rendered = sum(1 for result in results if result and result.rendered)
+        failed = sum(1 for result in results if result is None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {rendered} invoices "
+            f"({len(results) - rendered - failed} already current, {failed} failed)"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from store.order_search import rebuild_order_search_tokens
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search tokens used by the staff and admin order lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of tokens to insert per query (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_order_search_tokens(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt order search tokens: {count} tokens"))
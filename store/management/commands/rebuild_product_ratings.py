@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.ratings import rebuild_product_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute the running rating totals of every product from the approved ratings'
+
+    def handle(self, *args, **options):
+        changed = rebuild_product_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating totals: {changed} products changed"))
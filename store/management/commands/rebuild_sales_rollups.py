@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.sales_rollups import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily, per-status and per-product sales rollup tables from order history'
+
+    def handle(self, *args, **options):
+        counts = rebuild_sales_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt sales rollups: {counts['daily']} daily rows, "
+            f"{counts['status']} status rows, {counts['product']} product rows"
+        ))
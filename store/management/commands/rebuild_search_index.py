@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from store.models import Product
+from store.search import SearchIndexError, get_index_path, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search index from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of products written to the index per batch',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Rebuilding search index at {get_index_path()}...')
+
+        products = Product.objects.filter(is_active=True).select_related(
+            'category'
+        ).prefetch_related('tags').order_by('pk')
+
+        try:
+            count = rebuild_index(products.iterator(chunk_size=options['batch_size']),
+                                  batch_size=options['batch_size'])
+        except SearchIndexError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} products'))
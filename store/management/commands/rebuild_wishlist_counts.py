@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.wishlist import rebuild_wishlist_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute every profile's stored wishlist count from the wishlist items"
+
+    def handle(self, *args, **options):
+        changed = rebuild_wishlist_counts()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt wishlist counts: {changed} profiles changed"))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.email_utils import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Send queued transactional emails from the email outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Maximum number of emails to send per batch'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the outbox instead of exiting after one pass'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when the outbox is empty (with --loop)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is due before sleeping
+            while True:
+                counts = send_queued_emails(batch_size=options['batch_size'])
+                if any(counts.values()):
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Sent {counts['sent']} emails "
+                        f"({counts['retried']} to retry, {counts['failed']} failed)"
+                    ))
+                if sum(counts.values()) < options['batch_size']:
+                    break
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
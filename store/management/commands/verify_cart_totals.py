@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from store.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Verify stored cart totals against cart items and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted carts without repairing them'
+        )
+        parser.add_argument(
+            '--status',
+            default=None,
+            help='Only check carts with this status (e.g. active)'
+        )
+
+    def handle(self, *args, **options):
+        carts = Cart.objects.all()
+        if options['status']:
+            carts = carts.filter(status=options['status'])
+
+        # One aggregate query finds every cart whose stored totals are off
+        drifted = carts.annotate(
+            items_total=Coalesce(
+                Sum(F('items__quantity') * F('items__price'), output_field=DecimalField(max_digits=10, decimal_places=2)),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            ),
+            items_quantity=Coalesce(Sum('items__quantity'), Value(0)),
+        ).filter(
+            ~Q(total=F('items_total')) | ~Q(total_quantity=F('items_quantity'))
+        ).values_list('pk', 'total', 'total_quantity', 'items_total', 'items_quantity')
+
+        repaired = 0
+        for pk, total, quantity, items_total, items_quantity in drifted.iterator():
+            self.stdout.write(
+                f'Cart {pk}: stored {total} / {quantity} units, '
+                f'items {items_total} / {items_quantity} units'
+            )
+            if options['dry_run']:
+                continue
+            with transaction.atomic():
+                # Recalculate under a lock in case the cart changed meanwhile
+                cart = Cart.objects.select_for_update().get(pk=pk)
+                cart.update_totals()
+            repaired += 1
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: no carts were changed'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} carts'))
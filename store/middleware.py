@@ -0,0 +1,19 @@
+"""
+Middleware for the store app
+"""
+from .cart_utils import CartSnapshot
+
+
+class CartSnapshotMiddleware:
+    """
+    Attach a lazy, request-scoped CartSnapshot as ``request.cart_snapshot``.
+
+    Must come after SessionMiddleware and AuthenticationMiddleware. The
+    snapshot does no work until something reads the cart.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.cart_snapshot = CartSnapshot(request)
+        return self.get_response(request)
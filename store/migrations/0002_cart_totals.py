@@ -0,0 +1,45 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:26
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+
+
+def backfill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+
+    totals = CartItem.objects.values('cart_id').annotate(
+        amount=Sum(
+            F('quantity') * F('price'),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        ),
+        units=Sum('quantity')
+    )
+    for row in totals.iterator():
+        Cart.objects.filter(pk=row['cart_id']).update(
+            total=row['amount'] or Decimal('0.00'),
+            total_quantity=row['units'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Total amount for the cart', max_digits=10, verbose_name='total'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_quantity',
+            field=models.PositiveIntegerField(default=0, help_text='Number of units across all items in the cart', verbose_name='total quantity'),
+        ),
+        migrations.RunPython(backfill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_cart_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('order_confirmation', 'Order Confirmation')], max_length=50, verbose_name='kind')),
+                ('to_email', models.EmailField(max_length=254, verbose_name='recipient')),
+                ('dedupe_key', models.CharField(help_text='Prevents the same email from being queued twice', max_length=100, unique=True, verbose_name='dedupe key')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the email is next due; also the lease expiry while sending', verbose_name='next attempt at')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='sent at')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='queued_emails', to='store.order', verbose_name='order')),
+            ],
+            options={
+                'verbose_name': 'queued email',
+                'verbose_name_plural': 'email outbox',
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='store_email_status_eb522f_idx')],
+            },
+        ),
+    ]
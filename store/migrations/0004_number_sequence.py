@@ -0,0 +1,41 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:32
+
+import re
+
+from django.db import migrations, models
+
+
+def seed_order_number_sequence(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    NumberSequence = apps.get_model('store', 'NumberSequence')
+
+    # Continue after the highest existing ORD-YYYYMMDD-N number
+    highest = 0
+    for number in Order.objects.values_list('order_number', flat=True).iterator():
+        match = re.search(r'-(\d+)$', number or '')
+        if match:
+            highest = max(highest, int(match.group(1)))
+    NumberSequence.objects.create(name='order_number', next_value=highest + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='name')),
+                ('next_value', models.PositiveBigIntegerField(default=1, verbose_name='next value')),
+            ],
+            options={
+                'verbose_name': 'number sequence',
+                'verbose_name_plural': 'number sequences',
+            },
+        ),
+        migrations.RunPython(seed_order_number_sequence, migrations.RunPython.noop),
+    ]
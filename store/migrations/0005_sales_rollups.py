@@ -0,0 +1,97 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:36
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_sales_rollups(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    DailySales = apps.get_model('store', 'DailySales')
+    StatusSales = apps.get_model('store', 'StatusSales')
+    ProductSales = apps.get_model('store', 'ProductSales')
+
+    totals = {}
+    daily = Order.objects.annotate(day=TruncDate('created_at')).values('day', 'status').annotate(
+        count=Count('id'), amount=Sum('total_amount')
+    ).order_by()
+    for row in daily.iterator():
+        amount = row['amount'] or Decimal('0')
+        DailySales.objects.create(day=row['day'], status=row['status'], order_count=row['count'], total_amount=amount)
+        count, total = totals.get(row['status'], (0, Decimal('0')))
+        totals[row['status']] = (count + row['count'], total + amount)
+    for status, (count, amount) in totals.items():
+        StatusSales.objects.create(status=status, order_count=count, total_amount=amount)
+
+    products = OrderItem.objects.values('product_id').annotate(
+        count=Count('id'),
+        units=Sum('quantity'),
+        amount=Sum(F('quantity') * F('price'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    ).order_by()
+    for row in products.iterator():
+        ProductSales.objects.create(
+            product_id=row['product_id'],
+            order_count=row['count'],
+            quantity=row['units'] or 0,
+            revenue=row['amount'] or Decimal('0')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_number_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('processing', 'Processing'), ('ready_for_shipment', 'Ready for Shipment'), ('in_transit', 'In Transit'), ('out_for_delivery', 'Out for Delivery'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('return_requested', 'Return Requested'), ('returned', 'Returned'), ('refunded', 'Refunded')], max_length=20, unique=True, verbose_name='status')),
+                ('order_count', models.IntegerField(default=0, verbose_name='order count')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='total amount')),
+            ],
+            options={
+                'verbose_name': 'status sales',
+                'verbose_name_plural': 'status sales',
+                'ordering': ['-order_count'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='day')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('processing', 'Processing'), ('ready_for_shipment', 'Ready for Shipment'), ('in_transit', 'In Transit'), ('out_for_delivery', 'Out for Delivery'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('return_requested', 'Return Requested'), ('returned', 'Returned'), ('refunded', 'Refunded')], max_length=20, verbose_name='status')),
+                ('order_count', models.IntegerField(default=0, verbose_name='order count')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='total amount')),
+            ],
+            options={
+                'verbose_name': 'daily sales',
+                'verbose_name_plural': 'daily sales',
+                'ordering': ['day', 'status'],
+                'unique_together': {('day', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.IntegerField(db_index=True, default=0, verbose_name='order count')),
+                ('quantity', models.IntegerField(default=0, verbose_name='quantity')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='revenue')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='store.product', verbose_name='product')),
+            ],
+            options={
+                'verbose_name': 'product sales',
+                'verbose_name_plural': 'product sales',
+                'ordering': ['-order_count'],
+            },
+        ),
+        migrations.RunPython(backfill_sales_rollups, migrations.RunPython.noop),
+    ]
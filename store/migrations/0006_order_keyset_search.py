@@ -0,0 +1,86 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:41
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _normalize(value):
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    return ''.join(c for c in value if not unicodedata.combining(c)).casefold().strip()
+
+
+def backfill_order_search_tokens(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    OrderSearchToken = apps.get_model('store', 'OrderSearchToken')
+    words = re.compile(r'\w+', re.UNICODE)
+
+    rows = []
+    for order in Order.objects.only('id', 'order_number', 'first_name', 'last_name', 'email', 'phone').iterator():
+        tokens = set()
+        number = _normalize(order.order_number)
+        if number:
+            tokens.add(number)
+            tokens.update(words.findall(number))
+        for name in (order.first_name, order.last_name):
+            tokens.update(words.findall(_normalize(name)))
+        email = _normalize(order.email)
+        if email:
+            local, _, domain = email.partition('@')
+            tokens.update((email, local, domain))
+            tokens.update(words.findall(local))
+        phone = ''.join(c for c in (order.phone or '') if c.isdigit())
+        if phone:
+            tokens.update((phone, phone[-10:]))
+        rows.extend(OrderSearchToken(order_id=order.id, token=token) for token in {t[:64] for t in tokens if t})
+        if len(rows) >= 1000:
+            OrderSearchToken.objects.bulk_create(rows)
+            rows = []
+    OrderSearchToken.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_sales_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, verbose_name='token')),
+            ],
+            options={
+                'verbose_name': 'order search token',
+                'verbose_name_plural': 'order search tokens',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='store_order_created_1ce3a4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='store_order_status_272e38_idx'),
+        ),
+        migrations.AddField(
+            model_name='ordersearchtoken',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='store.order', verbose_name='order'),
+        ),
+        migrations.AddIndex(
+            model_name='ordersearchtoken',
+            index=models.Index(fields=['token', 'order'], name='store_order_token_d2046e_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ordersearchtoken',
+            unique_together={('order', 'token')},
+        ),
+        migrations.RunPython(backfill_order_search_tokens, migrations.RunPython.noop),
+    ]
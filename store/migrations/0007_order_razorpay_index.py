@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_order_keyset_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['razorpay_order_id', 'payment_status'], name='store_order_razorpa_afdf92_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_order_razorpay_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='score')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='rank')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='store.product', verbose_name='product')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.product', verbose_name='recommended product')),
+            ],
+            options={
+                'verbose_name': 'product recommendation',
+                'verbose_name_plural': 'product recommendations',
+                'ordering': ['product', 'rank'],
+                'indexes': [models.Index(fields=['product', 'rank'], name='store_produ_product_81579b_idx')],
+                'unique_together': {('product', 'recommended')},
+            },
+        ),
+    ]
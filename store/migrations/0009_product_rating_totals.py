@@ -0,0 +1,38 @@
+# Generated by Django 5.0.3 on 2026-10-18 11:58
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_totals(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    ProductRating = apps.get_model('store', 'ProductRating')
+
+    totals = ProductRating.objects.filter(is_approved=True).values('product_id').annotate(
+        rating_sum=Sum('rating'), rating_count=Count('id')
+    ).order_by()
+    for row in totals.iterator():
+        Product.objects.filter(pk=row['product_id']).update(
+            rating_sum=row['rating_sum'], rating_count=row['rating_count']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_product_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.3 on 2026-10-18 12:02
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_wishlist_counts(apps, schema_editor):
+    Profile = apps.get_model('store', 'Profile')
+    Wishlist = apps.get_model('store', 'Wishlist')
+
+    counts = Wishlist.objects.filter(user__isnull=False).values('user_id').annotate(
+        wishlist_count=Count('id')
+    ).order_by()
+    for row in counts.iterator():
+        Profile.objects.filter(user_id=row['user_id']).update(wishlist_count=row['wishlist_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_product_rating_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='wishlist_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_wishlist_counts, migrations.RunPython.noop),
+    ]
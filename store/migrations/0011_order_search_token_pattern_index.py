@@ -0,0 +1,35 @@
+# Generated by Django 5.0.3 on 2026-10-18 13:20
+
+from django.db import migrations
+
+INDEX_NAME = 'store_ordersearchtoken_token_like'
+
+
+def create_pattern_index(apps, schema_editor):
+    # PostgreSQL only uses a btree index for LIKE 'prefix%' under the C
+    # collation or with a pattern operator class; other backends don't need it
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    OrderSearchToken = apps.get_model('store', 'OrderSearchToken')
+    table = schema_editor.quote_name(OrderSearchToken._meta.db_table)
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {schema_editor.quote_name(INDEX_NAME)} "
+        f"ON {table} ({schema_editor.quote_name('token')} varchar_pattern_ops, {schema_editor.quote_name('order_id')})"
+    )
+
+
+def drop_pattern_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(INDEX_NAME)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_profile_wishlist_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pattern_index, drop_pattern_index),
+    ]
@@ -13,9 +13,7 @@ from model_utils import FieldTracker
 from ckeditor.fields import RichTextField
 from django.contrib.contenttypes.fields import GenericRelation
 from django.utils.html import strip_tags
-from django.db.models import Avg, Count, Sum, F, Q, DecimalField
-from django.db.models.functions import Coalesce
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.db import transaction
@@ -117,7 +115,10 @@ class Profile(models.Model):
     bio = models.TextField(_('bio'), blank=True)
     date_of_birth = models.DateField(_('date of birth'), null=True, blank=True)
     website = models.URLField(_('website'), blank=True)
-    
+
+    # Number of wishlist items, maintained by store.wishlist
+    wishlist_count = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = _('profile')
         verbose_name_plural = _('profiles')
@@ -139,21 +140,6 @@ class Profile(models.Model):
             return self.profile_picture.url
         return '/static/profile_pictures/default-avatar.png'
 
-    def save(self, *args, **kwargs):
-        """Ensure profile picture is saved correctly."""
-        try:
-            super().save(*args, **kwargs)
-            if self.profile_picture:
-                # Resize image if needed
-                from PIL import Image
-                img = Image.open(self.profile_picture.path)
-                if img.height > 300 or img.width > 300:
-                    output_size = (300, 300)
-                    img.thumbnail(output_size)
-                    img.save(self.profile_picture.path)
-        except Exception as e:
-            print(f"Error saving profile: {str(e)}")
-
 class Wishlist(models.Model):
     """
     Model to store user's wishlist items
@@ -241,7 +227,10 @@ class Wishlist(models.Model):
                     'is_public': is_public
                 }
             )
-            if not created:
+            if created:
+                from .wishlist import adjust_wishlist_count
+                adjust_wishlist_count(user.pk, 1)
+            else:
                 item.quantity += quantity
                 if notes:
                     item.notes = notes
@@ -309,17 +298,6 @@ class Review(models.Model):
     
     def __str__(self):
         return f"{self.rating} star review by {self.user} for {self.product}"
-    
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update product rating average when a review is saved
-        self.product.update_average_rating()
-    
-    def delete(self, *args, **kwargs):
-        product = self.product
-        super().delete(*args, **kwargs)
-        # Update product rating average when a review is deleted
-        product.update_average_rating()
 
 class Variation(models.Model):
     """
@@ -555,10 +533,17 @@ class Product(models.Model):
     is_bestseller = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     
+    # Approved rating totals, maintained by store.ratings
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Field tracker for telling whether a stock change moves the product in or out of stock
+    tracker = FieldTracker(fields=['quantity'])
+    
     def __str__(self):
         return self.name
     
@@ -580,6 +565,18 @@ class Product(models.Model):
         if self.on_sale:
             return int(((self.compare_at_price - self.price) / self.compare_at_price) * 100)
         return 0
+    
+    @property
+    def average_rating(self):
+        """Mean of the approved ratings, or None if there are none"""
+        if not self.rating_count:
+            return None
+        return (Decimal(self.rating_sum) / self.rating_count).quantize(Decimal('0.01'))
+    
+    @property
+    def review_count(self):
+        """Number of approved ratings behind average_rating"""
+        return self.rating_count
 
 
 class ProductImage(models.Model):
@@ -665,6 +662,11 @@ class Cart(models.Model):
         default=0,
         help_text=_('Total amount for the cart')
     )
+    total_quantity = models.PositiveIntegerField(
+        _('total quantity'),
+        default=0,
+        help_text=_('Number of units across all items in the cart')
+    )
     
     class Meta:
         verbose_name = _('cart')
@@ -690,16 +692,7 @@ class Cart(models.Model):
     @property
     def item_count(self):
         """Return the number of items in the cart."""
-        return self.items.aggregate(
-            total=models.Sum('quantity', default=0)
-        )['total']
-    
-    @property
-    def total_quantity(self):
-        """Return the total quantity of items in the cart."""
-        return self.items.aggregate(
-            total=models.Sum('quantity', default=0)
-        )['total']
+        return self.total_quantity
     
     @property
     def subtotal(self):
@@ -716,22 +709,43 @@ class Cart(models.Model):
         )
         return result['subtotal'] or Decimal('0.00')
     
-    @property
-    def total(self):
-        """Calculate the total amount."""
-        return self.subtotal
+    def calculate_totals(self):
+        """Return (total, total_quantity) aggregated from the cart's items."""
+        from django.db.models import Sum, F, DecimalField
+        from decimal import Decimal
+        
+        result = self.items.aggregate(
+            total=Sum(
+                F('quantity') * F('price'),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+                default=Decimal('0.00')
+            ),
+            total_quantity=Sum('quantity', default=0)
+        )
+        return result['total'] or Decimal('0.00'), result['total_quantity'] or 0
     
     def update_totals(self, save=True):
-        """Update the cart's totals based on its items."""
-        # Calculate new total based on items
-        new_total = self.subtotal
+        """
+        Recalculate the stored totals from the cart's items.
         
-        # Update the total if it has changed
-        if self.total != new_total:
-            self.total = new_total
-            if save:
-                self.save(update_fields=['total', 'updated_at'])
+        Item saves and deletes keep the totals current incrementally (see
+        apply_totals_delta); this full recalculation is for repairs.
+        """
+        self.total, self.total_quantity = self.calculate_totals()
+        if save:
+            self.save(update_fields=['total', 'total_quantity', 'updated_at'])
         return self.total
+    
+    @classmethod
+    def apply_totals_delta(cls, cart_id, amount, quantity):
+        """
+        Adjust a cart's stored totals by a delta in a single UPDATE.
+        """
+        cls.objects.filter(pk=cart_id).update(
+            total=F('total') + amount,
+            total_quantity=F('total_quantity') + quantity,
+            updated_at=timezone.now()
+        )
         
     def clear(self):
         """Remove all items from the cart."""
@@ -771,6 +785,8 @@ class CartItem(models.Model):
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
     
+    tracker = FieldTracker(fields=['cart', 'quantity', 'price'])
+    
     class Meta:
         verbose_name = _('cart item')
         verbose_name_plural = _('cart items')
@@ -830,18 +846,32 @@ class CartItem(models.Model):
         # Validate before saving
         self.full_clean()
         
-        # Save the item
+        # Values the cart totals currently include for this item
+        old_cart_id = self.tracker.previous('cart') if self.pk else None
+        old_quantity = self.tracker.previous('quantity') or 0
+        old_price = self.tracker.previous('price') or 0
+        
         with transaction.atomic():
-            # Lock the cart to prevent race conditions
-            cart = Cart.objects.select_for_update().get(pk=self.cart_id)
             super().save(*args, **kwargs)
             
-            # Update cart's updated_at and totals without triggering another save
-            cart.updated_at = timezone.now()
-            cart.update_totals(save=True)
-            
-            # Refresh the cart from database to get latest values
-            cart.refresh_from_db()
+            # Apply only the change to the cart totals
+            amount = self.quantity * self.price
+            if old_cart_id and old_cart_id != self.cart_id:
+                Cart.apply_totals_delta(old_cart_id, -(old_quantity * old_price), -old_quantity)
+                self._apply_cart_delta(amount, self.quantity)
+            elif old_cart_id:
+                self._apply_cart_delta(amount - old_quantity * old_price, self.quantity - old_quantity)
+            else:
+                self._apply_cart_delta(amount, self.quantity)
+    
+    def _apply_cart_delta(self, amount, quantity):
+        """Apply a totals delta to this item's cart, in the DB and in memory."""
+        if not amount and not quantity:
+            return
+        Cart.apply_totals_delta(self.cart_id, amount, quantity)
+        if CartItem.cart.is_cached(self):
+            self.cart.total += amount
+            self.cart.total_quantity += quantity
 
 
 class Order(models.Model):
@@ -935,12 +965,22 @@ class Order(models.Model):
     notes = models.TextField(_('notes'), blank=True, null=True)
     
     # Field tracker for detecting changes
-    tracker = FieldTracker(fields=['status', 'tracking_number', 'tracking_url'])
+    tracker = FieldTracker(fields=[
+        'status', 'tracking_number', 'tracking_url', 'total_amount', 'payment_status',
+        'order_number', 'email', 'first_name', 'last_name', 'phone',
+    ])
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = _('order')
         verbose_name_plural = _('orders')
+        indexes = [
+            # Keyset pagination of the order lists (store.keyset)
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['status', 'created_at', 'id']),
+            # Matching gateway payments to orders (payment.reconciliation)
+            models.Index(fields=['razorpay_order_id', 'payment_status']),
+        ]
     
     def __str__(self):
         return f'Order {self.order_number or self.id}'
@@ -948,7 +988,11 @@ class Order(models.Model):
     def save(self, *args, **kwargs):
         # Generate order number if not exists
         if not self.order_number:
-            self.order_number = f"ORD-{timezone.now().strftime('%Y%m%d')}-{Order.objects.count() + 1}"
+            from .sequences import next_order_number
+            self.order_number = f"ORD-{timezone.now().strftime('%Y%m%d')}-{next_order_number()}"
+        
+        # Fields derived here must be written even if the caller limited update_fields
+        derived = []
         
         # Set estimated delivery date based on shipping method
         if not self.estimated_delivery_date and self.status == self.Status.CONFIRMED:
@@ -959,12 +1003,20 @@ class Order(models.Model):
                 self.estimated_delivery_date = timezone.now() + timedelta(days=3)
             elif self.shipping_method == self.ShippingMethod.SAME_DAY:
                 self.estimated_delivery_date = timezone.now().date()
+            derived.append('estimated_delivery_date')
         
-        # Update status_changed if status is being updated
-        if self.pk:
-            old_status = Order.objects.get(pk=self.pk).status
-            if old_status != self.status:
-                self.status_changed = timezone.now()
+        # Update status_changed if status is being updated (the tracker
+        # remembers the loaded value, so no re-fetch is needed)
+        if self.pk and self.tracker.has_changed('status'):
+            self.status_changed = timezone.now()
+            derived.append('status_changed')
+            if self.status == self.Status.DELIVERED and not self.actual_delivery_date:
+                self.actual_delivery_date = timezone.now()
+                derived.append('actual_delivery_date')
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and derived:
+            kwargs['update_fields'] = set(update_fields) | set(derived)
         
         super().save(*args, **kwargs)
     
@@ -1077,6 +1129,9 @@ class OrderItem(models.Model):
     )
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+    
+    # Field tracker for keeping product sales rollups current
+    tracker = FieldTracker(fields=['product', 'quantity', 'price'])
 
     class Meta:
         verbose_name = _('order item')
@@ -1217,6 +1272,210 @@ class OrderActivity(models.Model):
 
 
 
+class EmailOutbox(models.Model):
+    """
+    Transactional email waiting to be sent by the send_queued_emails worker.
+    
+    Requests only insert a row; the worker renders and sends the message,
+    retrying failures with exponential backoff.
+    """
+    class Kind(models.TextChoices):
+        ORDER_CONFIRMATION = 'order_confirmation', _('Order Confirmation')
+    
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        SENDING = 'sending', _('Sending')
+        SENT = 'sent', _('Sent')
+        FAILED = 'failed', _('Failed')
+    
+    kind = models.CharField(_('kind'), max_length=50, choices=Kind.choices)
+    order = models.ForeignKey(
+        'Order',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='queued_emails',
+        verbose_name=_('order')
+    )
+    to_email = models.EmailField(_('recipient'))
+    dedupe_key = models.CharField(
+        _('dedupe key'),
+        max_length=100,
+        unique=True,
+        help_text=_('Prevents the same email from being queued twice')
+    )
+    status = models.CharField(
+        _('status'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(_('attempts'), default=0)
+    next_attempt_at = models.DateTimeField(
+        _('next attempt at'),
+        default=timezone.now,
+        help_text=_('When the email is next due; also the lease expiry while sending')
+    )
+    last_error = models.TextField(_('last error'), blank=True)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    sent_at = models.DateTimeField(_('sent at'), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('queued email')
+        verbose_name_plural = _('email outbox')
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email} ({self.get_status_display()})"
+
+
+class DailySales(models.Model):
+    """
+    Number and value of orders created on a day, per current order status.
+    
+    Maintained incrementally by store.sales_rollups; rebuild with the
+    rebuild_sales_rollups command.
+    """
+    day = models.DateField(_('day'))
+    status = models.CharField(_('status'), max_length=20, choices=Order.Status.choices)
+    order_count = models.IntegerField(_('order count'), default=0)
+    total_amount = models.DecimalField(_('total amount'), max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = _('daily sales')
+        verbose_name_plural = _('daily sales')
+        ordering = ['day', 'status']
+        unique_together = ['day', 'status']
+    
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.order_count} orders, {self.total_amount}"
+
+
+class StatusSales(models.Model):
+    """
+    Number and value of all orders currently in a status.
+    """
+    status = models.CharField(_('status'), max_length=20, choices=Order.Status.choices, unique=True)
+    order_count = models.IntegerField(_('order count'), default=0)
+    total_amount = models.DecimalField(_('total amount'), max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = _('status sales')
+        verbose_name_plural = _('status sales')
+        ordering = ['-order_count']
+    
+    def __str__(self):
+        return f"{self.status}: {self.order_count} orders, {self.total_amount}"
+
+
+class ProductSales(models.Model):
+    """
+    Order lines, units and revenue of a product across all orders.
+    """
+    product = models.OneToOneField(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='sales',
+        verbose_name=_('product')
+    )
+    order_count = models.IntegerField(_('order count'), default=0, db_index=True)
+    quantity = models.IntegerField(_('quantity'), default=0)
+    revenue = models.DecimalField(_('revenue'), max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = _('product sales')
+        verbose_name_plural = _('product sales')
+        ordering = ['-order_count']
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.order_count} orders, {self.quantity} units"
+
+
+class ProductRecommendation(models.Model):
+    """
+    A product frequently bought together with another one.
+    
+    The top neighbours of every product by co-purchase similarity, rebuilt
+    from the order history by the build_recommendations command and served
+    through store.recommendations.
+    """
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name=_('product')
+    )
+    recommended = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('recommended product')
+    )
+    score = models.FloatField(_('score'))
+    rank = models.PositiveSmallIntegerField(_('rank'))
+    
+    class Meta:
+        verbose_name = _('product recommendation')
+        verbose_name_plural = _('product recommendations')
+        ordering = ['product', 'rank']
+        unique_together = ['product', 'recommended']
+        indexes = [
+            models.Index(fields=['product', 'rank']),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} ({self.score:.3f})"
+
+
+class OrderSearchToken(models.Model):
+    """
+    Normalized lookup token of an order (see store.order_search).
+    
+    Order lists match search terms as prefixes of these tokens instead of
+    scanning every order with ``icontains``.
+    """
+    order = models.ForeignKey(
+        'Order',
+        on_delete=models.CASCADE,
+        related_name='search_tokens',
+        verbose_name=_('order')
+    )
+    token = models.CharField(_('token'), max_length=64)
+    
+    class Meta:
+        verbose_name = _('order search token')
+        verbose_name_plural = _('order search tokens')
+        unique_together = ['order', 'token']
+        # Prefix lookups on PostgreSQL use the varchar_pattern_ops index
+        # created by migration 0011 instead
+        indexes = [
+            models.Index(fields=['token', 'order']),
+        ]
+    
+    def __str__(self):
+        return f"{self.order_id}: {self.token}"
+
+
+class NumberSequence(models.Model):
+    """
+    Named counter that hands out blocks of numbers (see store.sequences).
+    
+    ``next_value`` is the first number not yet handed to any worker.
+    """
+    name = models.CharField(_('name'), max_length=50, unique=True)
+    next_value = models.PositiveBigIntegerField(_('next value'), default=1)
+    
+    class Meta:
+        verbose_name = _('number sequence')
+        verbose_name_plural = _('number sequences')
+    
+    def __str__(self):
+        return f"{self.name} (next {self.next_value})"
+
+
 
 
 
@@ -1289,6 +1548,9 @@ class ProductRating(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Lets store.ratings apply the change of a save as a delta
+    tracker = FieldTracker(fields=['product', 'rating', 'is_approved'])
+    
     class Meta:
         verbose_name = 'Product Rating'
         verbose_name_plural = 'Product Ratings'
@@ -1299,11 +1561,9 @@ class ProductRating(models.Model):
         return f"{self.user.username}'s {self.rating} star rating for {self.product.name}"
 
 
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.db.models import Avg
 
-@receiver(post_save, sender=ProductRating)
 @receiver(post_save, sender=Order)
 def convert_cart_to_order(sender, instance, created, **kwargs):
     """
@@ -1314,23 +1574,6 @@ def convert_cart_to_order(sender, instance, created, **kwargs):
         cart.status = 'converted'
         cart.save()
 
-@receiver(post_save, sender=ProductRating)
-@receiver(post_delete, sender=ProductRating)
-def update_product_rating(sender, instance, **kwargs):
-    """Update the average rating of a product when a rating is saved or deleted"""
-    product = instance.product
-    ratings = product.ratings.filter(is_approved=True)
-    count = ratings.count()
-    
-    if count > 0:
-        product.average_rating = ratings.aggregate(avg=Avg('rating'))['avg']
-        product.rating_count = count
-    else:
-        product.average_rating = None
-        product.rating_count = 0
-    
-    product.save(update_fields=['average_rating', 'rating_count'])
-
 
 class BlogPost(models.Model):
     """Model for blog posts"""
@@ -1389,61 +1632,3 @@ class BlogPost(models.Model):
         if self.excerpt:
             return self.excerpt
         return strip_tags(self.content)[:200] + '...'
-
-    @classmethod
-    def add_to_wishlist(cls, user, product, notes=''):
-        """
-        Add a product to user's wishlist
-        Returns (wishlist_item, created) tuple
-        """
-        return cls.objects.get_or_create(
-            user=user,
-            product=product,
-            defaults={'notes': notes}
-        )
-
-    @classmethod
-    def remove_from_wishlist(cls, user, product):
-        """
-        Remove a product from user's wishlist
-        Returns True if item was removed, False if it didn't exist
-        """
-        deleted, _ = cls.objects.filter(user=user, product=product).delete()
-        return deleted > 0
-
-    @classmethod
-    def get_user_wishlist(cls, user):
-        """
-        Get all wishlist items for a user with product prefetching
-        """
-        return cls.objects.filter(user=user).select_related('product')
-
-    @property
-    def product_in_stock(self):
-        """Check if the product is in stock"""
-        return self.product.in_stock
-
-    def move_to_cart(self, cart, quantity=1):
-        """
-        Move this wishlist item to the user's cart
-        Returns the created cart item or None if product is out of stock
-        """
-        if not self.product_in_stock:
-            return None
-            
-        # Check if product is already in cart
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=self.product,
-            defaults={
-                'price': self.product.price,
-                'quantity': min(quantity, self.product.quantity) if self.product.track_quantity else quantity
-            }
-        )
-        
-        if not created:
-            cart_item.increase_quantity(quantity)
-            
-        # Remove from wishlist after adding to cart
-        self.delete()
-        return cart_item
@@ -0,0 +1,214 @@
+"""
+Read-through object cache for products and categories.
+
+Products are cached one per key as a compact tuple of their column values
+and rebuilt with ``Model.from_db``, so callers get real Product/Category
+instances without a query. Entries are
+deleted by the Product/Category signals (and by stock updates that bypass
+save()), rather than versioned, so one product changing doesn't evict the
+others.
+"""
+import hashlib
+import logging
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.fields.files import FieldFile
+
+from .catalog_cache import _image_payload, get_cache_timeout, get_catalog_version
+from .models import Category, Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_KEY = 'catalog:product:{schema}:{pk}'
+PRODUCT_SLUG_KEY = 'catalog:product_slug:{slug}'
+CATEGORIES_KEY = 'catalog:categories:{schema}'
+RELATED_KEY = 'catalog:related:v{version}:{pk}:{limit}'
+PRODUCT_IMAGES_KEY = 'catalog:product_images:{pk}'
+
+
+def _field_names(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _schema(model):
+    """Short hash of the model's columns, so a schema change never reads old tuples."""
+    return hashlib.md5(','.join(_field_names(model)).encode()).hexdigest()[:8]
+
+
+PRODUCT_FIELDS = _field_names(Product)
+PRODUCT_SCHEMA = _schema(Product)
+CATEGORY_FIELDS = _field_names(Category)
+CATEGORY_SCHEMA = _schema(Category)
+
+
+def _product_key(pk):
+    return PRODUCT_KEY.format(schema=PRODUCT_SCHEMA, pk=pk)
+
+
+def _pack(instance, field_names):
+    values = []
+    for name in field_names:
+        value = getattr(instance, name)
+        if isinstance(value, FieldFile):
+            # Store the file name, not the file object bound to the instance
+            value = value.name
+        values.append(value)
+    return tuple(values)
+
+
+def _unpack(model, field_names, values):
+    return model.from_db(DEFAULT_DB_ALIAS, field_names, values)
+
+
+def get_categories():
+    """
+    Return every category ordered by name, served from the cache when warm.
+
+    Returns:
+        list: Category instances
+    """
+    key = CATEGORIES_KEY.format(schema=CATEGORY_SCHEMA)
+    rows = cache.get(key)
+    if rows is None:
+        rows = [
+            _pack(category, CATEGORY_FIELDS)
+            for category in Category.objects.order_by('name')
+        ]
+        cache.set(key, rows, get_cache_timeout())
+    return [_unpack(Category, CATEGORY_FIELDS, row) for row in rows]
+
+
+def _attach_categories(products):
+    """Set each product's category from the cached category list."""
+    categories = None
+    for product in products:
+        if product.category_id is None:
+            product.category = None
+            continue
+        if categories is None:
+            categories = {category.pk: category for category in get_categories()}
+        category = categories.get(product.category_id)
+        if category is not None:
+            product.category = category
+    return products
+
+
+def get_products(pks):
+    """
+    Return products by ID, in the given order, reading missing ones in one query.
+
+    IDs that don't exist are left out; inactive products are included.
+
+    Args:
+        pks: iterable of product IDs
+
+    Returns:
+        list: Product instances with their category attached
+    """
+    pks = list(dict.fromkeys(pks))
+    if not pks:
+        return []
+
+    cached = cache.get_many([_product_key(pk) for pk in pks])
+    products = {}
+    for pk in pks:
+        values = cached.get(_product_key(pk))
+        if values is not None:
+            products[pk] = _unpack(Product, PRODUCT_FIELDS, values)
+
+    missing = [pk for pk in pks if pk not in products]
+    if missing:
+        fetched = {}
+        for product in Product.objects.filter(pk__in=missing):
+            products[product.pk] = product
+            fetched[_product_key(product.pk)] = _pack(product, PRODUCT_FIELDS)
+        cache.set_many(fetched, get_cache_timeout())
+
+    return _attach_categories([products[pk] for pk in pks if pk in products])
+
+
+def get_product(pk=None, slug=None):
+    """
+    Return a single product by ID or slug, or None if it doesn't exist.
+    """
+    if pk is None:
+        pk = cache.get(PRODUCT_SLUG_KEY.format(slug=slug))
+        if pk is None:
+            product = Product.objects.filter(slug=slug).first()
+            if product is None:
+                return None
+            cache.set(PRODUCT_SLUG_KEY.format(slug=slug), product.pk, get_cache_timeout())
+            cache.set(_product_key(product.pk), _pack(product, PRODUCT_FIELDS), get_cache_timeout())
+            return _attach_categories([product])[0]
+
+    products = get_products([pk])
+    if not products:
+        return None
+    product = products[0]
+    if slug is not None and product.slug != slug:
+        # The slug changed since it was cached; look it up again
+        invalidate_product_slug(slug)
+        return get_product(slug=slug)
+    return product
+
+
+def get_related_products(product, limit=4):
+    """
+    Return active products from the same category as ``product``.
+
+    The list of IDs is cached under the catalog version, since any product
+    change can alter it; the products themselves come from get_products().
+    """
+    if product.category_id is None:
+        return []
+    key = RELATED_KEY.format(version=get_catalog_version(), pk=product.pk, limit=limit)
+    pks = cache.get(key)
+    if pks is None:
+        pks = list(
+            Product.objects.filter(category_id=product.category_id, is_active=True)
+            .exclude(pk=product.pk)
+            .values_list('pk', flat=True)[:limit]
+        )
+        cache.set(key, pks, get_cache_timeout())
+    return get_products(pks)
+
+
+def get_product_images(product_id):
+    """
+    Return a product's gallery images, reading the cache first.
+
+    Returns:
+        list: ``{'image': {'url': ..., 'name': ...}, 'alt_text': ...}`` dicts
+        in gallery order
+    """
+    key = PRODUCT_IMAGES_KEY.format(pk=product_id)
+    images = cache.get(key)
+    if images is None:
+        images = [
+            {'image': _image_payload(row.image), 'alt_text': row.alt_text}
+            for row in ProductImage.objects.filter(product_id=product_id).only('image', 'alt_text')
+            if row.image
+        ]
+        cache.set(key, images, get_cache_timeout())
+    return images
+
+
+def invalidate_products(pks):
+    """Drop the cached entries of the given products."""
+    cache.delete_many([_product_key(pk) for pk in pks])
+
+
+def invalidate_product_slug(slug):
+    """Drop a cached slug -> ID mapping."""
+    cache.delete(PRODUCT_SLUG_KEY.format(slug=slug))
+
+
+def invalidate_product_images(product_id):
+    """Drop a product's cached gallery images."""
+    cache.delete(PRODUCT_IMAGES_KEY.format(pk=product_id))
+
+
+def invalidate_categories():
+    """Drop the cached category list."""
+    cache.delete(CATEGORIES_KEY.format(schema=CATEGORY_SCHEMA))
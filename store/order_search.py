@@ -0,0 +1,219 @@
+"""
+Lookup helpers for the staff and admin order lists.
+
+An order's number, customer name, email and phone are split into
+normalized tokens stored as OrderSearchToken rows, kept current from the
+Order post_save signal. A search matches every query term as a prefix of
+one of the order's tokens, which is an indexed range scan instead of a
+``LIKE '%term%'`` over every order. ``rebuild_order_search_tokens()``
+recomputes the tokens from scratch.
+
+Date filters are turned into half-open ``created_at`` ranges so they can use
+the (created_at, id) index, unlike ``created_at__date`` lookups.
+"""
+import logging
+import re
+import string
+import unicodedata
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Order, OrderSearchToken
+
+logger = logging.getLogger(__name__)
+
+# Order fields that tokens are built from
+SEARCH_FIELDS = ('order_number', 'first_name', 'last_name', 'email', 'phone')
+
+TOKEN_MAX_LENGTH = OrderSearchToken._meta.get_field('token').max_length
+
+# Queries with more terms than this only use the first ones
+MAX_QUERY_TERMS = 5
+
+# Phones are also indexed by this many trailing digits (the number without country code)
+LOCAL_PHONE_DIGITS = 10
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+PHONE_LIKE_RE = re.compile(r'[\d\s()+.-]+')
+
+
+def normalize(value):
+    """Return ``value`` case-folded and without accents."""
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    return ''.join(c for c in value if not unicodedata.combining(c)).casefold().strip()
+
+
+def _digits(value):
+    return ''.join(c for c in value if c.isdigit())
+
+
+def order_search_tokens(order):
+    """
+    Return the set of lookup tokens for an order.
+
+    Args:
+        order: Order instance (only SEARCH_FIELDS are read)
+
+    Returns:
+        set: normalized tokens, at most TOKEN_MAX_LENGTH characters each
+    """
+    tokens = set()
+
+    # The whole number ("ord-20240101-41") and its parts ("20240101", "41")
+    number = normalize(order.order_number)
+    if number:
+        tokens.add(number)
+        tokens.update(WORD_RE.findall(number))
+
+    for name in (order.first_name, order.last_name):
+        tokens.update(WORD_RE.findall(normalize(name)))
+
+    email = normalize(order.email)
+    if email:
+        local, _, domain = email.partition('@')
+        tokens.update((email, local, domain))
+        tokens.update(WORD_RE.findall(local))
+
+    phone = _digits(order.phone or '')
+    if phone:
+        tokens.add(phone)
+        tokens.add(phone[-LOCAL_PHONE_DIGITS:])
+
+    return {token[:TOKEN_MAX_LENGTH] for token in tokens if token}
+
+
+def query_terms(query):
+    """
+    Split a search query into terms, each a set of alternative prefixes.
+
+    A query that looks like a phone number is kept as a single term so that
+    "98765 43210" and "+91-98765-43210" both match the stored digits.
+    """
+    query = normalize(query)
+    if not query:
+        return []
+
+    if PHONE_LIKE_RE.fullmatch(query):
+        alternatives = {re.sub(r'\s+', '', query), _digits(query)}
+        return [{term[:TOKEN_MAX_LENGTH] for term in alternatives if term}]
+
+    terms = []
+    for word in query.split()[:MAX_QUERY_TERMS]:
+        word = word.strip(string.punctuation)
+        if word:
+            terms.append({word[:TOKEN_MAX_LENGTH]})
+    return terms
+
+
+def search_orders(queryset, query):
+    """
+    Filter an order queryset to orders matching every term of ``query``.
+
+    Args:
+        queryset: Order queryset
+        query: text entered in an order list's search box
+
+    Returns:
+        QuerySet: the filtered queryset
+    """
+    for alternatives in query_terms(query):
+        match = Q()
+        for prefix in alternatives:
+            match |= Q(token__startswith=prefix)
+        queryset = queryset.filter(
+            pk__in=OrderSearchToken.objects.filter(match).values('order_id')
+        )
+    return queryset
+
+
+def created_range(date_from=None, date_to=None):
+    """
+    Build a sargable filter for orders created between two dates, inclusive.
+
+    Args:
+        date_from, date_to: ISO dates (strings or dates); invalid or empty
+            values are ignored
+
+    Returns:
+        Q: ``created_at`` range on local-day boundaries
+    """
+    condition = Q()
+    start = _as_date(date_from)
+    end = _as_date(date_to)
+    if start:
+        condition &= Q(created_at__gte=_start_of_day(start))
+    if end:
+        condition &= Q(created_at__lt=_start_of_day(end + timedelta(days=1)))
+    return condition
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        try:
+            return parse_date(value)
+        except ValueError:
+            return None
+    return value or None
+
+
+def _start_of_day(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def index_order(order, created=False):
+    """
+    Write the search tokens of an order, replacing only the ones that changed.
+    """
+    tokens = order_search_tokens(order)
+    if not created:
+        existing = set(OrderSearchToken.objects.filter(order=order).values_list('token', flat=True))
+        stale = existing - tokens
+        if stale:
+            OrderSearchToken.objects.filter(order=order, token__in=stale).delete()
+        tokens -= existing
+    OrderSearchToken.objects.bulk_create(
+        [OrderSearchToken(order=order, token=token) for token in tokens],
+        ignore_conflicts=True
+    )
+
+
+def record_order_saved(order, created, update_fields=None):
+    """
+    Keep an order's tokens current. Must run inside save() (post_save).
+    """
+    if created:
+        index_order(order, created=True)
+        return
+    fields = SEARCH_FIELDS if update_fields is None else [f for f in SEARCH_FIELDS if f in update_fields]
+    if any(order.tracker.has_changed(name) for name in fields):
+        index_order(order)
+
+
+def rebuild_order_search_tokens(batch_size=1000):
+    """
+    Recompute the search tokens of every order.
+
+    Returns:
+        int: number of tokens written
+    """
+    count = 0
+    with transaction.atomic():
+        OrderSearchToken.objects.all().delete()
+        rows = []
+        for order in Order.objects.only('id', *SEARCH_FIELDS).order_by().iterator(chunk_size=batch_size):
+            rows.extend(OrderSearchToken(order=order, token=token) for token in order_search_tokens(order))
+            if len(rows) >= batch_size:
+                OrderSearchToken.objects.bulk_create(rows)
+                count += len(rows)
+                rows = []
+        OrderSearchToken.objects.bulk_create(rows)
+        count += len(rows)
+
+    logger.info(f"Rebuilt order search tokens: {count} tokens")
+    return count
@@ -0,0 +1,157 @@
+"""
+Order state transitions.
+
+OrderTransition collects field changes on an order in memory and writes
+them with a single ``save(update_fields=...)``. Old values come from the
+values replaced by set() and from the order's FieldTracker, so detecting a
+status or tracking change never re-reads the order. The history rows that
+the changes imply (OrderStatusUpdate and OrderActivity) are written with
+one bulk insert per table.
+"""
+import logging
+
+from django.db import connection, transaction
+
+from .models import OrderActivity, OrderStatusUpdate
+
+logger = logging.getLogger(__name__)
+
+
+def _insert(model, rows):
+    """Insert rows in one statement where the backend returns their IDs."""
+    if not rows:
+        return
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(rows)
+    else:
+        # Callers use the IDs, so save individually (e.g. on MySQL)
+        for row in rows:
+            row.save()
+
+
+class OrderTransition:
+    """
+    Batch of changes to one order, saved in one UPDATE.
+
+    Usage::
+
+        OrderTransition(order, user=request.user, note=note).set(
+            status=Order.Status.IN_TRANSIT,
+            tracking_number=number,
+        ).save()
+    """
+
+    def __init__(self, order, user=None, note=None, request=None):
+        self.order = order
+        self.user = user
+        self.note = note or None
+        self.request = request
+        # Field name -> value before this transition
+        self.changes = {}
+        # History rows written by the last save()
+        self.status_updates = []
+        self.activities = []
+
+    def set(self, **fields):
+        """Assign fields on the order, remembering the values they replace."""
+        for name, value in fields.items():
+            old = getattr(self.order, name)
+            if name not in self.changes and old != value:
+                self.changes[name] = old
+            setattr(self.order, name, value)
+        return self
+
+    def touch(self, *names):
+        """
+        Record fields that were already assigned on the order (e.g. by a form).
+        """
+        for name in names:
+            if name in self.changes:
+                continue
+            if name in self.order.tracker.fields:
+                if not self.order.tracker.has_changed(name):
+                    continue
+                self.changes[name] = self.order.tracker.previous(name)
+            else:
+                self.changes[name] = None
+        return self
+
+    def _changed(self, name):
+        return name in self.changes and self.changes[name] != getattr(self.order, name)
+
+    def history(self):
+        """
+        Build (unsaved) history rows for the recorded changes.
+
+        Returns:
+            tuple: (status_updates, activities)
+        """
+        order = self.order
+        status_updates = []
+        details = []
+
+        if self._changed('status'):
+            status_updates.append(OrderStatusUpdate(
+                order=order,
+                status=order.status,
+                status_display=order.get_status_display(),
+                note=self.note
+            ))
+            details.append(f"Status changed to {order.get_status_display()}")
+        if self._changed('tracking_number') and order.tracking_number:
+            details.append(f"Tracking number updated to {order.tracking_number}")
+        if self._changed('tracking_url') and order.tracking_url:
+            details.append("Tracking URL updated")
+
+        activities = []
+        if details:
+            # One activity describes everything that changed together
+            activity_type = 'status_change' if status_updates else 'tracking_updated'
+            activities.append(self._activity(activity_type, details))
+        return status_updates, activities
+
+    def _activity(self, activity_type, details):
+        activity = OrderActivity(
+            order=self.order,
+            user=self.user,
+            activity_type=activity_type,
+            details="; ".join(details),
+            note=self.note
+        )
+        if self.request is not None:
+            activity.ip_address = OrderActivity.get_client_ip(self.request)
+            activity.user_agent = self.request.META.get('HTTP_USER_AGENT', '')[:500]
+        return activity
+
+    def save(self):
+        """
+        Write the changes and their history.
+
+        Returns:
+            list: names of the fields that were saved
+        """
+        order = self.order
+        if order._state.adding:
+            order.save()
+            fields, self.changes = list(self.changes), {}
+            return fields
+
+        fields = list(self.changes)
+        if not fields:
+            return []
+
+        status_updates, activities = self.history()
+        with transaction.atomic():
+            # The status signal skips orders whose history we write here
+            order._in_transition = True
+            try:
+                order.save(update_fields=fields + ['updated_at'])
+            finally:
+                order._in_transition = False
+            _insert(OrderStatusUpdate, status_updates)
+            _insert(OrderActivity, activities)
+
+        logger.debug(f"Order {order.order_number}: saved {', '.join(fields)}")
+        self.changes = {}
+        self.status_updates, self.activities = status_updates, activities
+        return fields
@@ -2,30 +2,27 @@ import razorpay
 import json
 import logging
 from django.conf import settings
+from django.utils import timezone
 from django.http import JsonResponse, HttpResponse
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from hashlib import sha256
 import hmac
 import base64
 
+from payment.gateway import get_gateway_client, is_gateway_configured
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Initialize Razorpay client
-client = None
-if settings.RAZORPAY_KEY_ID and settings.RAZORPAY_KEY_SECRET:
-    try:
-        logger.info("Initializing Razorpay client")
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-        logger.info("Razorpay client initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize Razorpay client: {str(e)}")
-        client = None
-else:
-    logger.warning(
-        'Razorpay is not configured. Payment functionality will be disabled. '
-        'Please set RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET environment variables to enable payments.'
-    )
+def _get_client():
+    """Return the shared Razorpay client, or None if Razorpay is not configured."""
+    if not is_gateway_configured():
+        logger.warning(
+            'Razorpay is not configured. Payment functionality will be disabled. '
+            'Please set RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET environment variables to enable payments.'
+        )
+        return None
+    return get_gateway_client()
 
 def create_razorpay_order(amount, currency='INR', receipt=None, notes=None):
     """
@@ -40,6 +37,7 @@ def create_razorpay_order(amount, currency='INR', receipt=None, notes=None):
     Returns:
         dict: Razorpay order details or None if failed or Razorpay is not configured
     """
+    client = _get_client()
     if client is None:
         logger.warning("Razorpay is not configured. Cannot create order.")
         return None
@@ -64,7 +62,7 @@ def create_razorpay_order(amount, currency='INR', receipt=None, notes=None):
                 logger.error(f"Amount too high: {amount_in_paise} paise")
                 return None
                 
-        except (ValueError, TypeError, decimal.InvalidOperation) as e:
+        except (ValueError, TypeError, InvalidOperation) as e:
             logger.error(f"Invalid amount format: {amount}, error: {str(e)}")
             return None
             
@@ -111,7 +109,7 @@ def verify_payment_signature(razorpay_order_id, razorpay_payment_id, razorpay_si
     Returns:
         bool: True if signature is valid, False otherwise or if Razorpay is not configured
     """
-    if client is None or not settings.RAZORPAY_KEY_SECRET:
+    if not is_gateway_configured():
         logger.warning("Razorpay is not configured. Cannot verify payment signature.")
         return False
         
@@ -154,7 +152,7 @@ def verify_webhook_signature(payload, signature, webhook_secret=None):
     Returns:
         bool: True if signature is valid, False otherwise or if Razorpay is not configured
     """
-    if client is None:
+    if not is_gateway_configured():
         logger.warning("Razorpay is not configured. Cannot verify webhook signature.")
         return False
         
@@ -195,6 +193,7 @@ def get_payment_status(payment_id):
     Returns:
         dict: Payment details or None if failed or Razorpay is not configured
     """
+    client = _get_client()
     if client is None:
         logger.warning("Razorpay is not configured. Cannot fetch payment status.")
         return None
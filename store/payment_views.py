@@ -9,6 +9,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse
 from django.contrib import messages
 from django.db import transaction
+from django.utils import timezone
 from django.http import Http404
 from django.contrib.sites.shortcuts import get_current_site
 
@@ -16,9 +17,7 @@ from .models import Order, Payment, OrderItem, Cart, CartItem
 from .payment_utils import create_razorpay_order, verify_payment_signature
 from .email_utils import send_order_confirmation_email
 
-# Initialize Razorpay client
-import razorpay
-razorpay_client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+from payment.gateway import get_gateway_client
 
 class PaymentView(LoginRequiredMixin, View):
     """View to handle payment page and form submission"""
@@ -211,7 +210,7 @@ def payment_webhook(request):
         
         # Verify the webhook signature
         try:
-            razorpay_client.utility.verify_webhook_signature(
+            get_gateway_client().utility.verify_webhook_signature(
                 payload,
                 received_signature,
                 settings.RAZORPAY_WEBHOOK_SECRET
@@ -314,7 +313,7 @@ class PaymentSuccessView(LoginRequiredMixin, View):
         
         try:
             # Verify the payment
-            razorpay_client.utility.verify_payment_signature({
+            get_gateway_client().utility.verify_payment_signature({
                 'razorpay_payment_id': payment_id,
                 'razorpay_order_id': order_id,
                 'razorpay_signature': signature
@@ -0,0 +1,97 @@
+"""
+Running rating totals on products.
+
+Each product stores the sum and count of its approved ratings;
+``Product.average_rating`` divides them. Saving or deleting a
+ProductRating applies only the difference it makes (a new, edited,
+approved, unapproved or moved rating) with one ``F()`` UPDATE per affected
+product, instead of re-aggregating the product's ratings.
+``rebuild_product_ratings()`` recomputes every product's totals.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .catalog_cache import bump_catalog_version
+from .models import Product, ProductRating
+from .object_cache import invalidate_products
+
+logger = logging.getLogger(__name__)
+
+
+def _contribution(approved, rating):
+    """Return the (sum, count) a rating adds to its product's totals."""
+    return (rating, 1) if approved and rating else (0, 0)
+
+
+def _apply(deltas):
+    """Add {product ID: (sum, count)} deltas to the products' totals."""
+    changed = []
+    for product_id, (rating_sum, rating_count) in deltas.items():
+        if product_id is None or not (rating_sum or rating_count):
+            continue
+        Product.objects.filter(pk=product_id).update(
+            rating_sum=F('rating_sum') + rating_sum,
+            rating_count=F('rating_count') + rating_count
+        )
+        changed.append(product_id)
+    if changed:
+        # update() bypasses save(), so drop the cached copies and home rails ourselves
+        transaction.on_commit(lambda: invalidate_products(changed))
+        transaction.on_commit(bump_catalog_version)
+
+
+def _add(deltas, product_id, contribution, sign):
+    rating_sum, rating_count = deltas.get(product_id, (0, 0))
+    deltas[product_id] = (rating_sum + sign * contribution[0], rating_count + sign * contribution[1])
+
+
+def record_rating_saved(rating, created):
+    """
+    Apply a saved rating to its product's totals. Must run inside save() (post_save).
+    """
+    deltas = {}
+    if not created:
+        tracker = rating.tracker
+        previous = _contribution(tracker.previous('is_approved'), tracker.previous('rating'))
+        _add(deltas, tracker.previous('product'), previous, -1)
+    _add(deltas, rating.product_id, _contribution(rating.is_approved, rating.rating), 1)
+    _apply(deltas)
+
+
+def record_rating_deleted(rating):
+    """Remove a deleted rating from its product's totals."""
+    tracker = rating.tracker
+    # The stored values, in case the instance was modified before delete()
+    previous = _contribution(tracker.previous('is_approved'), tracker.previous('rating'))
+    _apply({tracker.previous('product'): (-previous[0], -previous[1])})
+
+
+def rebuild_product_ratings():
+    """
+    Recompute every product's rating totals from the approved ratings.
+
+    Returns:
+        int: number of products whose totals changed
+    """
+    with transaction.atomic():
+        totals = {
+            row['product']: (row['rating_sum'], row['rating_count'])
+            for row in ProductRating.objects.filter(is_approved=True).values('product').annotate(
+                rating_sum=Sum('rating'), rating_count=Count('id')
+            )
+        }
+        changed = []
+        for product in Product.objects.select_for_update().only('id', 'rating_sum', 'rating_count'):
+            rating_sum, rating_count = totals.get(product.pk, (0, 0))
+            if (product.rating_sum, product.rating_count) != (rating_sum, rating_count):
+                product.rating_sum, product.rating_count = rating_sum, rating_count
+                changed.append(product)
+        Product.objects.bulk_update(changed, ['rating_sum', 'rating_count'], batch_size=500)
+
+    if changed:
+        invalidate_products([product.pk for product in changed])
+        bump_catalog_version()
+    logger.info(f"Rebuilt rating totals: {len(changed)} products changed")
+    return len(changed)
@@ -0,0 +1,192 @@
+"""
+"Bought together" product recommendations from the order history.
+
+``build_recommendations()`` (run by ``python manage.py build_recommendations``)
+reads every order's products once, counts how often each pair of products
+appears in the same order, and keeps the TOP_K neighbours of each product
+by cosine similarity::
+
+    score(a, b) = orders(a and b) / sqrt(orders(a) * orders(b))
+
+The neighbours are stored as ProductRecommendation rows and cached per
+product under a version bumped by each rebuild, so a lookup is one cache
+read.
+
+``get_recommendations()`` merges the neighbours of one or more products (a
+product page, a cart, an order) and tops the list up with same-category
+products when the history is too thin.
+"""
+import heapq
+import logging
+import math
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .catalog_cache import bump_version, get_cache_timeout, get_version
+from .models import OrderItem, ProductRecommendation
+from .object_cache import get_products, get_related_products
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_VERSION_KEY = 'recommendations:version'
+RECOMMENDATIONS_KEY = 'recommendations:v{version}:{pk}'
+
+TOP_K = 12
+
+# Orders with more distinct products than this are skipped: they add
+# O(n^2) pairs and say little about what belongs together
+MAX_BASKET_SIZE = 50
+
+
+def get_recommendations_version():
+    return get_version(RECOMMENDATIONS_VERSION_KEY)
+
+
+def bump_recommendations_version():
+    return bump_version(RECOMMENDATIONS_VERSION_KEY)
+
+
+def _baskets(orders=None):
+    """Yield the set of product IDs in each order, reading order lines in one pass."""
+    items = OrderItem.objects.all()
+    if orders is not None:
+        items = items.filter(order__in=orders)
+    current, basket = None, set()
+    for order_id, product_id in items.order_by('order_id').values_list('order_id', 'product_id').iterator(chunk_size=5000):
+        if order_id != current:
+            if basket:
+                yield basket
+            current, basket = order_id, set()
+        basket.add(product_id)
+    if basket:
+        yield basket
+
+
+def compute_co_purchase_neighbours(baskets, top_k=TOP_K):
+    """
+    Return the top neighbours of each product in ``baskets``.
+
+    Args:
+        baskets: iterable of sets of product IDs
+        top_k: neighbours kept per product
+
+    Returns:
+        dict: product ID -> [(neighbour ID, score), ...], best first
+    """
+    orders = Counter()
+    pairs = defaultdict(Counter)
+    for basket in baskets:
+        if len(basket) > MAX_BASKET_SIZE:
+            continue
+        orders.update(basket)
+        for a, b in combinations(sorted(basket), 2):
+            pairs[a][b] += 1
+
+    neighbours = defaultdict(list)
+    for a, counts in pairs.items():
+        for b, together in counts.items():
+            score = together / math.sqrt(orders[a] * orders[b])
+            neighbours[a].append((score, b))
+            neighbours[b].append((score, a))
+
+    # Ties go to the lower ID so rebuilds are stable
+    return {
+        pk: [(b, score) for score, b in heapq.nsmallest(top_k, scored, key=lambda x: (-x[0], x[1]))]
+        for pk, scored in neighbours.items()
+    }
+
+
+def build_recommendations(top_k=TOP_K, orders=None):
+    """
+    Rebuild every product's recommendations from the order history.
+
+    Args:
+        top_k: neighbours kept per product
+        orders: optional Order queryset limiting the history used
+
+    Returns:
+        dict: counts of 'products' and 'recommendations' stored
+    """
+    neighbours = compute_co_purchase_neighbours(_baskets(orders), top_k)
+    rows = [
+        ProductRecommendation(product_id=pk, recommended_id=b, score=score, rank=rank)
+        for pk, ranked in neighbours.items()
+        for rank, (b, score) in enumerate(ranked, start=1)
+    ]
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        ProductRecommendation.objects.bulk_create(rows, batch_size=1000)
+    transaction.on_commit(bump_recommendations_version)
+
+    logger.info(f"Built {len(rows)} recommendations for {len(neighbours)} products")
+    return {'products': len(neighbours), 'recommendations': len(rows)}
+
+
+def get_neighbours(pks):
+    """
+    Return the stored neighbours of several products, reading the cache first.
+
+    Returns:
+        dict: product ID -> [(neighbour ID, score), ...]
+    """
+    version = get_recommendations_version()
+    keys = {pk: RECOMMENDATIONS_KEY.format(version=version, pk=pk) for pk in pks}
+    cached = cache.get_many(list(keys.values()))
+    neighbours = {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+    missing = [pk for pk in keys if pk not in neighbours]
+    if missing:
+        loaded = {pk: [] for pk in missing}
+        rows = ProductRecommendation.objects.filter(product_id__in=missing).order_by('product_id', 'rank')
+        for pk, recommended_id, score in rows.values_list('product_id', 'recommended_id', 'score'):
+            loaded[pk].append((recommended_id, score))
+        timeout = getattr(settings, 'RECOMMENDATIONS_CACHE_TIMEOUT', get_cache_timeout())
+        cache.set_many({keys[pk]: value for pk, value in loaded.items()}, timeout)
+        neighbours.update(loaded)
+    return neighbours
+
+
+def get_recommendations(products, limit=4):
+    """
+    Return active products bought together with ``products``.
+
+    Neighbour scores are summed across the given products; the list is
+    topped up with same-category products when there are too few.
+
+    Args:
+        products: Product instances (a product page, cart or order)
+        limit: maximum number of products returned
+
+    Returns:
+        list: Product instances, best first
+    """
+    products = [product for product in products if product is not None]
+    seeds = {product.pk for product in products}
+    if not seeds:
+        return []
+
+    scores = Counter()
+    for ranked in get_neighbours(seeds).values():
+        for pk, score in ranked:
+            if pk not in seeds:
+                scores[pk] += score
+
+    # Over-fetch a little since inactive products are dropped
+    ranked_pks = [pk for pk, _ in sorted(scores.items(), key=lambda x: (-x[1], x[0]))][:limit * 2]
+    recommended = [product for product in get_products(ranked_pks) if product.is_active][:limit]
+
+    if len(recommended) < limit:
+        chosen = seeds | {product.pk for product in recommended}
+        for product in products:
+            # Room for the other seed products, which are skipped
+            for related in get_related_products(product, limit=limit + len(seeds)):
+                if len(recommended) >= limit:
+                    break
+                if related.pk not in chosen:
+                    recommended.append(related)
+                    chosen.add(related.pk)
+    return recommended
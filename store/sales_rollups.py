@@ -0,0 +1,234 @@
+"""
+Pre-aggregated sales figures for the staff dashboards.
+
+DailySales, StatusSales and ProductSales rows are adjusted with F()
+increments whenever an order or order item is saved or deleted, inside the
+same transaction, using the models' FieldTrackers to find what changed.
+Dashboards then read a few rollup rows instead of aggregating the order
+history. ``rebuild_sales_rollups()`` recomputes everything from scratch.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailySales, Order, OrderItem, ProductSales, StatusSales
+
+logger = logging.getLogger(__name__)
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _add(model, lookup, create=True, **deltas):
+    """
+    Add deltas to the rollup row matching ``lookup``, creating it if missing.
+    """
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    updates = {name: F(name) + value for name, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates) or not create:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Created concurrently; apply the increment to that row
+        model.objects.filter(**lookup).update(**updates)
+
+
+def _order_day(order):
+    return timezone.localdate(order.created_at) if order.created_at else timezone.localdate()
+
+
+def _apply_order(order, status, amount, count):
+    """Add ``count`` orders worth ``amount`` (both signed) to the order's day and status."""
+    amount = amount or Decimal('0')
+    _add(DailySales, {'day': _order_day(order), 'status': status}, order_count=count, total_amount=amount)
+    _add(StatusSales, {'status': status}, order_count=count, total_amount=amount)
+
+
+def _saved_change(instance, name, update_fields):
+    """Return True if save() wrote a new value for a tracked field."""
+    if update_fields is not None and name not in update_fields:
+        return False
+    return instance.tracker.has_changed(name)
+
+
+def record_order_saved(order, created, update_fields=None):
+    """
+    Apply a saved order to the rollups. Must run inside save() (post_save).
+    """
+    if created:
+        _apply_order(order, order.status, order.total_amount, 1)
+        return
+
+    status_changed = _saved_change(order, 'status', update_fields)
+    amount_changed = _saved_change(order, 'total_amount', update_fields)
+    if not (status_changed or amount_changed):
+        return
+
+    old_status = order.tracker.previous('status') if status_changed else order.status
+    old_amount = order.tracker.previous('total_amount') if amount_changed else order.total_amount
+    if old_status == order.status:
+        _apply_order(order, order.status, (order.total_amount or 0) - (old_amount or 0), 0)
+    else:
+        _apply_order(order, old_status, -(old_amount or 0), -1)
+        _apply_order(order, order.status, order.total_amount, 1)
+
+
+def record_order_deleted(order):
+    """Remove a deleted order from the rollups."""
+    _apply_order(order, order.tracker.previous('status'), -(order.tracker.previous('total_amount') or 0), -1)
+
+
+def _apply_item(product_id, quantity, price, count):
+    if product_id is None:
+        return
+    _add(
+        ProductSales,
+        {'product_id': product_id},
+        # Removing an item never creates a row; its product may be being deleted
+        create=count > 0,
+        order_count=count,
+        quantity=quantity * count,
+        revenue=(quantity or 0) * (price or 0) * count
+    )
+
+
+def record_item_saved(item, created, update_fields=None):
+    """
+    Apply a saved order item to the product rollups. Must run in post_save.
+    """
+    if created:
+        _apply_item(item.product_id, item.quantity, item.price, 1)
+        return
+
+    if not any(_saved_change(item, name, update_fields) for name in ('product', 'quantity', 'price')):
+        return
+    old_product = item.tracker.previous('product')
+    old_quantity = item.tracker.previous('quantity') or 0
+    old_price = item.tracker.previous('price') or 0
+    if old_product == item.product_id:
+        _add(
+            ProductSales,
+            {'product_id': item.product_id},
+            quantity=item.quantity - old_quantity,
+            revenue=item.quantity * item.price - old_quantity * old_price
+        )
+    else:
+        _apply_item(old_product, old_quantity, old_price, -1)
+        _apply_item(item.product_id, item.quantity, item.price, 1)
+
+
+def record_item_deleted(item):
+    """Remove a deleted order item from the product rollups."""
+    _apply_item(
+        item.tracker.previous('product'),
+        item.tracker.previous('quantity') or 0,
+        item.tracker.previous('price') or 0,
+        -1
+    )
+
+
+def rebuild_sales_rollups():
+    """
+    Recompute every rollup table from the orders and order items.
+
+    Returns:
+        dict: number of rows written per rollup table
+    """
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        StatusSales.objects.all().delete()
+        ProductSales.objects.all().delete()
+
+        daily = Order.objects.annotate(day=TruncDate('created_at')).values('day', 'status').annotate(
+            count=Count('id'),
+            amount=Coalesce(Sum('total_amount'), Decimal('0'), output_field=AMOUNT_FIELD)
+        ).order_by()
+        daily_rows = [
+            DailySales(day=row['day'], status=row['status'], order_count=row['count'], total_amount=row['amount'])
+            for row in daily
+        ]
+        DailySales.objects.bulk_create(daily_rows)
+
+        totals = {}
+        for row in daily_rows:
+            count, amount = totals.get(row.status, (0, Decimal('0')))
+            totals[row.status] = (count + row.order_count, amount + row.total_amount)
+        StatusSales.objects.bulk_create(
+            StatusSales(status=status, order_count=count, total_amount=amount)
+            for status, (count, amount) in totals.items()
+        )
+
+        products = OrderItem.objects.values('product_id').annotate(
+            count=Count('id'),
+            units=Sum('quantity'),
+            amount=Sum(F('quantity') * F('price'), output_field=AMOUNT_FIELD)
+        ).order_by()
+        product_rows = [
+            ProductSales(
+                product_id=row['product_id'],
+                order_count=row['count'],
+                quantity=row['units'] or 0,
+                revenue=row['amount'] or Decimal('0')
+            )
+            for row in products
+        ]
+        ProductSales.objects.bulk_create(product_rows)
+
+    counts = {'daily': len(daily_rows), 'status': len(totals), 'product': len(product_rows)}
+    logger.info(f"Rebuilt sales rollups: {counts}")
+    return counts
+
+
+def get_period_summary(start, end, previous_start):
+    """
+    Return order count and value for [start, end] and [previous_start, start).
+
+    Args:
+        start, end, previous_start: dates
+
+    Returns:
+        dict: total, previous_total, count, previous_count
+    """
+    current = Q(day__gte=start, day__lte=end)
+    previous = Q(day__gte=previous_start, day__lt=start)
+    return DailySales.objects.filter(day__gte=previous_start, day__lte=end).aggregate(
+        total=Coalesce(Sum('total_amount', filter=current), Decimal('0'), output_field=AMOUNT_FIELD),
+        previous_total=Coalesce(Sum('total_amount', filter=previous), Decimal('0'), output_field=AMOUNT_FIELD),
+        count=Coalesce(Sum('order_count', filter=current), 0),
+        previous_count=Coalesce(Sum('order_count', filter=previous), 0),
+    )
+
+
+def get_daily_totals(start, statuses):
+    """Return {day: total_amount} for orders in ``statuses`` since ``start``."""
+    rows = DailySales.objects.filter(day__gte=start, status__in=statuses).values('day').annotate(
+        total=Sum('total_amount')
+    ).order_by('day')
+    return {row['day']: row['total'] for row in rows}
+
+
+def get_status_distribution():
+    """
+    Return per-status order counts, largest first, with their percentage.
+
+    Returns:
+        list: dicts with status, count, total_amount and percentage
+    """
+    rows = list(StatusSales.objects.filter(order_count__gt=0).values('status', 'order_count', 'total_amount'))
+    total = sum(row['order_count'] for row in rows)
+    return [
+        {
+            'status': row['status'],
+            'count': row['order_count'],
+            'total_amount': row['total_amount'],
+            'percentage': row['order_count'] * 100 / total if total else 0,
+        }
+        for row in sorted(rows, key=lambda row: -row['order_count'])
+    ]
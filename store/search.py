@@ -0,0 +1,235 @@
+"""
+Full-text product search backed by a local SQLite FTS5 index.
+
+The index lives in its own SQLite file (``settings.SEARCH_INDEX_PATH``) so it
+works the same whatever database backs the store. It is kept current by the
+Product/Category signals in ``store.signals`` and can be rebuilt from scratch
+with ``python manage.py rebuild_search_index``.
+
+Queries are tokenized the same way as documents, every term is matched as a
+prefix and results are ranked with FTS5's built-in BM25 implementation.
+An empty index (e.g. on a fresh deploy before the rebuild has run) raises
+SearchIndexError instead of returning no results, so callers fall back to
+the database.
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = 'product_search'
+
+# Indexed columns and their BM25 weights
+COLUMN_WEIGHTS = (
+    ('name', 10.0),
+    ('short_description', 3.0),
+    ('description', 1.0),
+    ('category', 4.0),
+    ('tags', 4.0),
+)
+
+# Product fields feeding the indexed columns (tags are m2m and reindexed by
+# their own signal); is_active decides whether the product is indexed at all
+INDEXED_FIELDS = frozenset({
+    'name', 'short_description', 'description', 'category', 'category_id', 'is_active',
+})
+
+MAX_RESULTS = 500
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_local = threading.local()
+
+
+class SearchIndexError(Exception):
+    """Raised when the search index cannot be read or written."""
+
+
+def get_index_path():
+    """Return the path of the SQLite file holding the search index."""
+    return str(getattr(
+        settings,
+        'SEARCH_INDEX_PATH',
+        os.path.join(settings.BASE_DIR, 'search_index.sqlite3')
+    ))
+
+
+def _create_table(conn):
+    columns = ', '.join(name for name, _ in COLUMN_WEIGHTS)
+    conn.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_NAME} USING fts5("
+        f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+
+def get_connection():
+    """
+    Return this thread's connection to the index, creating it if needed.
+    """
+    path = get_index_path()
+    conn = getattr(_local, 'connection', None)
+    if conn is None or getattr(_local, 'path', None) != path:
+        if conn is not None:
+            conn.close()
+        try:
+            conn = sqlite3.connect(path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            _create_table(conn)
+        except sqlite3.Error as e:
+            raise SearchIndexError(f"Could not open search index at {path}: {str(e)}") from e
+        _local.connection = conn
+        _local.path = path
+    return conn
+
+
+def tokenize(text):
+    """Split text into lowercase search tokens."""
+    return [token.lower() for token in TOKEN_RE.findall(text or '')]
+
+
+def build_match_query(query):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every token must match (implicit AND) and is treated as a prefix, so
+    ``"snak pla"`` finds "Snake Plant".
+    """
+    tokens = tokenize(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def product_document(product):
+    """
+    Return the indexed column values for a product.
+
+    Expects ``category`` to be loaded via select_related and ``tags`` via
+    prefetch_related when indexing in bulk.
+    """
+    return (
+        product.name or '',
+        product.short_description or '',
+        product.description or '',
+        product.category.name if product.category_id else '',
+        ' '.join(tag.name for tag in product.tags.all()),
+    )
+
+
+def _insert_sql():
+    columns = ', '.join(name for name, _ in COLUMN_WEIGHTS)
+    placeholders = ', '.join('?' for _ in COLUMN_WEIGHTS)
+    return f"INSERT INTO {TABLE_NAME}(rowid, {columns}) VALUES (?, {placeholders})"
+
+
+def index_product(product):
+    """
+    Add or refresh a single product in the index.
+
+    Inactive products are removed so they never appear in results.
+    """
+    if not product.is_active:
+        remove_product(product.pk)
+        return
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute(f"DELETE FROM {TABLE_NAME} WHERE rowid = ?", (product.pk,))
+            conn.execute(_insert_sql(), (product.pk, *product_document(product)))
+    except sqlite3.Error as e:
+        raise SearchIndexError(f"Could not index product {product.pk}: {str(e)}") from e
+
+
+def remove_product(product_id):
+    """Remove a product from the index."""
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute(f"DELETE FROM {TABLE_NAME} WHERE rowid = ?", (product_id,))
+    except sqlite3.Error as e:
+        raise SearchIndexError(f"Could not remove product {product_id}: {str(e)}") from e
+
+
+def reindex_products(product_ids):
+    """
+    Refresh the index entries of the given products from the database.
+
+    IDs that no longer exist are removed from the index.
+    """
+    from .models import Product
+
+    product_ids = set(product_ids)
+    products = Product.objects.filter(pk__in=product_ids).select_related(
+        'category'
+    ).prefetch_related('tags')
+    for product in products:
+        index_product(product)
+        product_ids.discard(product.pk)
+    for product_id in product_ids:
+        remove_product(product_id)
+
+
+def rebuild_index(products, batch_size=500):
+    """
+    Replace the whole index with the given products.
+
+    The swap happens in one SQLite transaction, so concurrent searches keep
+    reading the previous index until the rebuild commits.
+
+    Returns:
+        int: number of indexed products
+    """
+    conn = get_connection()
+    count = 0
+    batch = []
+    try:
+        with conn:
+            conn.execute(f"DELETE FROM {TABLE_NAME}")
+            for product in products:
+                if not product.is_active:
+                    continue
+                batch.append((product.pk, *product_document(product)))
+                if len(batch) >= batch_size:
+                    conn.executemany(_insert_sql(), batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                conn.executemany(_insert_sql(), batch)
+                count += len(batch)
+            conn.execute(f"INSERT INTO {TABLE_NAME}({TABLE_NAME}) VALUES ('optimize')")
+    except sqlite3.Error as e:
+        raise SearchIndexError(f"Could not rebuild search index: {str(e)}") from e
+    return count
+
+
+def search_product_ids(query, limit=MAX_RESULTS):
+    """
+    Return product IDs matching the query, best match first.
+
+    Returns:
+        list: product IDs ordered by BM25 relevance (empty for a blank query)
+
+    Raises:
+        SearchIndexError: if the index cannot be read or holds no products
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+    weights = ', '.join(str(weight) for _, weight in COLUMN_WEIGHTS)
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"SELECT rowid FROM {TABLE_NAME} WHERE {TABLE_NAME} MATCH ? "
+            f"ORDER BY bm25({TABLE_NAME}, {weights}) LIMIT ?",
+            (match, limit)
+        ).fetchall()
+        # No match may just mean nothing was indexed yet
+        empty = not rows and conn.execute(f"SELECT 1 FROM {TABLE_NAME} LIMIT 1").fetchone() is None
+    except sqlite3.Error as e:
+        raise SearchIndexError(f"Search failed for {query!r}: {str(e)}") from e
+    if empty:
+        raise SearchIndexError(f"Search index at {get_index_path()} is empty; run rebuild_search_index")
+    return [row[0] for row in rows]
@@ -0,0 +1,146 @@
+"""
+Block-allocated number sequences (hi/lo).
+
+Each worker thread reserves a block of numbers from a NumberSequence row
+with a single ``UPDATE ... SET next_value = next_value + block_size`` and
+then hands them out from memory, so allocating a number normally doesn't
+touch the database. Numbers are unique across processes but not gapless:
+a block that a worker doesn't use up before it exits is skipped.
+
+Blocks are reserved on the NUMBER_SEQUENCE_DATABASE connection. When that
+is a separate alias for the same database, the reservation commits on its
+own right away, so the row lock taken by the UPDATE isn't held for the rest
+of the caller's transaction (e.g. a whole checkout). On the default
+connection a block reserved inside a transaction is only reused while that
+transaction is open: if it rolls back, the counter update is undone and
+another worker may reserve the same block, so it is discarded.
+"""
+import logging
+import re
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+
+from .models import NumberSequence, Order
+
+logger = logging.getLogger(__name__)
+
+ORDER_NUMBER_SEQUENCE = 'order_number'
+
+# Trailing counter of an ORD-YYYYMMDD-N order number
+ORDER_NUMBER_SUFFIX = re.compile(r'-(\d+)$')
+
+
+def get_block_size():
+    """Return how many numbers a worker reserves at a time."""
+    return getattr(settings, 'NUMBER_SEQUENCE_BLOCK_SIZE', 20)
+
+
+def get_database():
+    """Return the database alias blocks are reserved on."""
+    return getattr(settings, 'NUMBER_SEQUENCE_DATABASE', DEFAULT_DB_ALIAS)
+
+
+class _Block:
+    def __init__(self, start, end):
+        self.next = start
+        self.end = end
+        # Set once the transaction that reserved the block has committed
+        self.committed = False
+        self.commit_hook = None
+
+    def confirm(self):
+        self.committed = True
+
+
+def _initial_order_number(using):
+    """Continue numbering after the highest existing order number."""
+    highest = 0
+    for number in Order.objects.using(using).values_list('order_number', flat=True).iterator():
+        match = ORDER_NUMBER_SUFFIX.search(number or '')
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest + 1
+
+
+# Starting value for sequences created on first use
+INITIAL_VALUES = {
+    ORDER_NUMBER_SEQUENCE: _initial_order_number,
+}
+
+
+class SequenceAllocator:
+    """
+    Hands out numbers from per-thread blocks of a named sequence.
+    """
+
+    def __init__(self, name, block_size=None):
+        self.name = name
+        self.block_size = block_size
+        self._local = threading.local()
+
+    def _ensure_row(self, using):
+        if NumberSequence.objects.using(using).filter(name=self.name).exists():
+            return
+        initial = INITIAL_VALUES.get(self.name, lambda using: 1)(using)
+        try:
+            with transaction.atomic(using=using):
+                NumberSequence.objects.using(using).create(name=self.name, next_value=initial)
+            logger.info(f"Created number sequence {self.name} starting at {initial}")
+        except IntegrityError:
+            # Created concurrently by another worker
+            pass
+
+    def _reserve_block(self):
+        size = self.block_size or get_block_size()
+        using = get_database()
+        sequences = NumberSequence.objects.using(using).filter(name=self.name)
+        with transaction.atomic(using=using):
+            updated = sequences.update(next_value=F('next_value') + size)
+            if not updated:
+                self._ensure_row(using)
+                sequences.update(next_value=F('next_value') + size)
+            # The row stays locked by our UPDATE, so this reads our own increment
+            end = sequences.values_list('next_value', flat=True).get()
+        block = _Block(end - size, end)
+
+        connection = transaction.get_connection(using)
+        if connection.in_atomic_block:
+            transaction.on_commit(block.confirm, using=using)
+            block.commit_hook = connection.run_on_commit[-1]
+        else:
+            block.committed = True
+        logger.debug(f"Reserved {self.name} numbers {block.next}-{block.end - 1}")
+        return block
+
+    def _usable(self, block):
+        if block is None or block.next >= block.end:
+            return False
+        if block.committed:
+            return True
+        # Still usable only while the reserving transaction is open
+        connection = transaction.get_connection(get_database())
+        return connection.in_atomic_block and block.commit_hook in connection.run_on_commit
+
+    def next_value(self):
+        """Return the next unused number of the sequence."""
+        block = getattr(self._local, 'block', None)
+        if not self._usable(block):
+            block = self._local.block = self._reserve_block()
+        value = block.next
+        block.next += 1
+        return value
+
+    def reset(self):
+        """Forget this thread's block (used by tests)."""
+        self._local.block = None
+
+
+order_numbers = SequenceAllocator(ORDER_NUMBER_SEQUENCE)
+
+
+def next_order_number():
+    """Return the counter for a new ORD-YYYYMMDD-N order number."""
+    return order_numbers.next_value()
@@ -1,36 +1,232 @@
 """
 Signals for the store app
 """
-from django.db.models.signals import post_save, pre_save
+import logging
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.conf import settings
-from django.utils import timezone
-from .models import Order, OrderStatusUpdate
+from .models import BlogCategory, BlogPost, BlogTag, Order, OrderItem, OrderStatusUpdate, Product, ProductImage, ProductRating, Profile, Category
+from .blog_cache import bump_blog_version
+from .catalog_cache import bump_catalog_version
+from .search import INDEXED_FIELDS, SearchIndexError, reindex_products
+from .facets import affects_facets, apply_product_change
+from . import images, invoices, order_search, ratings, sales_rollups, wishlist
+from .object_cache import invalidate_categories, invalidate_product_images, invalidate_product_slug, invalidate_products
 
+logger = logging.getLogger(__name__)
 
-def track_order_status_change(sender, instance, **kwargs):
+
+def track_order_status_change(sender, instance, created, **kwargs):
     """
-    Track order status changes and create status updates
+    Record a status update when an order's status changes
     """
-    if not instance.pk:  # New order
+    # OrderTransition writes its own history rows
+    if created or getattr(instance, '_in_transition', False):
         return
-        
-    try:
-        old_instance = sender.objects.get(pk=instance.pk)
-        if old_instance.status != instance.status:  # Status changed
-            OrderStatusUpdate.create_status_update(
-                order=instance,
-                status=instance.status,
-                note=f"Order status changed from {old_instance.get_status_display()} to {instance.get_status_display()}"
-            )
-            
-            # Update delivery dates based on status
-            if instance.status == Order.Status.DELIVERED and not instance.actual_delivery_date:
-                instance.actual_delivery_date = timezone.now()
-    except sender.DoesNotExist:
-        pass  # New instance
+    
+    # Still inside save(), so the tracker holds the value the order was loaded with
+    if instance.tracker.has_changed('status'):
+        previous = instance.tracker.previous('status')
+        OrderStatusUpdate.create_status_update(
+            order=instance,
+            status=instance.status,
+            note=f"Order status changed from {dict(Order.Status.choices).get(previous, previous)} to {instance.get_status_display()}"
+        )
+
+
+def update_order_sales_rollups(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Keep the sales rollups current as orders are saved
+    """
+    sales_rollups.record_order_saved(instance, created, update_fields)
+
+
+def update_order_search_tokens(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Keep the order list search tokens current as orders are saved
+    """
+    order_search.record_order_saved(instance, created, update_fields)
+
+
+def render_invoice_on_payment(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Pre-render the invoice in the background once an order is paid
+    """
+    if not instance.payment_status:
+        return
+    if created or (
+        (update_fields is None or 'payment_status' in update_fields)
+        and instance.tracker.has_changed('payment_status')
+    ):
+        invoices.schedule_invoice(instance.pk)
+
+
+def remove_order_sales_rollups(sender, instance, **kwargs):
+    """
+    Remove a deleted order from the sales rollups
+    """
+    sales_rollups.record_order_deleted(instance)
+
+
+def update_item_sales_rollups(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Keep the product sales rollups current as order items are saved
+    """
+    sales_rollups.record_item_saved(instance, created, update_fields)
+
+
+def remove_item_sales_rollups(sender, instance, **kwargs):
+    """
+    Remove a deleted order item from the product sales rollups
+    """
+    sales_rollups.record_item_deleted(instance)
+
+
+def update_product_rating_totals(sender, instance, created=False, **kwargs):
+    """
+    Apply a saved rating to its product's running totals
+    """
+    ratings.record_rating_saved(instance, created)
+
+
+def remove_product_rating_totals(sender, instance, **kwargs):
+    """
+    Remove a deleted rating from its product's running totals
+    """
+    ratings.record_rating_deleted(instance)
+
+
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    """
+    Bump the catalog cache version when a product or category changes
+    """
+    # Wait for the commit so readers can't re-cache the old rows under the new version
+    transaction.on_commit(bump_catalog_version)
+
+
+def invalidate_blog_cache(sender, action=None, **kwargs):
+    """
+    Bump the blog cache version when a post, category or tag changes
+    """
+    # m2m_changed fires before and after each change; once is enough
+    if action is not None and not action.startswith('post_'):
+        return
+    transaction.on_commit(bump_blog_version)
+
+
+def update_product_facets(sender, instance, update_fields=None, **kwargs):
+    """
+    Apply a product change to this process's facet index
+    """
+    # Deleting clears instance.pk, so capture it now
+    product_id = instance.pk
+    # Deletes carry no update_fields, so they always refresh
+    refresh = affects_facets(instance, update_fields)
+    # Connected after invalidate_catalog_cache so this runs after the version bump
+    transaction.on_commit(lambda: apply_product_change(product_id, refresh=refresh))
+
+
+def invalidate_product_object_cache(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop a saved or deleted product from the object cache
+    """
+    product_id, slug = instance.pk, instance.slug
+    # The cached product holds every column, but the slug mapping only needs
+    # dropping when the slug itself may have changed
+    drop_slug = update_fields is None or 'slug' in update_fields
+    
+    def invalidate():
+        invalidate_products([product_id])
+        if drop_slug:
+            invalidate_product_slug(slug)
+    
+    transaction.on_commit(invalidate)
+
+
+def invalidate_product_images_object_cache(sender, instance, **kwargs):
+    """
+    Drop a product's cached gallery when one of its images changes
+    """
+    product_id = instance.product_id
+    transaction.on_commit(lambda: invalidate_product_images(product_id))
+
+
+def invalidate_category_object_cache(sender, instance, **kwargs):
+    """
+    Drop the cached category list when a category changes
+    """
+    transaction.on_commit(invalidate_categories)
+
+
+def _reindex_on_commit(product_ids):
+    """Refresh search index entries once the current transaction commits"""
+    product_ids = list(product_ids)
+    
+    def reindex():
+        try:
+            reindex_products(product_ids)
+        except SearchIndexError as e:
+            # The index can be repaired with rebuild_search_index
+            logger.error(f"Error updating search index: {str(e)}")
+    
+    if product_ids:
+        transaction.on_commit(reindex)
+
+
+def update_product_search_index(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the search index entry of a saved or deleted product current
+    """
+    # Saves limited to other fields (e.g. stock) leave the document unchanged
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    _reindex_on_commit([instance.pk])
+
+
+def update_product_tags_search_index(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Reindex products whose tags changed
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # A tag gained or lost products; pk_set is None for clear()
+        product_ids = pk_set or []
+    else:
+        product_ids = [instance.pk]
+    _reindex_on_commit(product_ids)
+
+
+def update_category_search_index(sender, instance, **kwargs):
+    """
+    Reindex a renamed or deleted category's products so their indexed
+    category name stays current (deletes run before the products are unlinked)
+    """
+    _reindex_on_commit(instance.products.values_list('pk', flat=True))
+
+
+def update_wishlist_counts_on_product_delete(sender, instance, **kwargs):
+    """
+    Take a deleted product off the wishlist counts before its items cascade
+    """
+    wishlist.release_deleted_product(instance.pk)
+
+
+# Image fields that get resized derivatives, by model
+IMAGE_FIELDS = {
+    Product: 'image',
+    ProductImage: 'image',
+    Profile: 'profile_picture',
+}
+
+
+def schedule_image_derivatives(sender, instance, **kwargs):
+    """
+    Build resized derivatives of a newly uploaded image in the background
+    """
+    images.schedule_derivatives(getattr(instance, IMAGE_FIELDS[sender]))
 
 
 def create_or_update_user_profile(sender, instance, created, **kwargs):
@@ -64,7 +260,6 @@ def create_cart_for_new_user(user):
 
 # Connect the signals when Django is ready
 def ready():
-    from django.db.models.signals import post_save, pre_save
     from django.apps import apps
     
     # Connect user signals
@@ -74,6 +269,60 @@ def ready():
     # Connect order signals
     post_save.connect(track_order_status_change, sender=Order)
     
+    # Connect sales rollup signals
+    post_save.connect(update_order_sales_rollups, sender=Order)
+    post_delete.connect(remove_order_sales_rollups, sender=Order)
+    post_save.connect(update_item_sales_rollups, sender=OrderItem)
+    post_delete.connect(remove_item_sales_rollups, sender=OrderItem)
+    
+    # Connect order search token signals
+    post_save.connect(update_order_search_tokens, sender=Order)
+    
+    # Connect invoice rendering signals
+    post_save.connect(render_invoice_on_payment, sender=Order)
+    
+    # Connect product rating total signals
+    post_save.connect(update_product_rating_totals, sender=ProductRating)
+    post_delete.connect(remove_product_rating_totals, sender=ProductRating)
+    
+    # Connect catalog cache invalidation signals
+    for model in (Product, Category):
+        post_save.connect(invalidate_catalog_cache, sender=model)
+        post_delete.connect(invalidate_catalog_cache, sender=model)
+    
+    # Connect blog sidebar cache invalidation signals
+    for model in (BlogPost, BlogCategory, BlogTag):
+        post_save.connect(invalidate_blog_cache, sender=model)
+        post_delete.connect(invalidate_blog_cache, sender=model)
+    for through in (BlogPost.categories.through, BlogPost.tags.through):
+        m2m_changed.connect(invalidate_blog_cache, sender=through)
+    
+    # Connect facet index signals (category changes rebuild via the version bump)
+    post_save.connect(update_product_facets, sender=Product)
+    post_delete.connect(update_product_facets, sender=Product)
+    
+    # Connect object cache signals
+    post_save.connect(invalidate_product_object_cache, sender=Product)
+    post_delete.connect(invalidate_product_object_cache, sender=Product)
+    post_save.connect(invalidate_product_images_object_cache, sender=ProductImage)
+    post_delete.connect(invalidate_product_images_object_cache, sender=ProductImage)
+    post_save.connect(invalidate_category_object_cache, sender=Category)
+    post_delete.connect(invalidate_category_object_cache, sender=Category)
+    
+    # Connect image derivative signals
+    for model in IMAGE_FIELDS:
+        post_save.connect(schedule_image_derivatives, sender=model)
+    
+    # Connect search index signals
+    post_save.connect(update_product_search_index, sender=Product)
+    post_delete.connect(update_product_search_index, sender=Product)
+    post_save.connect(update_category_search_index, sender=Category)
+    pre_delete.connect(update_category_search_index, sender=Category)
+    m2m_changed.connect(update_product_tags_search_index, sender=Product.tags.through)
+    
+    # Connect wishlist count signals
+    pre_delete.connect(update_wishlist_counts_on_product_delete, sender=Product)
+    
     # Also handle the custom user model if it exists
     try:
         if hasattr(settings, 'AUTH_USER_MODEL'):
@@ -0,0 +1,42 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from store.images import get_image_sources
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', size='card', **attrs):
+    """
+    Render an image with ``srcset`` candidates from its resized derivatives,
+    WebP first. Falls back to a plain ``<img>`` of the original until the
+    derivatives are built.
+    
+    Usage in template:
+    {% responsive_image product.image alt=product.name sizes="(min-width: 992px) 25vw, 50vw" class="card-img-top" %}
+    
+    ``image`` is an image field or a cached ``{'url': ..., 'name': ...}``
+    payload; ``size`` names the IMAGE_DERIVATIVE_WIDTHS entry used as ``src``.
+    """
+    if not image:
+        return ''
+    if isinstance(image, dict):
+        name, url = image.get('name'), image.get('url')
+    else:
+        try:
+            name, url = image.name, image.url
+        except ValueError:
+            # Field has no file associated with it
+            return ''
+    
+    attrs.setdefault('loading', 'lazy')
+    sources = get_image_sources(name, size)
+    if sources is None:
+        return format_html('<img src="{}" alt="{}"{}>', url, alt, flatatt(attrs))
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}"{}></picture>',
+        sources['webp_srcset'], sizes, sources['src'], sources['srcset'], sizes, alt, flatatt(attrs)
+    )
@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.test import RequestFactory, TestCase, override_settings
+
+from store.blog_cache import get_blog_version, get_sidebar_context
+from store.models import BlogCategory, BlogPost, BlogTag
+from store.views import BlogPostListView
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class BlogSidebarCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = BlogCategory.objects.create(name='Care Guides', slug='care-guides')
+        self.tag = BlogTag.objects.create(name='Ferns', slug='ferns')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = BlogPost.objects.create(title='Repotting ferns', content='...', status=BlogPost.PUBLISHED)
+            self.post.categories.add(self.category)
+            self.post.tags.add(self.tag)
+
+    def _render(self):
+        return get_template('blog/sidebar.html').render(get_sidebar_context())
+
+    def test_warm_sidebar_needs_no_queries(self):
+        html = self._render()
+        self.assertIn('Care Guides', html)
+        self.assertIn('/blog/tag/ferns/', html)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._render(), html)
+
+    def test_publishing_refreshes_sidebar(self):
+        self._render()
+        version = get_blog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post = BlogPost.objects.create(title='Palms indoors', content='...', status=BlogPost.PUBLISHED)
+            post.categories.add(BlogCategory.objects.create(name='Indoor', slug='indoor'))
+
+        self.assertGreater(get_blog_version(), version)
+        self.assertIn('Indoor', self._render())
+
+    def test_list_view_runs_only_its_own_queries(self):
+        self._render()
+        view = BlogPostListView()
+        view.setup(RequestFactory().get('/blog/'))
+        view.object_list = view.get_queryset()
+
+        # Count, posts, and the categories and tags prefetches
+        with self.assertNumQueries(4):
+            context = view.get_context_data()
+            self.assertEqual(len(context['posts']), 1)
+        self.assertEqual(context['blog_version'], get_blog_version())
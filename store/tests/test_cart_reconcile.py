@@ -0,0 +1,55 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from store.cart_reconcile import REMOVED_INACTIVE, REMOVED_OUT_OF_STOCK, reconcile_cart
+from store.models import Cart, CartItem, Product
+
+
+class ReconcileCartTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user('grower', 'grower@example.com', 'pass')
+        self.cart, _ = Cart.objects.get_or_create(user=user, status='active')
+        self.products = []
+        for i in range(20):
+            product = Product.objects.create(
+                name=f'Plant {i}',
+                slug=f'plant-{i}',
+                sku=f'PLT-{i}',
+                price=Decimal('100.00'),
+                quantity=10,
+                description='Leafy',
+            )
+            CartItem.objects.create(cart=self.cart, product=product, quantity=3, price=product.price)
+            self.products.append(product)
+
+    def test_unchanged_cart_costs_two_queries(self):
+        # Items and locked products, plus the savepoint pair of the atomic block
+        with self.assertNumQueries(4):
+            result = reconcile_cart(self.cart)
+
+        self.assertEqual(len(result.active_items), 20)
+        self.assertFalse(result.changed)
+        self.assertEqual(result.subtotal, Decimal('6000.00'))
+
+    def test_adjusts_and_removes_in_bulk(self):
+        Product.objects.filter(pk=self.products[0].pk).update(quantity=2)
+        Product.objects.filter(pk=self.products[1].pk).update(quantity=1)
+        Product.objects.filter(pk=self.products[2].pk).update(quantity=0)
+        Product.objects.filter(pk=self.products[3].pk).update(is_active=False)
+
+        result = reconcile_cart(self.cart)
+
+        self.assertEqual(
+            sorted((item.product_id, old) for item, old in result.adjusted),
+            [(self.products[0].pk, 3), (self.products[1].pk, 3)]
+        )
+        self.assertCountEqual(
+            [(item.product_id, reason) for item, reason in result.removed],
+            [(self.products[2].pk, REMOVED_OUT_OF_STOCK), (self.products[3].pk, REMOVED_INACTIVE)]
+        )
+        quantities = dict(self.cart.items.values_list('product_id', 'quantity'))
+        self.assertEqual(len(quantities), 18)
+        self.assertEqual(quantities[self.products[0].pk], 2)
+        self.assertEqual(quantities[self.products[1].pk], 1)
+        self.assertEqual(result.item_count, 3 * 16 + 2 + 1)
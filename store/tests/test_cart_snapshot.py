@@ -0,0 +1,48 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory, TestCase
+
+from store.cart_utils import add_to_cart, get_cart_items, get_cart_snapshot
+from store.context_processors import cart as cart_context
+from store.models import Cart, CartItem, Product
+
+
+class CartSnapshotTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('grower', 'grower@example.com', 'pass')
+        self.product = Product.objects.create(
+            name='Snake Plant',
+            slug='snake-plant',
+            sku='SNK-1',
+            price=Decimal('250.00'),
+            quantity=10,
+            description='Hardy plant',
+        )
+        cart, _ = Cart.objects.get_or_create(user=self.user, status='active')
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2, price=self.product.price)
+
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+        self.request.session = SessionStore()
+
+    def test_context_processor_is_lazy_and_shared(self):
+        with self.assertNumQueries(0):
+            context = cart_context(self.request)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(context['cart_count'], 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(context['cart_total'], Decimal('500.00'))
+            data = get_cart_items(self.request)
+        self.assertEqual(data['count'], 2)
+
+    def test_writes_invalidate_snapshot(self):
+        snapshot = get_cart_snapshot(self.request)
+        self.assertEqual(snapshot.count, 2)
+
+        success, message, item = add_to_cart(self.request, self.product.id, quantity=3)
+
+        self.assertTrue(success)
+        self.assertEqual(snapshot.count, 5)
+        self.assertEqual(snapshot.total, Decimal('1250.00'))
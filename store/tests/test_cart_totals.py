@@ -0,0 +1,63 @@
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from store.models import Cart, CartItem, Product
+
+
+class CartTotalsTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user('grower', 'grower@example.com', 'pass')
+        self.cart, _ = Cart.objects.get_or_create(user=user, status='active')
+        self.fern = self._product('fern', '120.00')
+        self.palm = self._product('palm', '300.00')
+
+    def _product(self, slug, price):
+        return Product.objects.create(
+            name=slug.title(),
+            slug=slug,
+            sku=slug,
+            price=Decimal(price),
+            quantity=20,
+            description=slug,
+        )
+
+    def _stored(self):
+        self.cart.refresh_from_db()
+        return self.cart.total, self.cart.total_quantity
+
+    def test_item_changes_apply_deltas(self):
+        fern_item = CartItem.objects.create(cart=self.cart, product=self.fern, quantity=2, price=self.fern.price)
+        CartItem.objects.create(cart=self.cart, product=self.palm, quantity=1, price=self.palm.price)
+        self.assertEqual(self._stored(), (Decimal('540.00'), 3))
+
+        fern_item.quantity = 5
+        fern_item.save()
+        self.assertEqual(self._stored(), (Decimal('900.00'), 6))
+
+        fern_item.delete()
+        self.assertEqual(self._stored(), (Decimal('300.00'), 1))
+
+        self.cart.items.all().delete()
+        self.assertEqual(self._stored(), (Decimal('0.00'), 0))
+
+    def test_cached_cart_is_kept_current(self):
+        item = CartItem.objects.create(cart=self.cart, product=self.fern, quantity=2, price=self.fern.price)
+        item.increase_quantity(1)
+
+        self.assertEqual(self.cart.total, Decimal('360.00'))
+        self.assertEqual(self.cart.item_count, 3)
+
+    def test_verifier_repairs_drift(self):
+        CartItem.objects.create(cart=self.cart, product=self.fern, quantity=2, price=self.fern.price)
+        Cart.objects.filter(pk=self.cart.pk).update(total=Decimal('1.00'), total_quantity=7)
+
+        out = StringIO()
+        call_command('verify_cart_totals', '--dry-run', stdout=out)
+        self.assertIn(f'Cart {self.cart.pk}:', out.getvalue())
+        self.assertEqual(self._stored(), (Decimal('1.00'), 7))
+
+        call_command('verify_cart_totals', stdout=StringIO())
+        self.assertEqual(self._stored(), (Decimal('240.00'), 2))
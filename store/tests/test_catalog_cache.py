@@ -0,0 +1,56 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from store.catalog_cache import get_catalog_version, get_home_rails
+from store.models import Category, Product, ProductRating
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class HomeRailsCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Indoor', slug='indoor')
+        self.product = Product.objects.create(
+            name='Snake Plant',
+            slug='snake-plant',
+            sku='SNK-1',
+            price=Decimal('499.00'),
+            quantity=5,
+            description='Hardy plant',
+            category=self.category,
+            is_featured=True,
+        )
+
+    def test_warm_rails_need_no_queries(self):
+        get_home_rails()
+        with self.assertNumQueries(0):
+            rails = get_home_rails()
+        self.assertEqual(rails['featured_products']['ids'], [self.product.id])
+        self.assertEqual(rails['categories']['items'][0]['product_count'], 1)
+
+    def test_product_change_bumps_version(self):
+        get_home_rails()
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.quantity = 0
+            self.product.save()
+
+        self.assertGreater(get_catalog_version(), version)
+        rails = get_home_rails()
+        self.assertEqual(rails['featured_products']['ids'], [])
+        self.assertEqual(rails['categories']['ids'], [])
+
+    def test_rails_carry_ratings(self):
+        user = get_user_model().objects.create_user('alice', 'alice@example.com', 'pass')
+        get_home_rails()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductRating.objects.create(user=user, product=self.product, rating=4, is_approved=True)
+
+        item = get_home_rails()['featured_products']['items'][0]
+        self.assertEqual((item['average_rating'], item['review_count']), (Decimal('4.00'), 1))
@@ -0,0 +1,150 @@
+import socketserver
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from store.email_utils import queue_order_confirmation_email, send_queued_emails
+from store.models import EmailOutbox, Order, OrderItem, Product
+
+
+class RefusingBackend(LocmemBackend):
+    """Backend whose server rejects every message."""
+
+    def send_messages(self, messages):
+        raise ConnectionRefusedError('server unavailable')
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept messages and count connections."""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost ready')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'EHLO':
+                self.reply('250 localhost')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                while self.rfile.readline().rstrip(b'\r\n') != b'.':
+                    pass
+                self.server.messages += 1
+                self.reply('250 queued')
+            else:
+                self.reply('250 ok')
+
+
+class EmailOutboxTest(TestCase):
+    def setUp(self):
+        product = Product.objects.create(
+            name='Fern',
+            slug='fern',
+            sku='fern',
+            price=Decimal('120.00'),
+            quantity=10,
+            description='fern',
+        )
+        self.orders = [self._order(n, product) for n in range(3)]
+
+    def _order(self, n, product):
+        order = Order.objects.create(
+            first_name='Test',
+            last_name='User',
+            email=f'buyer{n}@example.com',
+            address='123 Test St',
+            postal_code='12345',
+            city='Test City',
+            state='Kerala',
+            total_amount=Decimal('240.00'),
+        )
+        OrderItem.objects.create(order=order, product=product, price=product.price, quantity=2)
+        return order
+
+    def test_queueing_does_not_send_and_is_idempotent(self):
+        order = self.orders[0]
+        self.assertTrue(queue_order_confirmation_email(order)[0])
+        self.assertTrue(queue_order_confirmation_email(order)[0])
+
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_worker_sends_due_emails(self):
+        for order in self.orders:
+            queue_order_confirmation_email(order)
+
+        counts = send_queued_emails()
+
+        self.assertEqual(counts['sent'], 3)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [order.email for order in self.orders]
+        )
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.Status.SENT).exists())
+        # Sent emails are not picked up again
+        self.assertEqual(send_queued_emails()['sent'], 0)
+
+    @override_settings(EMAIL_BACKEND='store.tests.test_email_outbox.RefusingBackend', EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_failures_back_off_then_give_up(self):
+        queue_order_confirmation_email(self.orders[0])
+        entry = EmailOutbox.objects.get()
+
+        before = timezone.now()
+        self.assertEqual(send_queued_emails(max_attempts=2)['retried'], 1)
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), (EmailOutbox.Status.PENDING, 1))
+        self.assertGreaterEqual(entry.next_attempt_at, before + timedelta(seconds=60))
+        self.assertIn('server unavailable', entry.last_error)
+
+        # Not due yet
+        self.assertEqual(sum(send_queued_emails(max_attempts=2).values()), 0)
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_emails(max_attempts=2)['failed'], 1)
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), (EmailOutbox.Status.FAILED, 2))
+
+    def test_expired_lease_is_reclaimed(self):
+        queue_order_confirmation_email(self.orders[0])
+        EmailOutbox.objects.update(
+            status=EmailOutbox.Status.SENDING,
+            next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(send_queued_emails()['sent'], 1)
+
+    def test_batch_uses_one_smtp_connection(self):
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPHandler)
+        server.daemon_threads = True
+        server.connections = server.messages = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        for order in self.orders:
+            queue_order_confirmation_email(order)
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=server.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+        ):
+            call_command('send_queued_emails', stdout=StringIO())
+
+        self.assertEqual((server.connections, server.messages), (1, 3))
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.Status.SENT).count(), 3)
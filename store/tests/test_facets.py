@@ -0,0 +1,123 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from store import facets
+from store.filters import ProductFilter
+from store.models import Category, Product
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class FacetIndexTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        facets._index = None
+        self.addCleanup(setattr, facets, '_index', None)
+
+        self.indoor = Category.objects.create(name='Indoor', slug='indoor')
+        self.outdoor = Category.objects.create(name='Outdoor', slug='outdoor')
+        self.snake = self._product('snake', '450.00', self.indoor, 'easy', is_featured=True)
+        self.fern = self._product('fern', '800.00', self.indoor, 'moderate')
+        self.rose = self._product('rose', '1500.00', self.outdoor, 'difficult', is_featured=True)
+        self.palm = self._product('palm', '6000.00', self.outdoor, 'easy', quantity=0)
+
+    def _product(self, slug, price, category, difficulty, quantity=5, **kwargs):
+        return Product.objects.create(
+            name=slug.title(),
+            slug=slug,
+            sku=slug,
+            price=Decimal(price),
+            quantity=quantity,
+            description=slug,
+            category=category,
+            difficulty_level=difficulty,
+            **kwargs
+        )
+
+    def test_price_buckets_match_product_filter(self):
+        self.assertEqual(facets.price_bucket(Decimal('500.00')), '0-500')
+        self.assertEqual(facets.price_bucket(Decimal('500.01')), '500-1000')
+        self.assertEqual(facets.price_bucket(Decimal('5000.00')), '2000-5000')
+        self.assertEqual(facets.price_bucket(Decimal('5000.01')), '5000-')
+
+    def test_query_combines_facets_and_counts_other_options(self):
+        index = facets.get_facet_index()
+        result = index.query(
+            {'difficulty': ['easy', 'moderate'], 'category': self.indoor.pk},
+            base=index.on_hand,
+        )
+
+        self.assertEqual(result.ids(), [self.snake.pk, self.fern.pk])
+        # Category counts ignore the category selection but keep the difficulty one
+        self.assertEqual(result.counts['category'], {self.indoor.pk: 2})
+        # Difficulty counts ignore the difficulty selection but keep the category one
+        self.assertEqual(result.counts['difficulty'], {'easy': 1, 'moderate': 1})
+        self.assertEqual(result.counts['featured'], {True: 1})
+
+    def test_unticked_checkbox_does_not_filter(self):
+        products = Product.objects.order_by('pk')
+        index = facets.get_facet_index()
+
+        # A checkbox absent from the query string cleans to False, which must
+        # not exclude the featured products
+        unfiltered = ProductFilter({}, queryset=products)
+        self.assertTrue(unfiltered.is_valid())
+        self.assertEqual(list(unfiltered.qs), [self.snake, self.fern, self.rose, self.palm])
+        self.assertIsNone(unfiltered.facet_selection()['featured'])
+
+        featured = ProductFilter({'featured': 'on'}, queryset=products)
+        self.assertTrue(featured.is_valid())
+        self.assertEqual([p.pk for p in featured.qs], index.query(featured.facet_selection()).ids())
+
+    def test_product_changes_are_applied_without_rebuild(self):
+        index = facets.get_facet_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fern.is_featured = True
+            self.fern.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rose.delete()
+
+        with self.assertNumQueries(0):
+            self.assertIs(facets.get_facet_index(), index)
+        result = index.query({'featured': True})
+        self.assertEqual(result.ids(), [self.snake.pk, self.fern.pk])
+
+    def test_category_change_triggers_rebuild(self):
+        index = facets.get_facet_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.outdoor.delete()
+
+        rebuilt = facets.get_facet_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.query({}).counts['category'], {self.indoor.pk: 2})
+
+    def test_index_is_rebuilt_after_max_age(self):
+        index = facets.get_facet_index()
+        # Stock changes written with update() skip the signals
+        Product.objects.filter(pk=self.palm.pk).update(quantity=3)
+
+        with override_settings(FACET_INDEX_MAX_AGE=3600):
+            self.assertIs(facets.get_facet_index(), index)
+        with override_settings(FACET_INDEX_MAX_AGE=0):
+            rebuilt = facets.get_facet_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.query({'in_stock': True}).bits.bit_count(), 4)
+
+    def test_stock_only_save_refreshes_only_when_stock_runs_out(self):
+        self.fern.quantity = 2
+        self.assertFalse(facets.affects_facets(self.fern, ['quantity', 'updated_at']))
+        self.assertFalse(facets.affects_facets(self.fern, ['description']))
+        self.fern.quantity = 0
+        self.assertTrue(facets.affects_facets(self.fern, ['quantity', 'updated_at']))
+        self.assertTrue(facets.affects_facets(self.fern))
+
+        index = facets.get_facet_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fern.save(update_fields=['quantity', 'updated_at'])
+
+        self.assertIs(facets.get_facet_index(), index)
+        self.assertNotIn(self.fern.pk, index.query({'in_stock': True}).ids())
@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from store.cart_utils import merge_guest_cart
+from store.models import Cart, CartItem, Product
+
+
+# Sessions are cache backed in the test settings
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class GuestCartMergeTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', 'alice@example.com', 'pass')
+        self.cart = Cart.objects.get(user=self.user, status='active')
+        self.fern, self.palm, self.cactus = [
+            self._product(slug, quantity) for slug, quantity in (('fern', 50), ('palm', 3), ('cactus', 50))
+        ]
+
+    def _product(self, slug, quantity):
+        return Product.objects.create(
+            name=slug.title(), slug=slug, sku=slug, price=Decimal('100.00'), quantity=quantity, description=slug
+        )
+
+    def _guest_cart(self, **quantities):
+        products = {product.slug: product for product in (self.fern, self.palm, self.cactus)}
+        return {
+            str(products[slug].pk): {'product_id': products[slug].pk, 'price': '90.00', 'quantity': quantity}
+            for slug, quantity in quantities.items()
+        }
+
+    def test_merge_inserts_and_bumps_in_bulk(self):
+        CartItem.objects.create(cart=self.cart, product=self.fern, quantity=1)
+        self.cactus.is_active = False
+        self.cactus.save()
+        guest_cart = self._guest_cart(fern=2, palm=5, cactus=1)
+        guest_cart['bogus'] = {'quantity': 1}
+
+        # Savepoints, cart, products, cart lines, INSERT, UPDATE, totals
+        with self.assertNumQueries(10):
+            merge_guest_cart(self.user, guest_cart)
+
+        self.assertEqual(
+            dict(self.cart.items.values_list('product__slug', 'quantity')), {'fern': 3, 'palm': 3}
+        )
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.total, self.cart.total_quantity), (Decimal('600.00'), 6))
+
+    def test_login_merges_session_cart(self):
+        session = self.client.session
+        session['guest_cart'] = self._guest_cart(fern=2)
+        session.save()
+
+        self.client.force_login(self.user)
+
+        self.assertEqual(list(self.cart.items.values_list('product__slug', 'quantity')), [('fern', 2)])
+        self.assertNotIn('guest_cart', self.client.session)
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from store.images import get_derivative_root, get_derivatives, get_image_sources
+from store.models import Category, Product, ProductImage
+
+
+def _jpeg(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (40, 120, 60)).save(buffer, 'JPEG')
+    return SimpleUploadedFile('fern.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageDerivativeTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            IMAGE_DERIVATIVE_ROOT=os.path.join(self.media_root, 'derivatives'),
+            IMAGE_DERIVATIVE_WORKERS=0,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def _product(self, slug, image):
+        return Product.objects.create(
+            name=slug.title(), slug=slug, sku=slug, price=Decimal('100.00'), quantity=5, description=slug, image=image
+        )
+
+    def test_upload_builds_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self._product('fern', _jpeg(1200, 600))
+
+        entry = get_derivatives(product.image.name)
+        self.assertEqual(entry['widths'], [160, 400, 800])
+        directory = os.path.join(get_derivative_root(), entry['hash'][:2])
+        self.assertEqual(len(os.listdir(directory)), 6)
+        with Image.open(os.path.join(directory, f"{entry['hash']}-400.webp")) as image:
+            self.assertEqual(image.size, (400, 200))
+
+        # Saving again does no image work
+        with mock.patch('store.images.build_derivatives') as build:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.save()
+        build.assert_not_called()
+
+        html = Template(
+            '{% load image_tags %}{% responsive_image product.image alt="Fern" sizes="50vw" class="card-img-top" %}'
+        ).render(Context({'product': product}))
+        sources = get_image_sources(product.image.name)
+        self.assertIn(f'<source type="image/webp" srcset="{sources["webp_srcset"]}" sizes="50vw">', html)
+        self.assertIn(f'src="{sources["src"]}"', html)
+        self.assertTrue(sources['src'].endswith('-400.jpg'))
+
+    def test_small_images_are_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self._product('palm', _jpeg(300, 300))
+
+        self.assertEqual(get_derivatives(product.image.name)['widths'], [160, 300])
+
+    def test_command_builds_existing_images(self):
+        product = self._product('cactus', _jpeg(500, 500))
+        self.assertIsNone(get_derivatives(product.image.name))
+        html = Template('{% load image_tags %}{% responsive_image image %}').render(Context({'image': product.image}))
+        self.assertEqual(html, f'<img src="{product.image.url}" alt="" loading="lazy">')
+
+        out = StringIO()
+        call_command('build_image_derivatives', '--workers', '1', stdout=out)
+
+        self.assertIn('Built derivatives for 1 images (0 failed)', out.getvalue())
+        self.assertEqual(get_derivatives(product.image.name)['widths'], [160, 400, 500])
+
+    def test_product_page_uses_gallery_thumbnails(self):
+        category = Category.objects.create(name='Indoor', slug='indoor')
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self._product('fern', _jpeg(1200, 600))
+            product.category = category
+            product.save()
+            gallery = ProductImage.objects.create(product=product, image=_jpeg(1000, 1000), alt_text='Fern leaves')
+
+        response = self.client.get(reverse('store:product_detail', kwargs={'slug': product.slug}), secure=True)
+
+        self.assertContains(response, get_image_sources(product.image.name, 'large')['src'])
+        for image in (product.image, gallery.image):
+            self.assertContains(response, get_image_sources(image.name, 'thumbnail')['src'])
+        self.assertNotContains(response, f'src="{gallery.image.url}"')
+
+        # Removing a gallery image drops the cached gallery
+        with self.captureOnCommitCallbacks(execute=True):
+            gallery.delete()
+        response = self.client.get(reverse('store:product_detail', kwargs={'slug': product.slug}), secure=True)
+        self.assertEqual(response.context['gallery_images'], [])
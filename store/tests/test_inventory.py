@@ -0,0 +1,66 @@
+from decimal import Decimal
+from django.test import TestCase
+
+from store.inventory import release_stock, reserve_stock
+from store.models import Product
+
+
+class ReserveStockTest(TestCase):
+    def setUp(self):
+        self.fern = self._product('fern', quantity=5)
+        self.palm = self._product('palm', quantity=2)
+        self.seeds = self._product('seeds', quantity=0, track_quantity=False)
+
+    def _product(self, slug, **kwargs):
+        return Product.objects.create(
+            name=slug.title(),
+            slug=slug,
+            sku=slug,
+            price=Decimal('100.00'),
+            description=slug,
+            **kwargs
+        )
+
+    def _stock(self, product):
+        product.refresh_from_db()
+        return product.quantity
+
+    def test_reserves_every_line(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = reserve_stock([
+                (self.fern.pk, 2),
+                (self.palm.pk, 2),
+                (self.fern.pk, 1),
+                (self.seeds.pk, 10),
+            ])
+
+        self.assertTrue(result.success)
+        self.assertEqual(self._stock(self.fern), 2)
+        self.assertEqual(self._stock(self.palm), 0)
+        self.assertEqual(self._stock(self.seeds), 0)
+
+    def test_short_line_rolls_back_all_lines(self):
+        result = reserve_stock([(self.fern.pk, 2), (self.palm.pk, 3)])
+
+        self.assertFalse(result.success)
+        [failed] = result.failed
+        self.assertEqual((failed.product_id, failed.available), (self.palm.pk, 2))
+        self.assertEqual(self._stock(self.fern), 5)
+        self.assertEqual(self._stock(self.palm), 2)
+
+    def test_inactive_product_is_not_reserved(self):
+        Product.objects.filter(pk=self.fern.pk).update(is_active=False)
+
+        result = reserve_stock([(self.fern.pk, 1)])
+
+        self.assertFalse(result.success)
+        self.assertEqual(self._stock(self.fern), 5)
+
+    def test_release_returns_reserved_stock(self):
+        lines = [(self.fern.pk, 2), (self.seeds.pk, 3)]
+        reserve_stock(lines)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(release_stock(lines), [self.fern.pk])
+        self.assertEqual(self._stock(self.fern), 5)
+        self.assertEqual(self._stock(self.seeds), 0)
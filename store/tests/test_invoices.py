@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+
+from store.invoices import get_invoice
+from store.models import Order, OrderItem, Product
+from store.views import InvoiceView
+
+
+class InvoiceTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(INVOICE_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'pass')
+        self.product = Product.objects.create(
+            name='Fern', slug='fern', sku='fern', price=Decimal('100.00'), quantity=50, description='fern'
+        )
+        self.order = Order.objects.create(
+            user=self.user,
+            first_name='Test',
+            last_name='User',
+            email='buyer@example.com',
+            address='123 Test St',
+            postal_code='12345',
+            city='Test City',
+            state='Kerala',
+        )
+        self.item = OrderItem.objects.create(order=self.order, product=self.product, price=Decimal('100.00'), quantity=2)
+
+    def _get(self, user, **headers):
+        request = RequestFactory().get(f'/store/invoice/{self.order.pk}/', **headers)
+        request.user = user
+        return InvoiceView.as_view()(request, pk=self.order.pk)
+
+    def test_invoice_is_rendered_once_per_version(self):
+        first = get_invoice(self.order)
+        self.assertTrue(first.rendered)
+        with open(first.path, 'rb') as f:
+            self.assertTrue(f.read().startswith(b'%PDF'))
+
+        again = get_invoice(self.order)
+        self.assertFalse(again.rendered)
+        self.assertEqual(again.digest, first.digest)
+
+        self.item.quantity = 3
+        self.item.save()
+        changed = get_invoice(self.order)
+        self.assertTrue(changed.rendered)
+        self.assertNotEqual(changed.digest, first.digest)
+        # The previous version stays for downloads that are about to open it
+        directory = os.path.dirname(changed.path)
+        self.assertCountEqual(os.listdir(directory), [f"{first.digest}.pdf", f"{changed.digest}.pdf"])
+
+        # Make the versions' ages unambiguous on coarse-grained filesystems
+        os.utime(first.path, (1, 1))
+        self.item.quantity = 4
+        self.item.save()
+        latest = get_invoice(self.order)
+        self.assertCountEqual(os.listdir(directory), [f"{changed.digest}.pdf", f"{latest.digest}.pdf"])
+
+    def test_view_serves_stored_pdf_with_etag(self):
+        response = self._get(self.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn(f'invoice_{self.order.order_number}.pdf', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        response.close()
+
+        with self.assertNumQueries(2):
+            cached = self._get(self.user, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_other_customers_cannot_download(self):
+        stranger = get_user_model().objects.create_user('stranger', 'stranger@example.com', 'pass')
+        with self.assertRaises(Http404):
+            self._get(stranger)
+
+    def test_payment_schedules_background_render(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.order.notes = 'Gift'
+            self.order.save()
+        self.assertEqual(len(callbacks), 0)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.order.payment_status = True
+            self.order.save()
+        self.assertEqual(len(callbacks), 1)
+
+    def test_prerender_command(self):
+        out = StringIO()
+        call_command('prerender_invoices', '--workers', '1', stdout=out)
+        self.assertIn('Rendered 1 invoices (0 already current', out.getvalue())
+
+        out = StringIO()
+        call_command('prerender_invoices', '--workers', '1', '--paid-only', stdout=out)
+        self.assertIn('Rendered 0 invoices (0 already current', out.getvalue())
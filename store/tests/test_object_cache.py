@@ -0,0 +1,156 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from angels_plants import settings as production_settings
+from store import object_cache
+from store.inventory import reserve_stock
+from store.models import Category, Product
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ObjectCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.category = Category.objects.create(name='Indoor', slug='indoor')
+        self.fern = self._product('fern')
+        self.palm = self._product('palm')
+
+    def _product(self, slug):
+        return Product.objects.create(
+            name=slug.title(),
+            slug=slug,
+            sku=slug,
+            price=Decimal('150.00'),
+            quantity=5,
+            description=slug,
+            category=self.category,
+        )
+
+    def test_warm_lookups_do_not_query(self):
+        object_cache.get_product(slug='fern')
+        object_cache.get_related_products(self.fern)
+
+        with self.assertNumQueries(0):
+            product = object_cache.get_product(slug='fern')
+            related = object_cache.get_related_products(product)
+            self.assertEqual(product.category.name, 'Indoor')
+            self.assertEqual(product.price, Decimal('150.00'))
+            self.assertEqual([p.slug for p in related], ['palm'])
+
+    def test_save_invalidates_entry(self):
+        object_cache.get_product(pk=self.fern.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fern.price = Decimal('99.00')
+            self.fern.save()
+
+        self.assertEqual(object_cache.get_product(pk=self.fern.pk).price, Decimal('99.00'))
+
+    def test_renamed_slug_stops_resolving(self):
+        object_cache.get_product(slug='fern')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fern.slug = 'boston-fern'
+            self.fern.save()
+
+        self.assertIsNone(object_cache.get_product(slug='fern'))
+        self.assertEqual(object_cache.get_product(slug='boston-fern').pk, self.fern.pk)
+
+    def test_stock_only_save_keeps_slug_mapping(self):
+        object_cache.get_product(slug='fern')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fern.quantity = 2
+            self.fern.save(update_fields=['quantity', 'updated_at'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(object_cache.get_product(slug='fern').quantity, 2)
+
+    def test_category_change_refreshes_list(self):
+        object_cache.get_categories()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Outdoor', slug='outdoor')
+
+        self.assertEqual([c.slug for c in object_cache.get_categories()], ['indoor', 'outdoor'])
+
+    def test_stock_reservation_invalidates_entry(self):
+        object_cache.get_product(pk=self.fern.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock([(self.fern.pk, 2)])
+
+        self.assertEqual(object_cache.get_product(pk=self.fern.pk).quantity, 3)
+
+    def test_warm_product_page_makes_no_catalog_queries(self):
+        self.client.get('/store/product/fern/', secure=True)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/store/product/fern/', secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['product'].pk, self.fern.pk)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_inactive_product_is_not_found(self):
+        Product.objects.filter(pk=self.fern.pk).update(is_active=False)
+
+        response = self.client.get('/store/product/fern/', secure=True)
+        self.assertEqual(response.status_code, 404)
+
+
+class WorkerCacheTest(TestCase):
+    """
+    Invalidation as seen by two worker processes, each with its own cache
+    client. Two LocMemCache clients with the same location share entries,
+    like two connections to one Redis server.
+    """
+
+    def setUp(self):
+        self.fern = Product.objects.create(
+            name='Fern', slug='fern', sku='fern', price=Decimal('150.00'), quantity=5, description='fern'
+        )
+
+    def _worker(self, location):
+        worker_cache = LocMemCache(location, {})
+        self.addCleanup(worker_cache.clear)
+        return worker_cache
+
+    def _price_seen_by(self, worker_cache):
+        with mock.patch.object(object_cache, 'cache', worker_cache):
+            return object_cache.get_product(pk=self.fern.pk).price
+
+    def _reprice_on(self, worker_cache, price):
+        with mock.patch.object(object_cache, 'cache', worker_cache):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.fern.price = price
+                self.fern.save()
+
+    def test_per_process_caches_serve_stale_products(self):
+        worker_a, worker_b = self._worker('worker-a'), self._worker('worker-b')
+        self._price_seen_by(worker_b)
+
+        self._reprice_on(worker_a, Decimal('99.00'))
+
+        # Only worker A's cache was invalidated
+        self.assertEqual(self._price_seen_by(worker_a), Decimal('99.00'))
+        self.assertEqual(self._price_seen_by(worker_b), Decimal('150.00'))
+
+    def test_shared_cache_invalidates_every_worker(self):
+        worker_a, worker_b = self._worker('shared'), self._worker('shared')
+        self._price_seen_by(worker_b)
+
+        self._reprice_on(worker_a, Decimal('99.00'))
+
+        self.assertEqual(self._price_seen_by(worker_b), Decimal('99.00'))
+
+    def test_production_settings_use_a_shared_cache(self):
+        backend = production_settings.CACHES['default']['BACKEND']
+        self.assertNotIn(backend, (
+            'django.core.cache.backends.locmem.LocMemCache',
+            'django.core.cache.backends.dummy.DummyCache',
+        ))
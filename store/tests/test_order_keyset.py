@@ -0,0 +1,184 @@
+from datetime import date, datetime, timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.http import Http404
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from store.admin_views import AdminOrderListView
+from store.keyset import InvalidCursor, KeysetPaginator
+from store.models import Order, OrderSearchToken
+from store.order_search import created_range, search_orders
+from store.views import StaffOrderListView
+
+
+class OrderListTestMixin:
+    def _order(self, created_at=None, **kwargs):
+        fields = {
+            'first_name': 'Test',
+            'last_name': 'User',
+            'email': 'buyer@example.com',
+            'address': '123 Test St',
+            'postal_code': '12345',
+            'city': 'Test City',
+            'state': 'Kerala',
+        }
+        fields.update(kwargs)
+        order = Order.objects.create(**fields)
+        if created_at:
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            order.created_at = created_at
+        return order
+
+
+class KeysetPaginatorTest(OrderListTestMixin, TestCase):
+    def setUp(self):
+        base = timezone.now() - timedelta(days=1)
+        # Two orders share each timestamp so the id breaks ties
+        self.orders = [self._order(base + timedelta(minutes=i // 2)) for i in range(7)]
+        self.expected = [o.pk for o in sorted(self.orders, key=lambda o: (o.created_at, o.pk), reverse=True)]
+
+    def test_pages_walk_forward_and_back(self):
+        paginator = KeysetPaginator(Order.objects.all(), 3)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+
+        self.assertEqual([o.pk for page in pages for o in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous())
+
+        back = paginator.page(pages[2].previous_cursor)
+        self.assertEqual([o.pk for o in back], [o.pk for o in pages[1]])
+        # Going back from the second page gives a full first page
+        self.assertEqual([o.pk for o in paginator.page(back.previous_cursor)], self.expected[:3])
+
+    def test_deep_page_is_one_range_query(self):
+        paginator = KeysetPaginator(Order.objects.all(), 3)
+        cursor = paginator.page().next_cursor
+
+        with CaptureQueriesContext(connection) as ctx:
+            list(paginator.page(cursor))
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]['sql']
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_malformed_cursor_is_rejected(self):
+        paginator = KeysetPaginator(Order.objects.all(), 3)
+        for cursor in ('garbage', 'eHx5fHo'):
+            with self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+
+
+class OrderSearchTest(OrderListTestMixin, TestCase):
+    def setUp(self):
+        self.anita = self._order(first_name='Anita', last_name='Menon', email='anita.menon@example.com', phone='+91 98765 43210')
+        self.joseph = self._order(first_name='José', last_name='Kurian', email='jk@plants.in', phone='0484 2345678')
+
+    def _search(self, query):
+        return set(search_orders(Order.objects.all(), query).values_list('pk', flat=True))
+
+    def test_search_matches_token_prefixes(self):
+        self.assertEqual(self._search('ANI'), {self.anita.pk})
+        self.assertEqual(self._search('anita men'), {self.anita.pk})
+        self.assertEqual(self._search('anita.menon@ex'), {self.anita.pk})
+        self.assertEqual(self._search('jose'), {self.joseph.pk})
+        self.assertEqual(self._search('plants.in'), {self.joseph.pk})
+        self.assertEqual(self._search('98765 43210'), {self.anita.pk})
+        self.assertEqual(self._search('+91-98765'), {self.anita.pk})
+        self.assertEqual(self._search(self.joseph.order_number.lower()), {self.joseph.pk})
+        self.assertEqual(self._search(self.anita.order_number.rsplit('-', 1)[1]), {self.anita.pk})
+        self.assertEqual(self._search('anita kurian'), set())
+
+    def test_tokens_follow_saved_changes(self):
+        self.anita.email = 'anita@garden.org'
+        self.anita.save(update_fields=['email', 'updated_at'])
+        self.assertEqual(self._search('garden'), {self.anita.pk})
+        self.assertEqual(self._search('example.com'), set())
+
+        # Unsaved changes are not indexed
+        self.joseph.last_name = 'Thomas'
+        self.joseph.save(update_fields=['notes'])
+        self.assertEqual(self._search('thomas'), set())
+
+        tokens = sorted(OrderSearchToken.objects.values_list('order_id', 'token'))
+        call_command('rebuild_order_search_tokens', stdout=StringIO())
+        self.assertEqual(sorted(OrderSearchToken.objects.values_list('order_id', 'token')), tokens)
+
+
+class OrderListViewTest(OrderListTestMixin, TestCase):
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user('staff', 'staff@example.com', 'pass', is_staff=True)
+
+    def _context(self, view_class, **params):
+        request = RequestFactory().get('/store/staff/orders/', params)
+        request.user = self.staff
+        view = view_class()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        return view.get_context_data()
+
+    def test_date_range_is_sargable(self):
+        day = date(2024, 3, 10)
+        start = timezone.make_aware(datetime(2024, 3, 10))
+        inside = [self._order(start), self._order(start + timedelta(hours=23, minutes=59))]
+        self._order(start - timedelta(seconds=1))
+        self._order(start + timedelta(days=1))
+
+        queryset = Order.objects.filter(created_range(day.isoformat(), day.isoformat()))
+
+        self.assertEqual(set(queryset.values_list('pk', flat=True)), {o.pk for o in inside})
+        self.assertNotIn('cast', str(queryset.query).lower())
+        self.assertEqual(Order.objects.filter(created_range('not-a-date', '')).count(), 4)
+
+    def test_staff_and_admin_lists_page_by_cursor(self):
+        base = timezone.now() - timedelta(days=2)
+        for i in range(22):
+            self._order(base + timedelta(minutes=i), first_name='Fern' if i % 2 else 'Palm')
+
+        context = self._context(StaffOrderListView, q='fern')
+        self.assertEqual(len(context['orders']), 11)
+        self.assertFalse(context['is_paginated'])
+
+        first = self._context(StaffOrderListView)
+        second = self._context(StaffOrderListView, cursor=first['page_obj'].next_cursor)
+        self.assertEqual(len(first['orders']) + len(second['orders']), 22)
+        self.assertTrue(second['page_obj'].has_previous())
+        self.assertFalse(second['page_obj'].has_next())
+
+        admin = self._context(AdminOrderListView, status=Order.Status.PENDING)
+        self.assertEqual(len(admin['orders']), 22)
+
+        with self.assertRaises(Http404):
+            self._context(AdminOrderListView, cursor='garbage')
+
+
+class OrderSearchTokenPatternIndexTest(TestCase):
+    migration = import_module('store.migrations.0011_order_search_token_pattern_index')
+
+    def _schema_editor(self, vendor):
+        schema_editor = mock.Mock(quote_name=connection.ops.quote_name)
+        schema_editor.connection.vendor = vendor
+        return schema_editor
+
+    def test_pattern_index_is_postgresql_only(self):
+        schema_editor = self._schema_editor('postgresql')
+        self.migration.create_pattern_index(apps, schema_editor)
+        schema_editor.execute.assert_called_once_with(
+            'CREATE INDEX IF NOT EXISTS "store_ordersearchtoken_token_like" '
+            'ON "store_ordersearchtoken" ("token" varchar_pattern_ops, "order_id")'
+        )
+
+        for vendor in ('mysql', 'sqlite'):
+            schema_editor = self._schema_editor(vendor)
+            self.migration.create_pattern_index(apps, schema_editor)
+            schema_editor.execute.assert_not_called()
@@ -0,0 +1,164 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from store.models import Order, OrderActivity, OrderItem, OrderStatusUpdate, Product
+from store.order_transitions import OrderTransition
+
+
+class OrderTransitionTest(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create(
+            first_name='Test',
+            last_name='User',
+            email='buyer@example.com',
+            address='123 Test St',
+            postal_code='12345',
+            city='Test City',
+            state='Kerala',
+        )
+        self.order = Order.objects.get(pk=self.order.pk)
+
+    def _queries(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return [q['sql'] for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]
+
+    def test_save_detects_status_change_without_reading_the_order(self):
+        self.order.status = Order.Status.DELIVERED
+        queries = self._queries(self.order.save)
+
+        self.assertFalse(any(q.startswith('SELECT') for q in queries))
+        update = OrderStatusUpdate.objects.get(order=self.order)
+        self.assertEqual(update.note, 'Order status changed from Pending to Delivered')
+        self.order.refresh_from_db()
+        self.assertIsNotNone(self.order.actual_delivery_date)
+
+    def test_unchanged_status_is_not_recorded(self):
+        self.order.notes = 'Leave at the door'
+        self.order.save()
+
+        self.assertFalse(OrderStatusUpdate.objects.exists())
+
+    def test_changes_are_coalesced_into_one_update(self):
+        transition = OrderTransition(self.order, note='Handed to courier').set(
+            status=Order.Status.IN_TRANSIT,
+            tracking_number='TRK123',
+        ).set(tracking_url='https://track.example.com/TRK123')
+
+        queries = self._queries(transition.save)
+
+        self.assertEqual(len([q for q in queries if q.startswith('UPDATE "store_order" ')]), 1)
+        self.assertEqual(len([q for q in queries if q.startswith('INSERT INTO "store_orderstatusupdate"')]), 1)
+        self.assertEqual(len([q for q in queries if q.startswith('INSERT INTO "store_orderactivity"')]), 1)
+        self.assertFalse(any(q.startswith('SELECT') for q in queries))
+
+        self.order.refresh_from_db()
+        self.assertEqual(
+            (self.order.status, self.order.tracking_number),
+            (Order.Status.IN_TRANSIT, 'TRK123')
+        )
+        activity = OrderActivity.objects.get(order=self.order)
+        self.assertEqual(activity.activity_type, 'status_change')
+        self.assertEqual(
+            activity.details,
+            'Status changed to In Transit; Tracking number updated to TRK123; Tracking URL updated'
+        )
+        self.assertEqual(OrderStatusUpdate.objects.get(order=self.order).note, 'Handed to courier')
+
+    def test_assigning_current_values_writes_nothing(self):
+        transition = OrderTransition(self.order).set(status=self.order.status, email=self.order.email)
+
+        self.assertEqual(self._queries(transition.save), [])
+
+    def test_touch_uses_tracker_for_preassigned_fields(self):
+        self.order.status = Order.Status.CONFIRMED
+        self.order.notes = 'Gift wrap'
+
+        OrderTransition(self.order).touch('status', 'notes').save()
+
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.notes), (Order.Status.CONFIRMED, 'Gift wrap'))
+        self.assertIsNotNone(self.order.estimated_delivery_date)
+        self.assertEqual(OrderStatusUpdate.objects.filter(order=self.order).count(), 1)
+
+
+# Sessions are cache backed in the test settings
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class CheckoutPostTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('alice', 'alice@example.com', 'pass')
+        self.product = Product.objects.create(
+            name='Fern', slug='fern', sku='fern', price=Decimal('100.00'), quantity=5, description='fern'
+        )
+        self.order = Order.objects.create(user=self.user, total_amount=Decimal('100.00'))
+        OrderItem.objects.create(order=self.order, product=self.product, price=self.product.price, quantity=2)
+        self.client.force_login(self.user)
+
+    def _post(self, client, payment_method='razorpay'):
+        with mock.patch('store.views.get_gateway_client', return_value=client):
+            return self.client.post(reverse('store:checkout'), {
+                'first_name': 'Alice', 'last_name': 'Smith', 'email': 'alice@example.com',
+                'address': '1 Fern Lane', 'district': 'Kochi', 'postal_code': '682001',
+                'phone': '9876543210', 'payment_method': payment_method,
+            }, secure=True)
+
+    def _stock(self):
+        self.product.refresh_from_db()
+        return self.product.quantity
+
+    def test_razorpay_checkout_saves_address_and_payment_method(self):
+        client = mock.Mock()
+        client.order.create.return_value = {'id': 'order_rzp1', 'amount': 10000, 'currency': 'INR'}
+
+        response = self._post(client)
+
+        self.assertRedirects(
+            response, reverse('store:checkout_success', kwargs={'order_number': self.order.order_number}),
+            fetch_redirect_response=False
+        )
+        self.order.refresh_from_db()
+        self.assertEqual(
+            (self.order.address, self.order.city, self.order.payment_method, self.order.razorpay_order_id),
+            ('1 Fern Lane', 'Kochi', 'razorpay', 'order_rzp1')
+        )
+        self.assertEqual(self._stock(), 3)
+
+        # Retrying payment reuses the reservation
+        self._post(client)
+        self.assertEqual(self._stock(), 3)
+
+    def test_failed_payment_setup_releases_stock(self):
+        client = mock.Mock()
+        client.order.create.side_effect = Exception('gateway down')
+
+        self._post(client)
+
+        self.assertEqual(self._stock(), 5)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.address, '1 Fern Lane')
+
+    def test_cash_on_delivery_reserves_stock_once(self):
+        self._post(mock.Mock(), payment_method='cash_on_delivery')
+
+        self.assertEqual(self._stock(), 3)
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.payment_status)
+
+    def test_cash_on_delivery_writes_order_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._post(mock.Mock(), payment_method='cash_on_delivery')
+
+        updates = [q['sql'] for q in ctx.captured_queries
+                   if q['sql'].startswith('UPDATE "store_order" ')]
+        self.assertEqual(len(updates), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.address, '1 Fern Lane')
+        self.assertEqual(self.order.status, 'pending')
@@ -0,0 +1,60 @@
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from angels_plants.performance import debug_event
+from store import facets
+from store.models import Category, Product
+
+
+class ProductListViewTest(TestCase):
+    def setUp(self):
+        facets._index = None
+        self.addCleanup(setattr, facets, '_index', None)
+
+        self.category = Category.objects.create(name='Indoor', slug='indoor')
+        for i in range(15):
+            Product.objects.create(
+                name=f'Plant {i}',
+                slug=f'plant-{i}',
+                sku=f'PLT-{i}',
+                price=Decimal('300.00'),
+                quantity=2,
+                description='Leafy',
+                category=self.category,
+                difficulty_level='easy' if i % 2 else 'moderate',
+            )
+        facets.get_facet_index()
+
+    def _product_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        queries = [q['sql'] for q in ctx.captured_queries if 'FROM "store_product"' in q['sql']]
+        return response, queries
+
+    def test_product_set_is_evaluated_once(self):
+        response, queries = self._product_queries('/store/category/indoor/?difficulty=easy')
+
+        # One COUNT for the paginator and one fetch of the page
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(response.context['paginator'].count, 7)
+        self.assertEqual(len(response.context['products']), 7)
+        self.assertEqual(response.context['facet_counts']['difficulty'], {'easy': 7, 'moderate': 8})
+
+    def test_instrumentation_is_off_by_default(self):
+        events = []
+
+        def listener(sender, event, data, **kwargs):
+            events.append(event)
+
+        debug_event.connect(listener)
+        self.addCleanup(debug_event.disconnect, listener)
+
+        self.client.get('/store/shop/', secure=True)
+        self.assertEqual(events, [])
+
+        with override_settings(DEBUG_INSTRUMENTATION=True):
+            self.client.get('/store/shop/', secure=True)
+        self.assertEqual(events, ['queryset', 'page'])
@@ -0,0 +1,79 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from store.models import Product, ProductRating, Review
+
+
+class ProductRatingTotalsTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create_user('alice', 'alice@example.com', 'pass')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'pass')
+        self.fern = self._product('fern')
+        self.palm = self._product('palm')
+
+    def _product(self, slug):
+        return Product.objects.create(
+            name=slug.title(), slug=slug, sku=slug, price=Decimal('100.00'), quantity=50, description=slug
+        )
+
+    def _totals(self, product):
+        product.refresh_from_db(fields=['rating_sum', 'rating_count'])
+        return product.rating_sum, product.rating_count, product.average_rating
+
+    def test_deltas(self):
+        rating = ProductRating.objects.create(user=self.alice, product=self.fern, rating=5, is_approved=True)
+        ProductRating.objects.create(user=self.bob, product=self.fern, rating=2, is_approved=True)
+        self.assertEqual(self._totals(self.fern), (7, 2, Decimal('3.50')))
+
+        # Edit: one UPDATE on the product, no re-aggregation
+        rating.rating = 4
+        with self.assertNumQueries(2):
+            rating.save()
+        self.assertEqual(self._totals(self.fern), (6, 2, Decimal('3.00')))
+
+        rating.is_approved = False
+        rating.save()
+        self.assertEqual(self._totals(self.fern), (2, 1, Decimal('2.00')))
+
+        rating.is_approved = True
+        rating.product = self.palm
+        rating.save()
+        self.assertEqual(self._totals(self.fern), (2, 1, Decimal('2.00')))
+        self.assertEqual(self._totals(self.palm), (4, 1, Decimal('4.00')))
+
+        rating.delete()
+        self.assertEqual(self._totals(self.palm), (0, 0, None))
+
+    def test_review_save_does_not_reaggregate(self):
+        ProductRating.objects.create(user=self.alice, product=self.fern, rating=5, is_approved=True)
+
+        # Totals come from ProductRating, so a review is a single INSERT
+        with self.assertNumQueries(1):
+            review = Review.objects.create(
+                product=self.fern, user=self.bob, rating=1, title='Meh', comment='Drooped', is_approved=True
+            )
+        with self.assertNumQueries(1):
+            review.delete()
+        self.assertEqual(self._totals(self.fern), (5, 1, Decimal('5.00')))
+
+    def test_unapproved_ratings_are_not_counted(self):
+        ProductRating.objects.create(user=self.alice, product=self.fern, rating=1)
+        self.assertEqual(self._totals(self.fern), (0, 0, None))
+
+    def test_rebuild_command_repairs_totals(self):
+        ProductRating.objects.create(user=self.alice, product=self.fern, rating=5, is_approved=True)
+        # Bulk updates bypass the signals
+        ProductRating.objects.update(rating=3)
+        Product.objects.filter(pk=self.palm.pk).update(rating_sum=9, rating_count=2)
+
+        out = StringIO()
+        call_command('rebuild_product_ratings', stdout=out)
+
+        self.assertIn('2 products changed', out.getvalue())
+        self.assertEqual(self._totals(self.fern), (3, 1, Decimal('3.00')))
+        self.assertEqual(self._totals(self.palm), (0, 0, None))
@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from store import catalog_cache, recommendations
+from store.models import Category, Order, OrderItem, Product, ProductRecommendation
+from store.recommendations import compute_co_purchase_neighbours, get_recommendations
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class RecommendationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Indoor', slug='indoor')
+        self.fern, self.pot, self.soil, self.palm, self.cactus = [
+            self._product(slug) for slug in ('fern', 'pot', 'soil', 'palm', 'cactus')
+        ]
+        self._order(self.fern, self.pot, self.soil)
+        self._order(self.fern, self.pot)
+        self._order(self.fern, self.soil)
+        self._order(self.palm, self.cactus)
+
+    def _product(self, slug):
+        return Product.objects.create(
+            name=slug.title(), slug=slug, sku=slug, price=Decimal('100.00'),
+            quantity=50, description=slug, category=self.category
+        )
+
+    def _order(self, *products, **fields):
+        order = Order.objects.create(
+            first_name='Test',
+            last_name='User',
+            email='buyer@example.com',
+            address='123 Test St',
+            postal_code='12345',
+            city='Test City',
+            state='Kerala',
+            **fields
+        )
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, price=product.price, quantity=1)
+        return order
+
+    def test_cosine_scores(self):
+        neighbours = compute_co_purchase_neighbours([{1, 2, 3}, {1, 2}, {1, 3}, {4, 5}], top_k=1)
+        # 1 and 2 share 2 of 3 and 2 orders: 2 / sqrt(3 * 2); ties go to the lower ID
+        self.assertEqual(neighbours[1][0][0], 2)
+        self.assertAlmostEqual(neighbours[1][0][1], 2 / (6 ** 0.5))
+        self.assertEqual(neighbours[4], [(5, 1.0)])
+
+    def test_build_command_and_cached_lookup(self):
+        self._order(self.fern, self.palm, status=Order.Status.CANCELLED)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('build_recommendations', '--top-k', '2', stdout=out)
+        self.assertIn('Built 8 recommendations for 5 products', out.getvalue())
+        self.assertFalse(ProductRecommendation.objects.filter(product=self.fern, recommended=self.palm).exists())
+
+        self.assertEqual([p.slug for p in get_recommendations([self.fern], limit=2)], ['pot', 'soil'])
+        with self.assertNumQueries(0):
+            self.assertEqual([p.slug for p in get_recommendations([self.fern], limit=2)], ['pot', 'soil'])
+
+        # A cart holding pot and soil gets fern, then same-category products
+        self.assertEqual([p.slug for p in get_recommendations([self.pot, self.soil], limit=3)], ['fern', 'palm', 'cactus'])
+
+    def test_inactive_products_are_skipped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('build_recommendations', stdout=StringIO())
+        self.pot.is_active = False
+        self.pot.save()
+
+        self.assertNotIn(self.pot, get_recommendations([self.fern], limit=4))
+
+    @contextmanager
+    def _using(self, client):
+        # The version key is read and bumped through catalog_cache
+        with mock.patch.object(recommendations, 'cache', client), mock.patch.object(catalog_cache, 'cache', client):
+            yield
+
+    def test_rebuild_reaches_workers_through_shared_cache(self):
+        # The command and a web worker have their own clients of one cache
+        worker_cache, command_cache = LocMemCache('recommendations', {}), LocMemCache('recommendations', {})
+        self.addCleanup(worker_cache.clear)
+
+        with self._using(worker_cache):
+            self.assertEqual(recommendations.get_neighbours([self.fern.pk]), {self.fern.pk: []})
+
+        with self._using(command_cache):
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('build_recommendations', stdout=StringIO())
+
+        with self._using(worker_cache):
+            neighbours = recommendations.get_neighbours([self.fern.pk])
+        self.assertEqual([pk for pk, _ in neighbours[self.fern.pk]], [self.pot.pk, self.soil.pk])
@@ -0,0 +1,101 @@
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from store.models import DailySales, Order, OrderItem, Product, ProductSales, StatusSales
+from store.sales_rollups import get_status_distribution
+from store.views import StaffDashboardView
+
+
+class SalesRollupTest(TestCase):
+    def setUp(self):
+        self.fern = self._product('fern')
+        self.palm = self._product('palm')
+
+    def _product(self, slug):
+        return Product.objects.create(
+            name=slug.title(),
+            slug=slug,
+            sku=slug,
+            price=Decimal('100.00'),
+            quantity=50,
+            description=slug,
+        )
+
+    def _order(self, total, **kwargs):
+        return Order.objects.create(
+            first_name='Test',
+            last_name='User',
+            email='buyer@example.com',
+            address='123 Test St',
+            postal_code='12345',
+            city='Test City',
+            state='Kerala',
+            total_amount=Decimal(total),
+            **kwargs
+        )
+
+    def _snapshot(self):
+        return (
+            sorted(DailySales.objects.filter(order_count__gt=0).values_list('day', 'status', 'order_count', 'total_amount')),
+            sorted(StatusSales.objects.filter(order_count__gt=0).values_list('status', 'order_count', 'total_amount')),
+            sorted(ProductSales.objects.filter(order_count__gt=0).values_list('product_id', 'order_count', 'quantity', 'revenue')),
+        )
+
+    def test_rollups_follow_order_lifecycle(self):
+        first = self._order('300.00')
+        second = self._order('150.00')
+        OrderItem.objects.create(order=first, product=self.fern, price=Decimal('100.00'), quantity=3)
+        item = OrderItem.objects.create(order=second, product=self.palm, price=Decimal('150.00'), quantity=1)
+
+        first.status = Order.Status.DELIVERED
+        first.save()
+        second.total_amount = Decimal('180.00')
+        second.save(update_fields=['total_amount', 'updated_at'])
+        item.quantity = 2
+        item.save()
+
+        today = timezone.localdate()
+        self.assertEqual(StatusSales.objects.get(status='delivered').total_amount, Decimal('300.00'))
+        self.assertEqual(
+            DailySales.objects.get(day=today, status='pending').total_amount, Decimal('180.00')
+        )
+        self.assertEqual(
+            ProductSales.objects.filter(product=self.palm).values_list('quantity', 'revenue').get(),
+            (2, Decimal('300.00'))
+        )
+
+        second.delete()
+        self.assertFalse(StatusSales.objects.filter(status='pending', order_count__gt=0).exists())
+
+        incremental = self._snapshot()
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_unsaved_status_change_is_ignored(self):
+        order = self._order('100.00')
+        order.status = Order.Status.CANCELLED
+        order.save(update_fields=['notes'])
+
+        self.assertEqual(
+            [(item['status'], item['count']) for item in get_status_distribution()],
+            [('pending', 1)]
+        )
+
+    def test_staff_dashboard_reads_rollups(self):
+        order = self._order('500.00', status=Order.Status.DELIVERED)
+        OrderItem.objects.create(order=order, product=self.fern, price=Decimal('100.00'), quantity=5)
+        request = RequestFactory().get('/store/staff/dashboard/')
+        request.user = get_user_model().objects.create_user('staff', 'staff@example.com', 'pass', is_staff=True)
+        view = StaffDashboardView()
+        view.setup(request)
+
+        context = view.get_context_data()
+
+        self.assertEqual(context['total_sales'], Decimal('500.00'))
+        self.assertEqual(context['order_count'], 1)
+        self.assertEqual([p.order_count for p in context['popular_products']], [1])
+        self.assertEqual(context['sales_data']['datasets'][0]['data'][6], 500.0)
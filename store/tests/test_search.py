@@ -0,0 +1,103 @@
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.test import RequestFactory, TestCase, override_settings
+
+from store import search
+from store.models import Category, Product, ProductTag
+from store.views import ProductSearchView
+
+
+class ProductSearchIndexTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+        tmp.close()
+        self.addCleanup(os.remove, tmp.name)
+        override = override_settings(SEARCH_INDEX_PATH=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.category = Category.objects.create(name='Succulents', slug='succulents')
+        self.snake = self._product('Snake Plant', 'snake-plant', 'Tolerates low light')
+        self.aloe = self._product('Aloe Vera', 'aloe-vera', 'Soothing gel; sits nicely next to a snake plant')
+        self.fern = self._product('Boston Fern', 'boston-fern', 'Loves humidity', category=None)
+
+    def _product(self, name, slug, description, category='default'):
+        return Product.objects.create(
+            name=name,
+            slug=slug,
+            sku=slug,
+            price=Decimal('250.00'),
+            quantity=3,
+            description=description,
+            category=self.category if category == 'default' else category,
+        )
+
+    def _rebuild(self):
+        products = Product.objects.select_related('category').prefetch_related('tags')
+        return search.rebuild_index(products)
+
+    def test_prefix_match_ranks_name_hits_first(self):
+        self.assertEqual(self._rebuild(), 3)
+        self.assertEqual(search.search_product_ids('snak pla'), [self.snake.id, self.aloe.id])
+
+    def test_category_and_tag_terms_are_searchable(self):
+        tag = ProductTag.objects.create(name='Pet Friendly', slug='pet-friendly')
+        self.fern.tags.add(tag)
+        self._rebuild()
+        self.assertCountEqual(search.search_product_ids('succulent'), [self.snake.id, self.aloe.id])
+        self.assertEqual(search.search_product_ids('pet'), [self.fern.id])
+
+    def test_signals_keep_index_current(self):
+        self._rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fern.name = 'Bird Nest Fern'
+            self.fern.save()
+        self.assertEqual(search.search_product_ids('bird'), [self.fern.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fern.is_active = False
+            self.fern.save()
+        self.assertEqual(search.search_product_ids('fern'), [])
+
+    def test_stock_only_save_skips_reindex(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.fern.quantity = 0
+            self.fern.save(update_fields=['quantity', 'updated_at'])
+        with mock.patch('store.signals.reindex_products') as reindex:
+            for callback in callbacks:
+                callback()
+        reindex.assert_not_called()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.fern.description = 'Loves humidity and bright shade'
+            self.fern.save(update_fields=['description', 'updated_at'])
+        with mock.patch('store.signals.reindex_products') as reindex:
+            for callback in callbacks:
+                callback()
+        reindex.assert_called_once_with([self.fern.id])
+
+    def test_blank_query_returns_nothing(self):
+        self._rebuild()
+        self.assertEqual(search.search_product_ids('  !! '), [])
+
+    def test_category_rename_and_delete_reindex_products(self):
+        self._rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Cacti'
+            self.category.save()
+        self.assertCountEqual(search.search_product_ids('cacti'), [self.snake.id, self.aloe.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertEqual(search.search_product_ids('cacti'), [])
+
+    def test_empty_index_falls_back_to_database(self):
+        with self.assertRaises(search.SearchIndexError):
+            search.search_product_ids('snake')
+
+        view = ProductSearchView()
+        view.setup(RequestFactory().get('/store/search/', {'q': 'snake'}))
+        self.assertCountEqual(view.get_queryset(), [self.snake, self.aloe])
@@ -0,0 +1,74 @@
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from store.models import NumberSequence, Order
+from store.sequences import ORDER_NUMBER_SEQUENCE, SequenceAllocator, order_numbers
+
+
+@override_settings(NUMBER_SEQUENCE_BLOCK_SIZE=5)
+class SequenceAllocatorTest(TestCase):
+    def setUp(self):
+        order_numbers.reset()
+        self.addCleanup(order_numbers.reset)
+
+    def _order(self):
+        return Order.objects.create(
+            first_name='Test',
+            last_name='User',
+            email='buyer@example.com',
+            address='123 Test St',
+            postal_code='12345',
+            city='Test City',
+            state='Kerala',
+        )
+
+    def _stored_next(self, name=ORDER_NUMBER_SEQUENCE):
+        return NumberSequence.objects.get(name=name).next_value
+
+    def test_order_numbers_come_from_blocks(self):
+        start = self._stored_next()
+        with CaptureQueriesContext(connection) as ctx:
+            numbers = [self._order().order_number for _ in range(7)]
+
+        suffixes = [int(number.rsplit('-', 1)[1]) for number in numbers]
+        self.assertEqual(suffixes, list(range(start, start + 7)))
+        self.assertTrue(all(number.startswith('ORD-') for number in numbers))
+        # Two blocks of five were reserved, and orders were never counted
+        self.assertEqual(self._stored_next(), start + 10)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+    def test_workers_never_share_numbers(self):
+        first = SequenceAllocator('invoice', block_size=3)
+        second = SequenceAllocator('invoice', block_size=3)
+
+        values = []
+        for _ in range(4):
+            values.append(first.next_value())
+            values.append(second.next_value())
+
+        self.assertEqual(len(set(values)), len(values))
+        self.assertEqual(sorted(values[:2]), [1, 4])
+
+    def test_block_from_rolled_back_transaction_is_discarded(self):
+        NumberSequence.objects.create(name='invoice')
+        allocator = SequenceAllocator('invoice', block_size=3)
+        try:
+            with transaction.atomic():
+                self.assertEqual(allocator.next_value(), 1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        # The counter update was rolled back, so the block is reserved again
+        self.assertEqual(self._stored_next('invoice'), 1)
+        self.assertEqual(allocator.next_value(), 1)
+        self.assertEqual(allocator.next_value(), 2)
+
+    def test_new_sequence_continues_after_existing_orders(self):
+        self._order()
+        Order.objects.update(order_number='ORD-20240101-41')
+        NumberSequence.objects.all().delete()
+        order_numbers.reset()
+
+        self.assertTrue(self._order().order_number.endswith('-42'))
@@ -0,0 +1,72 @@
+from unittest import mock
+
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from store.counters import BufferedCounter, blog_post_views
+from store.models import BlogPost
+from store.views import BlogPostDetailView
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600, VIEW_COUNT_MAX_PENDING=1000)
+class BufferedCounterTest(TestCase):
+    def setUp(self):
+        self.post = BlogPost.objects.create(title='Repotting ferns', content='...', status=BlogPost.PUBLISHED)
+        self.other = BlogPost.objects.create(title='Watering palms', content='...', status=BlogPost.PUBLISHED)
+        self.counter = BufferedCounter(BlogPost, 'view_count')
+        self.addCleanup(blog_post_views.flush)
+
+    def _counts(self):
+        return dict(BlogPost.objects.values_list('pk', 'view_count'))
+
+    def test_increments_are_buffered_and_coalesced(self):
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.counter.increment(self.post.pk)
+            self.counter.increment(self.other.pk, 3)
+        self.assertEqual(self.counter.pending(self.post.pk), 3)
+
+        # Both rows were incremented by 3, so one UPDATE covers them
+        with self.assertNumQueries(1):
+            self.assertEqual(self.counter.flush(), 2)
+        self.assertEqual(self._counts(), {self.post.pk: 3, self.other.pk: 3})
+        self.assertEqual(self.counter.pending(self.post.pk), 0)
+
+    @override_settings(VIEW_COUNT_MAX_PENDING=2)
+    def test_flushes_when_buffer_is_full(self):
+        self.counter.increment(self.post.pk)
+        self.assertEqual(self._counts()[self.post.pk], 0)
+        self.counter.increment(self.other.pk)
+        self.assertEqual(self._counts(), {self.post.pk: 1, self.other.pk: 1})
+
+    def test_idle_buffer_is_flushed_by_timer(self):
+        with mock.patch('store.counters.threading.Timer') as timer:
+            self.counter.increment(self.post.pk)
+            self.counter.increment(self.post.pk)
+
+        # One timer per batch of buffered increments
+        timer.assert_called_once_with(3600, self.counter._flush_on_timer)
+        timer.return_value.start.assert_called_once_with()
+        self.assertEqual(self._counts()[self.post.pk], 0)
+
+        # What the timer thread runs once the interval has passed
+        with mock.patch('store.counters.connections.close_all') as close_all:
+            self.counter._flush_on_timer()
+        close_all.assert_called_once_with()
+        self.assertEqual(self._counts()[self.post.pk], 2)
+        timer.return_value.cancel.assert_called_once_with()
+
+    def test_detail_view_does_not_write(self):
+        publish_date = timezone.localtime(self.post.publish_date)
+        request = RequestFactory().get('/blog/')
+        view = BlogPostDetailView()
+        view.setup(request, year=publish_date.year, month=publish_date.month, day=publish_date.day, slug=self.post.slug)
+
+        with self.assertNumQueries(3):
+            post = view.get_object()
+        self.assertEqual(post.view_count, 1)
+        self.assertEqual(blog_post_views.pending(self.post.pk), 1)
+        self.assertEqual(self._counts()[self.post.pk], 0)
+
+        blog_post_views.flush()
+        self.assertEqual(self._counts()[self.post.pk], 1)
@@ -0,0 +1,132 @@
+import json
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import RequestFactory, TestCase, override_settings
+
+from store.models import Cart, CartItem, Product, Profile, Wishlist
+from store.views import api_bulk_wishlist
+from store.wishlist import (
+    add_products, get_wishlist_count, move_products_to_cart, remove_products, toggle_wishlist
+)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class WishlistCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('alice', 'alice@example.com', 'pass')
+        self.fern, self.palm, self.cactus = [self._product(slug) for slug in ('fern', 'palm', 'cactus')]
+
+    def _product(self, slug, **fields):
+        fields.setdefault('quantity', 50)
+        return Product.objects.create(
+            name=slug.title(), slug=slug, sku=slug, price=Decimal('100.00'), description=slug, **fields
+        )
+
+    def _stored_count(self):
+        return Profile.objects.get(user=self.user).wishlist_count
+
+    def test_toggle_keeps_cached_count(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(toggle_wishlist(self.user, self.fern))
+        self.assertEqual(get_wishlist_count(self.user), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_wishlist_count(self.user), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(toggle_wishlist(self.user, self.fern))
+        self.assertEqual(get_wishlist_count(self.user), 0)
+        self.assertFalse(Wishlist.objects.exists())
+
+    def test_bulk_add_and_remove(self):
+        Wishlist.add_to_wishlist(self.user, self.fern)
+        self.palm.is_active = False
+        self.palm.save()
+
+        # Savepoint, SELECT, INSERT in its own savepoint, UPDATE of the count, release
+        with self.assertNumQueries(7):
+            added = add_products(self.user, [self.fern.pk, self.palm.pk, self.cactus.pk])
+        self.assertEqual(added, [self.cactus.pk])
+        self.assertEqual(self._stored_count(), 2)
+
+        self.assertEqual(remove_products(self.user, [self.fern.pk, self.cactus.pk, self.palm.pk]), 2)
+        self.assertEqual(self._stored_count(), 0)
+
+    def test_bulk_add_skips_rows_inserted_concurrently(self):
+        # Another request inserted the fern between the lookup and the insert
+        create = Wishlist.objects.create
+
+        def racing_create(**fields):
+            if fields['product'] == self.fern:
+                raise IntegrityError('UNIQUE constraint failed')
+            return create(**fields)
+
+        with mock.patch.object(Wishlist.objects, 'create', side_effect=racing_create):
+            added = add_products(self.user, [self.fern.pk, self.palm.pk])
+
+        self.assertEqual(added, [self.palm.pk])
+        self.assertEqual(self._stored_count(), 1)
+
+    def test_move_to_cart(self):
+        cart = Cart.objects.get(user=self.user, status='active')
+        CartItem.objects.create(cart=cart, product=self.fern, quantity=1)
+        sold_out = self._product('sold-out', quantity=0)
+        add_products(self.user, [self.fern.pk, self.palm.pk, sold_out.pk])
+        Wishlist.objects.filter(product=self.fern).update(quantity=2)
+
+        moved = move_products_to_cart(self.user, [self.fern.pk, self.palm.pk, sold_out.pk], cart)
+
+        self.assertEqual(moved, [self.fern.pk, self.palm.pk])
+        self.assertEqual(
+            dict(cart.items.values_list('product__slug', 'quantity')), {'fern': 3, 'palm': 1}
+        )
+        cart.refresh_from_db()
+        self.assertEqual((cart.total, cart.total_quantity), (Decimal('400.00'), 4))
+        self.assertEqual(list(Wishlist.objects.values_list('product', flat=True)), [sold_out.pk])
+        self.assertEqual(self._stored_count(), 1)
+
+    def test_bulk_api(self):
+        request = RequestFactory().post(
+            '/api/wishlist/bulk/',
+            data=json.dumps({'action': 'add', 'product_ids': [self.fern.pk, self.palm.pk]}),
+            content_type='application/json'
+        )
+        request.user = self.user
+        with self.captureOnCommitCallbacks(execute=True):
+            response = api_bulk_wishlist(request)
+
+        data = json.loads(response.content)
+        self.assertEqual(data['added'], [self.fern.pk, self.palm.pk])
+        self.assertEqual(data['wishlist_count'], 2)
+
+    def test_deleting_product_adjusts_counts(self):
+        bob = get_user_model().objects.create_user('bob', 'bob@example.com', 'pass')
+        add_products(self.user, [self.fern.pk, self.palm.pk])
+        add_products(bob, [self.fern.pk])
+        self.assertEqual(get_wishlist_count(bob), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fern.delete()
+
+        self.assertEqual(self._stored_count(), 1)
+        self.assertEqual(get_wishlist_count(bob), 0)
+        self.assertEqual(Wishlist.objects.count(), 1)
+
+    def test_rebuild_command_repairs_counts(self):
+        add_products(self.user, [self.fern.pk, self.palm.pk])
+        # Queryset deletes bypass the counter
+        Wishlist.objects.filter(product=self.fern).delete()
+
+        out = StringIO()
+        call_command('rebuild_wishlist_counts', stdout=out)
+
+        self.assertIn('1 profiles changed', out.getvalue())
+        self.assertEqual(self._stored_count(), 1)
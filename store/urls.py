@@ -129,6 +129,7 @@ urlpatterns = [
     
     # API Endpoints
     path('api/wishlist/toggle/<int:product_id>/', views.api_toggle_wishlist, name='api_toggle_wishlist'),
+    path('api/wishlist/bulk/', views.api_bulk_wishlist, name='api_bulk_wishlist'),
     path('api/cart/update/', views.api_update_cart, name='api_update_cart'),
     path('api/product/rate/', views.api_rate_product, name='api_rate_product'),
     path('api/cart/', include(api_urls)),
@@ -1,8 +1,9 @@
 from decimal import Decimal
+from datetime import timedelta
+import json
 import logging
 import time
 import traceback
-import razorpay
 from django.db import transaction
 from django.db import transaction
 from django.core.exceptions import ValidationError
@@ -12,7 +13,10 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.forms import UserCreationForm
-from .email_utils import send_order_confirmation_email
+from .email_utils import queue_order_confirmation_email
+from .counters import blog_post_views
+from .invoices import get_invoice
+from payment.gateway import get_gateway_client
 
 logger = logging.getLogger(__name__)
 from django.views.generic import (
@@ -21,20 +25,15 @@ from django.views.generic import (
 )
 from django.template import RequestContext
 from django.template.loader import get_template
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from django.db.models.functions import Lower
 from .filters import ProductFilter
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.urls import reverse_lazy, reverse
-from django.db.models import Q, Sum, F, Count, Max, Min, Avg, Case, When, Value, IntegerField
+from django.db.models import Q, F, Max, Min, Avg, Case, When, Value, IntegerField, Prefetch
 from django.db.models.functions import Coalesce
-from django.http import JsonResponse, HttpResponseRedirect, HttpResponse, Http404, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponseRedirect, Http404, HttpResponseBadRequest, FileResponse
+from django.utils.cache import get_conditional_response
 from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -45,6 +44,23 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank, TrigramSimilarity
 
 from .filters import ProductFilter
+from .blog_cache import get_sidebar_context
+from .catalog_cache import get_home_rails
+from .facets import get_facet_index
+from .cart_utils import get_cart_snapshot, invalidate_cart_snapshot
+from .cart_reconcile import REMOVED_OUT_OF_STOCK, reconcile_cart
+from .inventory import release_stock, reserve_stock
+from .order_transitions import OrderTransition
+from .order_search import created_range, search_orders
+from .keyset import KeysetPaginationMixin
+from .sales_rollups import get_daily_totals, get_period_summary
+from .object_cache import get_categories, get_product, get_product_images, get_products
+from .recommendations import get_recommendations
+from .wishlist import (
+    add_products, get_wishlist_count, move_products_to_cart, remove_products, toggle_wishlist
+)
+from angels_plants.performance import instrument
+from .search import SearchIndexError, search_product_ids
 from .forms import (
     ContactForm, ProductForm, ProductImageForm, ProductTagForm, 
     CheckoutForm, ReviewForm, AddressForm,
@@ -180,47 +196,36 @@ def update_order_status(request, order_number):
     })
 
 
-class StaffOrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class StaffOrderListView(LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ListView):
     model = Order
     template_name = 'store/staff/order_list.html'
     context_object_name = 'orders'
     paginate_by = 20
     
     def get_queryset(self):
-        """Return the list of orders with related data."""
-        queryset = Order.objects.all().select_related('user', 'shipping_address', 'billing_address')
+        """Return the list of orders with related data (paged by cursor, newest first)."""
+        queryset = Order.objects.select_related('user')
         
         # Filter by status if provided
         status = self.request.GET.get('status')
-        if status and status in dict(Order.STATUS_CHOICES):
+        if status and status in dict(Order.Status.choices):
             queryset = queryset.filter(status=status)
         
-        # Search by order number, customer name, or email
+        # Search by order number, customer name, email or phone
         search_query = self.request.GET.get('q')
         if search_query:
-            queryset = queryset.filter(
-                Q(order_number__icontains=search_query) |
-                Q(user__first_name__icontains=search_query) |
-                Q(user__last_name__icontains=search_query) |
-                Q(user__email__icontains=search_query)
-            )
+            queryset = search_orders(queryset, search_query)
         
         # Date range filter
-        date_from = self.request.GET.get('date_from')
-        date_to = self.request.GET.get('date_to')
-        
-        if date_from:
-            queryset = queryset.filter(created_at__date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(created_at__date__lte=date_to)
-        
-        # Order by most recent first
-        return queryset.order_by('-created_at')
+        return queryset.filter(created_range(
+            self.request.GET.get('date_from'),
+            self.request.GET.get('date_to')
+        ))
     
     def get_context_data(self, **kwargs):
         """Add additional context data."""
         context = super().get_context_data(**kwargs)
-        context['status_choices'] = Order.STATUS_CHOICES
+        context['status_choices'] = Order.Status.choices
         context['current_status'] = self.request.GET.get('status', '')
         context['search_query'] = self.request.GET.get('q', '')
         context['date_from'] = self.request.GET.get('date_from', '')
@@ -233,45 +238,6 @@ class StaffOrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     def handle_no_permission(self):
         messages.error(self.request, "You don't have permission to access this page.")
         return redirect('store:home')
-    
-    def get_queryset(self):
-        queryset = Order.objects.select_related('user').order_by('-created')
-        
-        # Filter by status if provided
-        status = self.request.GET.get('status')
-        if status and status in dict(Order.Status.choices):
-            queryset = queryset.filter(status=status)
-        
-        # Search by order number, email, or user
-        search_query = self.request.GET.get('q')
-        if search_query:
-            queryset = queryset.filter(
-                Q(order_number__icontains=search_query) |
-                Q(email__icontains=search_query) |
-                Q(user__email__icontains=search_query) |
-                Q(user__first_name__icontains=search_query) |
-                Q(user__last_name__icontains=search_query)
-            )
-        
-        # Date range filter
-        date_from = self.request.GET.get('date_from')
-        date_to = self.request.GET.get('date_to')
-        
-        if date_from:
-            queryset = queryset.filter(created__date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(created__date__lte=date_to)
-            
-        return queryset
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['status_choices'] = Order.Status.choices
-        context['current_status'] = self.request.GET.get('status', '')
-        context['search_query'] = self.request.GET.get('q', '')
-        context['date_from'] = self.request.GET.get('date_from', '')
-        context['date_to'] = self.request.GET.get('date_to', '')
-        return context
 
 
 @require_http_methods(["POST"])
@@ -298,35 +264,25 @@ def update_order_status(request, order_number):
             status=400
         )
     
-    # Update order fields
-    order.status = new_status
-    
-    # Update tracking information if provided
+    # Apply status and tracking changes in one UPDATE with their history
+    changes = {'status': new_status}
     if tracking_number:
-        order.tracking_number = tracking_number
+        changes['tracking_number'] = tracking_number
     if tracking_url:
-        order.tracking_url = tracking_url
-    
-    # Save the order
-    order.save(update_fields=['status', 'tracking_number', 'tracking_url', 'updated_at'])
-    
-    # Create activity log
-    activity_details = []
-    if order.status != order.tracker.previous('status'):
-        activity_details.append(f"Status changed to {order.get_status_display()}")
-    if tracking_number and order.tracking_number != order.tracker.previous('tracking_number'):
-        activity_details.append(f"Tracking number updated to {tracking_number}")
-    if tracking_url and order.tracking_url != order.tracker.previous('tracking_url'):
-        activity_details.append("Tracking URL updated")
-    
-    # Add the activity log
-    activity = OrderActivity.objects.create(
-        order=order,
-        user=request.user,
-        activity_type='status_change',
-        details="; ".join(activity_details) if activity_details else "Order updated",
-        note=note or None
-    )
+        changes['tracking_url'] = tracking_url
+    transition = OrderTransition(order, user=request.user, note=note, request=request)
+    transition.set(**changes).save()
+    
+    if transition.activities:
+        activity = transition.activities[0]
+    else:
+        activity = OrderActivity.objects.create(
+            order=order,
+            user=request.user,
+            activity_type='status_change',
+            details="Order updated",
+            note=note or None
+        )
     
     # Send email notification if requested and applicable
     if notify_customer and order.user and new_status in ['processing', 'shipped', 'delivered']:
@@ -413,27 +369,23 @@ class StaffDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
         now = timezone.now()
         thirty_days_ago = now - timedelta(days=30)
         
-        # Sales Statistics
-        recent_orders = Order.objects.filter(created_at__gte=thirty_days_ago)
-        total_sales = recent_orders.aggregate(
-            total=Sum('total_amount')
-        )['total'] or Decimal('0')
-        
-        # Sales comparison with previous period
-        sixty_days_ago = now - timedelta(days=60)
-        previous_period_sales = Order.objects.filter(
-            created_at__range=(sixty_days_ago, thirty_days_ago)
-        ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
+        # Sales statistics for this and the previous 30 days, from the daily rollups
+        today = timezone.localdate(now)
+        summary = get_period_summary(
+            start=today - timedelta(days=30),
+            end=today,
+            previous_start=today - timedelta(days=60)
+        )
+        total_sales = summary['total']
+        previous_period_sales = summary['previous_total']
         
         sales_change = Decimal('0')
         if previous_period_sales > 0:
             sales_change = ((total_sales - previous_period_sales) / previous_period_sales) * 100
         
         # Order counts
-        order_count = recent_orders.count()
-        previous_order_count = Order.objects.filter(
-            created_at__range=(sixty_days_ago, thirty_days_ago)
-        ).count()
+        order_count = summary['count']
+        previous_order_count = summary['previous_count']
         
         order_change = 0
         if previous_order_count > 0:
@@ -448,21 +400,13 @@ class StaffDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
             quantity__lte=10
         ).order_by('quantity')[:5]
         
-        # Popular Products
-        popular_products = Product.objects.annotate(
-            order_count=Count('order_items')
+        # Popular Products, ranked by their sales rollup
+        popular_products = Product.objects.filter(sales__order_count__gt=0).annotate(
+            order_count=F('sales__order_count')
         ).order_by('-order_count')[:5]
         
         # Sales by Day (Last 7 days)
-        seven_days_ago = now - timedelta(days=7)
-        daily_sales = Order.objects.filter(
-            created_at__gte=seven_days_ago,
-            status__in=['paid', 'delivered']
-        ).annotate(
-            day=TruncDay('created_at')
-        ).values('day').annotate(
-            total=Sum('total_amount')
-        ).order_by('day')
+        daily_sales = get_daily_totals(today - timedelta(days=6), ['paid', 'delivered'])
         
         # Format data for charts
         sales_data = {
@@ -475,10 +419,10 @@ class StaffDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
             }]
         }
         
-        for sale in daily_sales:
-            day_index = (now.date() - sale['day'].date()).days
+        for day, total in daily_sales.items():
+            day_index = (today - day).days
             if 0 <= day_index < 7:
-                sales_data['datasets'][0]['data'][6 - day_index] = float(sale['total'] or 0)
+                sales_data['datasets'][0]['data'][6 - day_index] = float(total or 0)
         
         context.update({
             'total_sales': total_sales,
@@ -672,145 +616,39 @@ class OrderHistoryView(LoginRequiredMixin, ListView):
 
 
 class InvoiceView(LoginRequiredMixin, DetailView):
+    """
+    Download an order's invoice PDF, rendered once per order version.
+    """
     model = Order
-    template_name = 'store/invoice.html'
     context_object_name = 'order'
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        order = self.get_object()
-        
-        # Calculate totals
-        subtotal = sum(item.quantity * item.price for item in order.items.all())
-        tax = subtotal * Decimal('0.18')  # 18% GST
-        shipping = Decimal('99.00')  # Fixed shipping cost
-        total = subtotal + tax + shipping
-        
-        context.update({
-            'subtotal': subtotal,
-            'tax': tax.quantize(Decimal('0.01')),
-            'shipping': shipping,
-            'total': total.quantize(Decimal('0.01')),
-            'company_info': {
-                'name': 'Angel Plants',
-                'address': '123 Plant Street, Garden City',
-                'phone': '+91 1234567890',
-                'email': 'info@angelplants.com',
-                'gstin': '27AABCU1234C1Z5'
-            }
-        })
-        return context
+    def get_queryset(self):
+        queryset = Order.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user=self.request.user)
+        return queryset
     
-    def render_to_response(self, context, **response_kwargs):
-        # Get the order from context
-        order = context['order']
-        
-        # Calculate totals
-        subtotal = sum(item.quantity * item.price for item in order.items.all())
-        tax = subtotal * Decimal('0.18')  # 18% GST
-        shipping = Decimal('99.00')  # Fixed shipping cost
-        total = subtotal + tax + shipping
-        
-        # Create the PDF response
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="invoice_{order.order_number}.pdf"'
-        
-        # Create the PDF object
-        doc = SimpleDocTemplate(response, pagesize=A4)
-        
-        # Add styles
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(name='RightAlign', parent=styles['Normal'], alignment=1))
-        styles.add(ParagraphStyle(name='CenterAlign', parent=styles['Normal'], alignment=1, fontSize=14, spaceAfter=20))
-        
-        # Create story
-        story = []
-        
-        # Add company info
-        story.append(Paragraph("<strong>Angel Plants</strong>", styles['CenterAlign']))
-        story.append(Paragraph("123 Plant Street, Garden City", styles['Normal']))
-        story.append(Paragraph("Phone: +91 1234567890", styles['Normal']))
-        story.append(Paragraph("Email: info@angelplants.com", styles['Normal']))
-        story.append(Paragraph("GSTIN: 27AABCU1234C1Z5", styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Add invoice header
-        story.append(Paragraph("INVOICE", styles['CenterAlign']))
-        story.append(Spacer(1, 20))
-        
-        # Add billing info
-        billing_info = [
-            ["Bill To:", f"{order.first_name} {order.last_name}"],
-            ["", order.address],
-            ["", f"{order.city}, {order.state} {order.postal_code}"],
-            ["", order.country],
-            ["Invoice Number:", order.order_number],
-            ["Date:", order.created_at.strftime("%B %d, %Y")],
-            ["Payment Status:", "Paid" if order.payment_status else "Unpaid"]
-        ]
-        
-        billing_table = Table(billing_info, colWidths=[100, 400])
-        billing_table.setStyle(TableStyle([
-            ('TEXTCOLOR', (0,0), (-1,-1), colors.black),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-            ('FONTSIZE', (0,0), (-1,-1), 10),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 8),
-            ('GRID', (0,0), (-1,-1), 1, colors.black)
-        ]))
-        story.append(billing_table)
-        story.append(Spacer(1, 20))
-        
-        # Add items table
-        items_data = [['Item', 'Quantity', 'Price', 'Subtotal']]
-        for item in order.items.all():
-            items_data.append([
-                item.product.name,
-                str(item.quantity),
-                f"₹{item.price}",
-                f"₹{item.quantity * item.price}"
-            ])
-        
-        items_table = Table(items_data)
-        items_table.setStyle(TableStyle([
-            ('TEXTCOLOR', (0,0), (-1,-1), colors.black),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-            ('FONTSIZE', (0,0), (-1,-1), 10),
-            ('BACKGROUND', (0,0), (-1,0), colors.grey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 8),
-            ('GRID', (0,0), (-1,-1), 1, colors.black)
-        ]))
-        story.append(items_table)
-        story.append(Spacer(1, 20))
-        
-        # Add totals
-        totals_data = [
-            ["Subtotal", f"₹{subtotal}"],
-            ["Shipping", f"₹{shipping}"],
-            ["GST (18%)", f"₹{tax}"],
-            ["Total Amount", f"₹{total}"]
-        ]
-        
-        totals_table = Table(totals_data, colWidths=[300, 200])
-        totals_table.setStyle(TableStyle([
-            ('TEXTCOLOR', (0,0), (-1,-1), colors.black),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-            ('FONTSIZE', (0,0), (-1,-1), 10),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 8),
-            ('GRID', (0,0), (-1,-1), 1, colors.black),
-            ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
-            ('TEXTCOLOR', (0,-1), (-1,-1), colors.black)
-        ]))
-        story.append(totals_table)
-        
-        # Build the PDF
-        doc.build(story)
-        
+    def get(self, request, *args, **kwargs):
+        order = self.get_object()
+        invoice = get_invoice(order)
+        etag = f'"{invoice.digest}"'
+        
+        # The digest changes with the order data, so a matching ETag is current
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        
+        response = FileResponse(
+            open(invoice.path, 'rb'),
+            as_attachment=True,
+            filename=f"invoice_{order.order_number}.pdf",
+            content_type='application/pdf'
+        )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         return response
 
+
 class AccountView(LoginRequiredMixin, TemplateView):
     """
     View to display user account dashboard with order history and account details.
@@ -1032,34 +870,14 @@ class HomeView(TemplateView):
         context = super().get_context_data(**kwargs)
         context['page_title'] = 'Home - Angel\'s Plant Shop'
         
-        # Only show featured products that are in stock or allow backorder
-        context['featured_products'] = Product.objects.filter(
-            is_featured=True, 
-            is_active=True
-        ).filter(
-            Q(quantity__gt=0) | Q(allow_backorder=True)
-        )[:8]
-        
-        # Only show bestsellers that are in stock or allow backorder
-        context['bestsellers'] = Product.objects.filter(
-            is_bestseller=True, 
-            is_active=True
-        ).filter(
-            Q(quantity__gt=0) | Q(allow_backorder=True)
-        )[:4]
-        
-        # Only show new arrivals that are in stock or allow backorder
-        context['new_arrivals'] = Product.objects.filter(
-            is_active=True
-        ).filter(
-            Q(quantity__gt=0) | Q(allow_backorder=True)
-        ).order_by('-created_at')[:4]
-        
-        # Get categories with active products
-        context['categories'] = Category.objects.filter(
-            products__is_active=True,
-            products__quantity__gt=0
-        ).distinct()[:8]
+        # Rails only include products that are in stock or allow backorder.
+        # They are served from the versioned catalog cache, so a warm home
+        # page does not hit the database for them.
+        rails = get_home_rails()
+        context['featured_products'] = rails['featured_products']['items']
+        context['bestsellers'] = rails['bestsellers']['items']
+        context['new_arrivals'] = rails['new_arrivals']['items']
+        context['categories'] = rails['categories']['items']
         
         return context
 
@@ -1182,21 +1000,14 @@ def add_to_wishlist(request, product_id):
     
     product = get_object_or_404(Product, id=product_id, is_active=True)
     
-    # Check if the product is already in the user's wishlist
-    if Wishlist.objects.filter(user=request.user, product=product).exists():
-        messages.info(request, 'This product is already in your wishlist.')
-    else:
-        try:
-            # Create a new wishlist item
-            Wishlist.objects.create(
-                user=request.user,
-                product=product,
-                quantity=1
-            )
+    try:
+        if add_products(request.user, [product.pk]):
             messages.success(request, 'Product added to your wishlist.')
-        except Exception as e:
-            messages.error(request, 'Failed to add product to wishlist. Please try again.')
-            logger.error(f"Error adding to wishlist: {str(e)}")
+        else:
+            messages.info(request, 'This product is already in your wishlist.')
+    except Exception as e:
+        messages.error(request, 'Failed to add product to wishlist. Please try again.')
+        logger.error(f"Error adding to wishlist: {str(e)}")
     
     # Redirect back to the previous page or product detail
     redirect_url = request.META.get('HTTP_REFERER', 'store:product_detail')
@@ -1226,56 +1037,97 @@ def api_toggle_wishlist(request, product_id):
             'message': 'Product not found or is no longer available.'
         }, status=404)
     
-    # Check if the product is already in the user's wishlist
-    wishlist_item = Wishlist.objects.filter(user=request.user, product=product).first()
+    try:
+        added = toggle_wishlist(request.user, product)
+    except Exception as e:
+        logger.error(f"Error updating wishlist: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Failed to update wishlist. Please try again.'
+        }, status=500)
     
-    if wishlist_item:
-        # Remove from wishlist
-        wishlist_item.delete()
-        added = False
-        message = 'Product removed from your wishlist.'
+    if added:
+        message = 'Product added to your wishlist.'
     else:
-        # Add to wishlist
-        try:
-            Wishlist.objects.create(
-                user=request.user,
-                product=product,
-                quantity=1
-            )
-            added = True
-            message = 'Product added to your wishlist.'
-        except Exception as e:
-            logger.error(f"Error adding to wishlist: {str(e)}")
-            return JsonResponse({
-                'success': False,
-                'message': 'Failed to update wishlist. Please try again.'
-            }, status=500)
-    
-    # Get updated wishlist count
-    wishlist_count = Wishlist.objects.filter(user=request.user).count()
+        message = 'Product removed from your wishlist.'
     
     return JsonResponse({
         'success': True,
         'added': added,
         'message': message,
-        'wishlist_count': wishlist_count
+        'wishlist_count': get_wishlist_count(request.user)
     })
 
 
+@require_http_methods(["POST"])
+def api_bulk_wishlist(request):
+    """
+    API endpoint to add, remove or move to the cart several wishlist products.
+    Expects JSON data with action ('add', 'remove' or 'move_to_cart') and
+    product_ids.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({
+            'success': False,
+            'message': 'Please log in to modify your wishlist.',
+            'login_required': True
+        }, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        action = data.get('action')
+        product_ids = [int(pk) for pk in data.get('product_ids', [])]
+    except (json.JSONDecodeError, TypeError, ValueError, AttributeError):
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid JSON data'
+        }, status=400)
+    
+    if action not in ('add', 'remove', 'move_to_cart') or not product_ids:
+        return JsonResponse({
+            'success': False,
+            'message': 'An action and at least one product_id are required.'
+        }, status=400)
+    
+    max_products = getattr(settings, 'WISHLIST_BULK_MAX_PRODUCTS', 100)
+    if len(product_ids) > max_products:
+        return JsonResponse({
+            'success': False,
+            'message': f'At most {max_products} products can be updated at once.'
+        }, status=400)
+    
+    response = {'success': True, 'action': action}
+    try:
+        if action == 'add':
+            response['added'] = add_products(request.user, product_ids)
+        elif action == 'remove':
+            response['removed'] = remove_products(request.user, product_ids)
+        else:
+            cart, _ = Cart.objects.get_or_create(user=request.user, status='active')
+            response['moved'] = move_products_to_cart(request.user, product_ids, cart)
+            response['cart_count'] = cart.total_quantity
+            invalidate_cart_snapshot(request)
+    except Exception as e:
+        logger.error(f"Error updating wishlist in bulk: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'success': False,
+            'message': 'Failed to update wishlist. Please try again.'
+        }, status=500)
+    
+    response['wishlist_count'] = get_wishlist_count(request.user)
+    return JsonResponse(response)
+
+
 @login_required
 def remove_from_wishlist(request, product_id):
     """
     Remove an item from the user's wishlist.
     """
     try:
-        wishlist_item = Wishlist.objects.get(
-            product_id=product_id,
-            user=request.user
-        )
-        wishlist_item.delete()
-        messages.success(request, 'Item removed from your wishlist.')
-    except Wishlist.DoesNotExist:
-        messages.error(request, 'Item not found in your wishlist.')
+        if remove_products(request.user, [product_id]):
+            messages.success(request, 'Item removed from your wishlist.')
+        else:
+            messages.error(request, 'Item not found in your wishlist.')
     except Exception as e:
         logger.error(f"Error removing from wishlist: {str(e)}")
         messages.error(request, 'Failed to remove item from wishlist. Please try again.')
@@ -1305,6 +1157,7 @@ def remove_from_cart(request, product_id):
             
             # Remove the item from the cart
             cart_item.delete()
+            cart.refresh_from_db(fields=['total', 'total_quantity'])
             
             # Prepare success response
             response_data = {
@@ -1414,8 +1267,9 @@ def add_to_cart(request, product_id, quantity=1):
                     price=product.price
                 )
             
-            # Update cart totals
-            cart.update_totals()
+            # Pick up the totals the item save applied
+            cart.refresh_from_db(fields=['total', 'total_quantity'])
+        invalidate_cart_snapshot(request)
         
         # Prepare response data
         response_data = {
@@ -1629,6 +1483,7 @@ def api_update_cart(request):
             cart_item.delete()
             item_removed = True
             message = 'Item removed from cart.'
+        invalidate_cart_snapshot(request)
         
         # Get updated cart data
         cart = get_object_or_404(Cart, user=request.user)
@@ -1721,8 +1576,8 @@ def api_rate_product(request):
             }
         )
         
-        # Update product's average rating
-        product.update_average_rating()
+        # The rating signal updated the running totals; read them back
+        product.refresh_from_db(fields=['rating_sum', 'rating_count'])
         
         return JsonResponse({
             'status': 'success',
@@ -1733,7 +1588,7 @@ def api_rate_product(request):
             'user_name': request.user.get_full_name() or request.user.username,
             'created_at': rating_obj.created_at.strftime('%B %d, %Y'),
             'average_rating': float(product.average_rating) if product.average_rating else 0,
-            'rating_count': product.ratings.count()
+            'rating_count': product.rating_count
         })
         
     except json.JSONDecodeError:
@@ -1773,15 +1628,21 @@ class ProductSearchView(ListView):
         in_stock = self.request.GET.get('in_stock')
         sort_by = self.request.GET.get('sort_by', 'relevance')
         
-        # Apply search query
+        # Apply search query using the full-text index (ids come back best match first)
+        matched_ids = None
         if query:
-            queryset = queryset.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(short_description__icontains=query) |
-                Q(category__name__icontains=query) |
-                Q(tags__name__icontains=query)
-            ).distinct()
+            try:
+                matched_ids = search_product_ids(query)
+                queryset = queryset.filter(id__in=matched_ids)
+            except SearchIndexError as e:
+                logger.error(f"Search index unavailable, falling back to database search: {str(e)}")
+                queryset = queryset.filter(
+                    Q(name__icontains=query) |
+                    Q(description__icontains=query) |
+                    Q(short_description__icontains=query) |
+                    Q(category__name__icontains=query) |
+                    Q(tags__name__icontains=query)
+                ).distinct()
         
         # Apply filters
         if category:
@@ -1794,7 +1655,7 @@ class ProductSearchView(ListView):
             queryset = queryset.filter(price__lte=max_price)
             
         if in_stock == 'true':
-            queryset = queryset.filter(stock_quantity__gt=0)
+            queryset = queryset.filter(quantity__gt=0)
         
         # Apply sorting
         if sort_by == 'price_asc':
@@ -1809,20 +1670,15 @@ class ProductSearchView(ListView):
             queryset = queryset.order_by('-created_at')
         elif sort_by == 'bestselling':
             queryset = queryset.order_by('-sold_count')
-        elif sort_by == 'relevance' and query:
-            # For relevance, we'll order by best match first
-            from django.db.models import Case, When, Value, IntegerField
-            
-            # Create a case to order by the number of matches
+        elif sort_by == 'relevance' and matched_ids:
+            # Keep the BM25 ranking returned by the search index
             queryset = queryset.annotate(
                 relevance=Case(
-                    When(name__icontains=query, then=Value(3)),
-                    When(description__icontains=query, then=Value(2)),
-                    When(short_description__icontains=query, then=Value(1)),
-                    default=Value(0),
+                    *[When(id=product_id, then=Value(position))
+                      for position, product_id in enumerate(matched_ids)],
                     output_field=IntegerField(),
                 )
-            ).order_by('-relevance', '-created_at')
+            ).order_by('relevance')
         else:
             # Default sorting by creation date
             queryset = queryset.order_by('-created_at')
@@ -1841,7 +1697,7 @@ class ProductSearchView(ListView):
         sort_by = self.request.GET.get('sort_by', 'relevance')
         
         # Get all categories for the filter
-        categories = Category.objects.all()
+        categories = get_categories()
         
         # Get min and max prices for the price range filter
         price_range = Product.objects.filter(is_active=True).aggregate(
@@ -1850,7 +1706,7 @@ class ProductSearchView(ListView):
         )
         
         # Build filter URL
-        base_url = f"{reverse('product_search')}?"
+        base_url = f"{reverse('store:product_search')}?"
         params = []
         
         if query:
@@ -1866,6 +1722,10 @@ class ProductSearchView(ListView):
             
         filter_url = base_url + '&'.join(params) if params else base_url
         
+        # Reuse the paginator's count instead of re-running the search
+        paginator = context.get('paginator')
+        result_count = paginator.count if paginator else len(context['object_list'])
+        
         context.update({
             'query': query,
             'selected_category': category,
@@ -1877,7 +1737,7 @@ class ProductSearchView(ListView):
             'sort_by': sort_by,
             'categories': categories,
             'filter_url': filter_url,
-            'result_count': self.get_queryset().count(),
+            'result_count': result_count,
             'page_title': f"Search Results for '{query}'" if query else "Search Products"
         })
         
@@ -2140,16 +2000,44 @@ class ProductListView(ListView):
     context_object_name = 'products'
     paginate_by = 12
     
+    sort_mapping = {
+        'price_asc': 'price',
+        'price_desc': '-price',
+        'name_asc': 'name',
+        'name_desc': '-name',
+        'newest': '-created_at',
+        'created_at': '-created_at'
+    }
+    
+    def get_category(self):
+        """Return the category from the URL (memoized for the request)"""
+        if not hasattr(self, '_category'):
+            category_slug = self.kwargs.get('category_slug')
+            self._category = get_object_or_404(Category, slug=category_slug) if category_slug else None
+        return self._category
+    
     def get_queryset(self):
+        # The view instance lives for one request, so build the queryset once
+        if hasattr(self, '_product_queryset'):
+            return self._product_queryset
+        
         # Get all active products that are in stock
         queryset = Product.objects.filter(is_active=True, quantity__gt=0).select_related('category').prefetch_related('tags')
         
         # Filter by category if category_slug is provided in URL
-        category_slug = self.kwargs.get('category_slug')
-        if category_slug:
-            category = get_object_or_404(Category, slug=category_slug)
+        category = self.get_category()
+        if category:
             queryset = queryset.filter(category=category)
-            print(f"Filtered by category '{category.name}': {queryset.count()} products")
+        
+        # Resolve the sidebar filters and their counts from the facet index
+        self.filterset = ProductFilter(self.request.GET, queryset=queryset)
+        selection = self.filterset.facet_selection() if self.filterset.is_valid() else {}
+        if category:
+            selection['category'] = category.pk
+        index = get_facet_index()
+        self.facets = index.query(selection, base=index.on_hand)
+        if any(value is not None for value in selection.values()):
+            queryset = queryset.filter(pk__in=self.facets.ids())
         
         # Apply search query if present
         search_query = self.request.GET.get('q')
@@ -2160,56 +2048,50 @@ class ProductListView(ListView):
                 Q(short_description__icontains=search_query) |
                 Q(tags__name__icontains=search_query)
             ).distinct()
-            print(f"After search for '{search_query}': {queryset.count()} products")
         
         # Apply sorting
         sort_by = self.request.GET.get('sort_by', 'newest')
-        sort_mapping = {
-            'price_asc': 'price',
-            'price_desc': '-price',
-            'name_asc': 'name',
-            'name_desc': '-name',
-            'newest': '-created_at',
-            'created_at': '-created_at'
-        }
-        
-        order_field = sort_mapping.get(sort_by, '-created_at')
+        order_field = self.sort_mapping.get(sort_by, '-created_at')
         queryset = queryset.order_by(order_field)
         
-        # Debug info
-        print(f"\n=== DEBUG: Product List Query ===")
-        print(f"Total products in stock: {queryset.count()}")
-        if queryset.exists():
-            print(f"Sample product: {queryset[0].name} (ID: {queryset[0].id}, Stock: {queryset[0].quantity})")
+        instrument(
+            type(self), 'queryset',
+            category=category.slug if category else None,
+            selection={key: value for key, value in selection.items() if value is not None},
+            facet_matches=len(self.facets),
+            search=search_query,
+            sort=order_field,
+        )
         
+        self._product_queryset = queryset
         return queryset
     
     def get_context_data(self, **kwargs):
+        # Pagination runs the only COUNT and fetches the only page of products
         context = super().get_context_data(**kwargs)
-        categories = Category.objects.all()
-        products = self.get_queryset()
-        
-        # Initialize filterset
-        self.filterset = ProductFilter(self.request.GET, queryset=products)
-        products = self.filterset.qs
+        categories = get_categories()
         
         # Get current category if in category view
-        category_slug = self.kwargs.get('category_slug')
-        current_category = None
-        if category_slug:
-            current_category = get_object_or_404(Category, slug=category_slug)
+        current_category = self.get_category()
+        if current_category:
             context['category'] = current_category
-            context['category_slug'] = category_slug
-        
-        # Debug output
-        print("\n=== DEBUG: ProductListView ===")
-        print(f"Categories found: {categories.count()}")
-        print(f"Current category: {current_category}" if current_category else "No category filter")
-        print(f"Products found: {products.count()}")
-        if products.exists():
-            print(f"First product: {products[0].name} (ID: {products[0].id}, Stock: {products[0].quantity})")
+            context['category_slug'] = current_category.slug
+        
+        category_counts = self.facets.counts['category']
+        for cat in categories:
+            cat.facet_count = category_counts.get(cat.pk, 0)
+        
+        page = context['page_obj']
+        if page is not None:
+            instrument(
+                type(self), 'page',
+                total=page.paginator.count,
+                page=page.number,
+                shown=len(page.object_list),
+            )
         
         context['categories'] = categories
+        context['facet_counts'] = self.facets.counts
         context['featured_products'] = Product.objects.filter(is_featured=True, is_active=True, quantity__gt=0)[:4]
         context['bestsellers'] = Product.objects.filter(is_bestseller=True, is_active=True, quantity__gt=0)[:4]
         context['filter'] = self.filterset
@@ -2234,25 +2116,26 @@ class ProductDetailView(DetailView):
     def get_queryset(self):
         return Product.objects.filter(is_active=True).select_related('category').prefetch_related('product_images')
     
+    def get_object(self, queryset=None):
+        # Served from the object cache; only a cold cache reads the product
+        product = get_product(slug=self.kwargs.get(self.slug_url_kwarg))
+        if product is None or not product.is_active:
+            raise Http404("No product found matching the query")
+        return product
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product = self.get_object()
+        product = self.object
         
-        # Get related products (same category, excluding current product)
-        related_products = Product.objects.filter(
-            category=product.category,
-            is_active=True
-        ).exclude(id=product.id)[:4]
+        # Products often bought with this one, topped up from its category
+        related_products = get_recommendations([product], limit=4)
         
-        # Get recently viewed products from session
+        # Get recently viewed products from session, excluding current product,
+        # in the order they were viewed
         recently_viewed = []
         if 'recently_viewed' in self.request.session:
-            # Get product IDs from session, excluding current product
             product_ids = [pid for pid in self.request.session['recently_viewed'] if pid != product.id]
-            # Get products and maintain order
-            recently_viewed = list(Product.objects.filter(id__in=product_ids[:4]))
-            # Sort to maintain the order from the session
-            recently_viewed.sort(key=lambda x: product_ids.index(x.id))
+            recently_viewed = get_products(product_ids[:4])
         
         # Check if product is in user's wishlist
         in_wishlist = False
@@ -2265,6 +2148,8 @@ class ProductDetailView(DetailView):
         context.update({
             'related_products': related_products,
             'recently_viewed': recently_viewed,
+            # Gallery thumbnails next to the main image
+            'gallery_images': get_product_images(product.pk)[:3],
             'meta_title': product.meta_title or f"{product.name} | Angel's Plant Shop",
             'meta_description': product.meta_description or product.short_description,
             'in_wishlist': in_wishlist,
@@ -2311,102 +2196,37 @@ class CartView(LoginRequiredMixin, View):
                 
                 logger.debug(f"[CartView] Cart ID: {cart.id}, Created: {created}")
                 
-                # Get all items with related product data
-                all_items = list(cart.items.select_related('product').filter(product__isnull=False))
-                logger.debug(f"[CartView] Found {len(all_items)} items in cart")
-                
-                active_items = []
-                inactive_items = []
-                
-                # Process each cart item
-                for item in all_items:
-                    try:
-                        logger.debug(
-                            f"[CartView] Processing item {item.id}: {item.product.name if item.product else 'No product'}, "
-                            f"Qty: {item.quantity}, "
-                            f"Active: {getattr(item.product, 'is_active', 'N/A')}, "
-                            f"In Stock: {getattr(item.product, 'quantity', 'N/A')}, "
-                            f"Track Qty: {getattr(item.product, 'track_quantity', 'N/A')}"
-                        )
-                        
-                        # Check if product exists and is active
-                        if not item.product:
-                            logger.warning(f"[CartView] Item {item.id} has no associated product")
-                            inactive_items.append(item)
-                            continue
-                            
-                        # Refresh product data
-                        item.product.refresh_from_db()
-                        
-                        if not item.product.is_active:
-                            logger.debug(f"[CartView] Product {item.product.id} is not active")
-                            inactive_items.append(item)
-                            continue
-                            
-                        # Check stock if tracking is enabled
-                        if item.product.track_quantity:
-                            if item.quantity > item.product.quantity:
-                                if item.product.quantity > 0:
-                                    # Reduce quantity to available stock
-                                    old_qty = item.quantity
-                                    item.quantity = item.product.quantity
-                                    item.save(update_fields=['quantity', 'updated_at'])
-                                    
-                                    logger.info(f"[CartView] Reduced quantity of {item.product.name} from {old_qty} to {item.quantity}")
-                                    messages.warning(
-                                        request, 
-                                        f"Reduced quantity of '{item.product.name}' to available stock ({item.product.quantity}).",
-                                        extra_tags='cart_warning'
-                                    )
-                                    active_items.append(item)
-                                else:
-                                    # Out of stock
-                                    logger.info(f"[CartView] Product {item.product.id} is out of stock")
-                                    inactive_items.append(item)
-                                    messages.warning(
-                                        request, 
-                                        f"The product '{item.product.name}' is out of stock and has been removed from your cart.",
-                                        extra_tags='cart_warning'
-                                    )
-                            else:
-                                # Sufficient stock
-                                active_items.append(item)
-                        else:
-                            # Product doesn't track quantity
-                            active_items.append(item)
-                            
-                    except Exception as e:
-                        logger.error(f"[CartView] Error processing cart item {item.id}: {str(e)}", exc_info=True)
-                        inactive_items.append(item)
-            
-            # Remove inactive items
-            if inactive_items:
-                inactive_count = len(inactive_items)
-                inactive_names = ", ".join([f"'{item.product.name}'" for item in inactive_items if item.product])
-                logger.info(f"[CartView] Removing {inactive_count} inactive items: {inactive_names}")
-            for item in inactive_items:
-                product_name = getattr(item.product, 'name', 'Unknown Product')
-                print(f"[WARNING] Cart {cart.id} has an inactive/out-of-stock product: {product_name} (Product ID: {getattr(item.product, 'id', 'N/A')})")
-                
-                if not hasattr(request, '_dont_show_unavailable_message'):
-                    messages.warning(
-                        request,
-                        f"The product '{product_name}' is no longer available and has been removed from your cart.",
-                        extra_tags='cart_warning'
-                    )
-                
-                # Delete the item
-                item.delete()
+                # Re-check every item against current stock in bulk
+                result = reconcile_cart(cart)
             
-            # Update cart totals after removing items
-            cart.update_totals()
+            for item, old_qty in result.adjusted:
+                logger.info(f"[CartView] Reduced quantity of {item.product.name} from {old_qty} to {item.quantity}")
+                messages.warning(
+                    request, 
+                    f"Reduced quantity of '{item.product.name}' to available stock ({item.product.quantity}).",
+                    extra_tags='cart_warning'
+                )
+            
+            for item, reason in result.removed:
+                product_name = item.product.name if CartItem.product.is_cached(item) else 'Unknown Product'
+                logger.info(f"[CartView] Removed {product_name} from cart {cart.id} ({reason})")
+                if reason == REMOVED_OUT_OF_STOCK:
+                    message = f"The product '{product_name}' is out of stock and has been removed from your cart."
+                else:
+                    message = f"The product '{product_name}' is no longer available and has been removed from your cart."
+                if not hasattr(request, '_dont_show_unavailable_message'):
+                    messages.warning(request, message, extra_tags='cart_warning')
             
             # Use only active items for the rest of the view
-            items = active_items
+            items = result.active_items
+            
+            # Share the reconciled cart with the context processor
+            get_cart_snapshot(request).prime(cart, items)
             
             # Calculate total with shipping and tax
-            tax = (cart.total * self.TAX_RATE).quantize(Decimal('0.00'))
-            total_with_shipping = (cart.total + self.SHIPPING_COST + tax).quantize(Decimal('0.00'))
+            subtotal = result.subtotal
+            tax = (subtotal * self.TAX_RATE).quantize(Decimal('0.00'))
+            total_with_shipping = (subtotal + self.SHIPPING_COST + tax).quantize(Decimal('0.00'))
             
             # Prepare context with all necessary data
             context = {
@@ -2416,7 +2236,8 @@ class CartView(LoginRequiredMixin, View):
                 'tax': tax,
                 'total_with_shipping': total_with_shipping,
                 'is_cart_empty': len(items) == 0,  # Check if there are any items
-                'tax_rate': int(self.TAX_RATE * 100)  # For display purposes (e.g., '18%')
+                'tax_rate': int(self.TAX_RATE * 100),  # For display purposes (e.g., '18%')
+                'related_products': get_recommendations([item.product for item in items], limit=4),
             }
             
             print(f"[DEBUG] CartView - Rendering template with {len(items)} items")
@@ -2568,9 +2389,8 @@ class CheckoutSuccessView(LoginRequiredMixin, View):
                 'user',
                 'cart'
             ).prefetch_related(
-                'items',
-                'items__product',
-                'items__product__category',
+                # Order lines with their products in one query
+                Prefetch('items', queryset=OrderItem.objects.select_related('product__category')),
                 'items__product__product_images'  # Changed from 'images' to 'product_images'
             ).get(
                 order_number=order_number, 
@@ -2586,11 +2406,13 @@ class CheckoutSuccessView(LoginRequiredMixin, View):
                 status='completed'
             ).order_by('-created_at').first()
             
+            order_items = order.items.all()
             context = {
                 'order': order,
                 'payment': payment,
-                'order_items': order.items.all(),
-                'order_items_count': order.items.count(),
+                'order_items': order_items,
+                'order_items_count': len(order_items),
+                'related_products': get_recommendations([item.product for item in order_items], limit=4),
             }
             
             # Add payment to context
@@ -2601,17 +2423,17 @@ class CheckoutSuccessView(LoginRequiredMixin, View):
                 'total_with_shipping': order.total_amount,
             })
             
-            # Send order confirmation email
+            # Queue the order confirmation email; the outbox worker sends it
             try:
-                email_sent, message = send_order_confirmation_email(order)
-                if not email_sent:
-                    logger.warning(f"Failed to send order confirmation email for order {order.order_number}: {message}")
+                email_queued, message = queue_order_confirmation_email(order)
+                if not email_queued:
+                    logger.warning(f"Failed to queue order confirmation email for order {order.order_number}: {message}")
                     messages.warning(request, "Your order was placed successfully, but we couldn't send a confirmation email. Please check your order history for details.")
                 else:
-                    logger.info(f"Order confirmation email sent for order {order.order_number} to {order.email}")
-                    messages.success(request, f"Your order has been placed successfully! A confirmation email has been sent to {order.email}.")
+                    logger.info(f"Order confirmation email queued for order {order.order_number} to {order.email}")
+                    messages.success(request, f"Your order has been placed successfully! A confirmation email will be sent to {order.email}.")
             except Exception as e:
-                logger.error(f"Error sending order confirmation email for order {order.order_number}: {str(e)}", exc_info=True)
+                logger.error(f"Error queuing order confirmation email for order {order.order_number}: {str(e)}", exc_info=True)
                 messages.warning(request, "Your order was placed successfully, but we encountered an error sending the confirmation email. Please check your order history for details.")
             
             # Add cache control headers
@@ -2659,6 +2481,7 @@ class ClearCartView(LoginRequiredMixin, View):
         try:
             cart = Cart.objects.get(user=request.user, status='active')
             cart.items.all().delete()
+            invalidate_cart_snapshot(request)
             messages.success(request, "Your cart has been cleared!")
             return redirect('store:cart')
         except Cart.DoesNotExist:
@@ -2672,96 +2495,42 @@ class CheckoutView(LoginRequiredMixin, View):
     def process_cart_items(self, cart):
         """Process cart items and return active and inactive items."""
         try:
-            # Get all cart items with product information and lock them for update
-            with transaction.atomic():
-                all_cart_items = list(cart.items.select_related('product')
-                    .select_for_update()
-                    .filter(product__isnull=False))
+            # Re-check stock for all items in one locked pass
+            result = reconcile_cart(cart)
+            logger.debug(
+                f"[Checkout] Cart {cart.id}: {len(result.active_items)} active, "
+                f"{len(result.adjusted)} adjusted, {len(result.removed)} removed"
+            )
             
-            # Debug: Log all cart items and their active status
-            logger.debug(f"[Checkout] Processing cart {cart.id} with {len(all_cart_items)} items")
+            for item, old_qty in result.adjusted:
+                messages.warning(
+                    self.request,
+                    f"Reduced quantity of '{item.product.name}' to available stock ({item.product.quantity}).",
+                    extra_tags='cart_warning'
+                )
             
-            # Filter for active products with sufficient stock
-            active_cart_items = []
-            inactive_items = []
+            for item, reason in result.removed:
+                if reason == REMOVED_OUT_OF_STOCK:
+                    messages.warning(
+                        self.request,
+                        f"'{item.product.name}' is out of stock and has been removed from your cart.",
+                        extra_tags='cart_warning'
+                    )
             
-            with transaction.atomic():
-                for item in all_cart_items:
-                    try:
-                        # Log item details before processing
-                        item_debug = (
-                            f"[Cart Item {item.id}] Product: {item.product.name if item.product else 'None'}, "
-                            f"Active: {getattr(item.product, 'is_active', 'N/A')}, "
-                            f"Quantity: {item.quantity}, "
-                            f"In Stock: {getattr(item.product, 'quantity', 'N/A')}, "
-                            f"Track Qty: {getattr(item.product, 'track_quantity', 'N/A')}"
-                        )
-                        logger.debug(item_debug)
-                        
-                        # Check if product exists and is active
-                        if not item.product:
-                            logger.debug(f"[Cart Item {item.id}] No product associated")
-                            inactive_items.append(item)
-                            continue
-                            
-                        # Refresh the product to get the latest stock
-                        item.product.refresh_from_db()
-                        
-                        if not item.product.is_active:
-                            logger.debug(f"[Cart Item {item.id}] Product is not active")
-                            inactive_items.append(item)
-                            continue
-                            
-                        # Check stock if tracking is enabled
-                        if item.product.track_quantity:
-                            if item.quantity > item.product.quantity:
-                                if item.product.quantity > 0:
-                                    # Reduce quantity to available stock
-                                    old_qty = item.quantity
-                                    item.quantity = item.product.quantity
-                                    item.save(update_fields=['quantity', 'updated_at'])
-                                    
-                                    logger.debug(f"[Cart Item {item.id}] Reduced quantity from {old_qty} to {item.quantity}")
-                                    messages.warning(
-                                        self.request,
-                                        f"Reduced quantity of '{item.product.name}' to available stock ({item.product.quantity}).",
-                                        extra_tags='cart_warning'
-                                    )
-                                    active_cart_items.append(item)
-                                else:
-                                    # Product is out of stock
-                                    logger.debug(f"[Cart Item {item.id}] Product is out of stock")
-                                    inactive_items.append(item)
-                                    messages.warning(
-                                        self.request,
-                                        f"'{item.product.name}' is out of stock and has been removed from your cart.",
-                                        extra_tags='cart_warning'
-                                    )
-                            else:
-                                # Sufficient stock available
-                                logger.debug(f"[Cart Item {item.id}] Sufficient stock available")
-                                active_cart_items.append(item)
-                        else:
-                            # Product doesn't track quantity
-                            logger.debug(f"[Cart Item {item.id}] Product doesn't track quantity")
-                            active_cart_items.append(item)
-                            
-                    except Exception as e:
-                        logger.error(f"Error processing cart item {item.id}: {str(e)}", exc_info=True)
-                        inactive_items.append(item)
-            
-            # Remove inactive items from cart
-            if inactive_items:
-                inactive_count = len(inactive_items)
-                inactive_names = ", ".join([f"'{item.product.name}'" for item in inactive_items if item.product])
+            # Summarise items removed because their product is unavailable
+            inactive_names = ", ".join(
+                f"'{item.product.name}'" for item, reason in result.removed
+                if reason != REMOVED_OUT_OF_STOCK and CartItem.product.is_cached(item)
+            )
+            inactive_count = sum(1 for _, reason in result.removed if reason != REMOVED_OUT_OF_STOCK)
+            if inactive_count:
                 messages.warning(
                     self.request, 
                     f"Removed {inactive_count} inactive items from cart: {inactive_names}",
                     extra_tags='cart_warning'
                 )
-                CartItem.objects.filter(id__in=[item.id for item in inactive_items]).delete()
             
-            return active_cart_items, inactive_items
+            return result.active_items, [item for item, _ in result.removed]
             
         except Exception as e:
             logger.error(f"Error processing cart items: {str(e)}", exc_info=True)
@@ -2821,12 +2590,6 @@ class CheckoutView(LoginRequiredMixin, View):
                         quantity=cart_item.quantity
                     )
                 
-                # Update product quantities if tracking is enabled
-                for cart_item in active_cart_items:
-                    if cart_item.product.track_quantity:
-                        cart_item.product.quantity -= cart_item.quantity
-                        cart_item.product.save(update_fields=['quantity', 'updated_at'])
-                
                 # Clear the cart after successful order creation
                 cart.items.all().delete()
                 cart.update_totals()
@@ -2886,6 +2649,16 @@ class CheckoutView(LoginRequiredMixin, View):
             )
             return redirect('store:cart')
     
+    def reservation_failed(self, request, reservation):
+        """Tell the customer which lines could not be reserved."""
+        for line in reservation.failed:
+            logger.warning(f"Not enough stock for product {line.product_id}. Available: {line.available}, Requested: {line.quantity}")
+            if line.name is None:
+                messages.warning(request, "A product in your order is no longer available.")
+            else:
+                messages.warning(request, f"Not enough stock for {line.name}. Only {line.available} available.")
+        return redirect('store:cart')
+    
     def post(self, request, *args, **kwargs):
         try:
             # Get the order
@@ -2959,41 +2732,35 @@ class CheckoutView(LoginRequiredMixin, View):
                 messages.error(request, 'Please enter a valid 10-digit phone number')
                 return redirect('store:checkout')
             
-            # Update order details from form data
-            order.first_name = request.POST.get('first_name', '')
-            order.last_name = request.POST.get('last_name', '')
-            order.email = request.POST.get('email', '')
-            order.address = request.POST.get('address', '')
-            order.address2 = request.POST.get('address2', '')
-            order.district = request.POST.get('district', '')
-            order.city = request.POST.get('district', '')  # Using district as city
-            order.state = request.POST.get('state', 'Kerala')
-            order.postal_code = request.POST.get('postal_code', '')
-            order.country = request.POST.get('country', 'India')
-            order.phone = request.POST.get('phone', '')
-            order.payment_method = request.POST.get('payment_method', 'cash_on_delivery')
-            
-            # Save the updated order
-            order.save()
+            # Collect the form data; every payment path below saves it together
+            # with its own changes in one UPDATE
+            transition = OrderTransition(order, user=request.user, request=request).set(
+                first_name=request.POST.get('first_name', ''),
+                last_name=request.POST.get('last_name', ''),
+                email=request.POST.get('email', ''),
+                address=request.POST.get('address', ''),
+                address2=request.POST.get('address2', ''),
+                district=request.POST.get('district', ''),
+                city=request.POST.get('district', ''),  # Using district as city
+                state=request.POST.get('state', 'Kerala'),
+                postal_code=request.POST.get('postal_code', ''),
+                country=request.POST.get('country', 'India'),
+                phone=request.POST.get('phone', ''),
+                payment_method=request.POST.get('payment_method', 'cash_on_delivery'),
+            )
             
             # Process payment based on payment method
             if order.payment_method == 'cash_on_delivery':
-                # For cash on delivery, just update the order status
-                order.payment_status = True
-                order.status = 'pending'
-                order.save()
+                with transaction.atomic():
+                    # Reserve stock for every line at once; nothing changes if any line is short
+                    reservation = reserve_stock(order.items.values_list('product_id', 'quantity'))
+                    if reservation.success:
+                        # For cash on delivery, just update the order status
+                        transition.set(payment_status=True, status='pending')
+                    transition.save()
                 
-                # Update product quantity
-                for item in order.items.all():
-                    product = item.product
-                    if product.quantity >= item.quantity:  # Check if enough stock is available
-                        product.quantity -= item.quantity
-                        product.save()
-                    else:
-                        # Handle case where there's not enough stock
-                        logger.warning(f"Not enough stock for product {product.id}. Available: {product.quantity}, Requested: {item.quantity}")
-                        messages.warning(request, f"Not enough stock for {product.name}. Only {product.quantity} available.")
-                        return redirect('store:cart')
+                if not reservation.success:
+                    return self.reservation_failed(request, reservation)
                 
                 # Clear the cart
                 cart = Cart.objects.filter(user=request.user, status='active').first()
@@ -3011,9 +2778,19 @@ class CheckoutView(LoginRequiredMixin, View):
                 return redirect('store:checkout_success', order_number=order.order_number)
                 
             elif order.payment_method == 'razorpay':
+                # Stock is reserved when the order is placed; a retry reuses
+                # the reservation made by the first attempt
+                lines = list(order.items.values_list('product_id', 'quantity'))
+                reserve = not order.razorpay_order_id
+                if reserve:
+                    reservation = reserve_stock(lines)
+                    if not reservation.success:
+                        transition.save()
+                        return self.reservation_failed(request, reservation)
+                
                 try:
                     # Initialize Razorpay client
-                    client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+                    client = get_gateway_client()
                     
                     # Convert amount to paise (Razorpay expects amount in smallest currency unit)
                     amount = int(order.total_amount * 100)
@@ -3027,8 +2804,7 @@ class CheckoutView(LoginRequiredMixin, View):
                     })
                     
                     # Update order with Razorpay order ID
-                    order.razorpay_order_id = razorpay_order['id']
-                    order.save()
+                    transition.set(razorpay_order_id=razorpay_order['id']).save()
                     
                     # Return Razorpay order details to frontend
                     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -3051,6 +2827,10 @@ class CheckoutView(LoginRequiredMixin, View):
                     
                 except Exception as e:
                     logger.error(f"Razorpay order creation failed: {str(e)}", exc_info=True)
+                    # Keep the customer's details even though payment setup failed
+                    transition.save()
+                    if reserve:
+                        release_stock(lines)
                     error_details = {
                         'error_type': 'RazorpayError',
                         'message': str(e),
@@ -3065,7 +2845,12 @@ class CheckoutView(LoginRequiredMixin, View):
                     
                     messages.error(request, 'An error occurred while processing your payment. Please try again.')
                     return redirect('store:checkout')
-            
+
+            # Unknown payment method: keep the details and send the customer back
+            transition.save()
+            messages.error(request, 'Please choose a valid payment method.')
+            return redirect('store:checkout')
+
         except Exception as e:
             logger.error(f"Error in checkout POST: {str(e)}", exc_info=True)
             error_details = {
@@ -3090,34 +2875,17 @@ class CheckoutView(LoginRequiredMixin, View):
         tax_rate = Decimal('0.08')  # 8% tax rate
         tax = order.total_amount * tax_rate
         
-        # Get categories from ordered items
-        ordered_categories = order.items.values_list('product__category', flat=True).distinct()
-        
-        # Get related products (products from the same categories as ordered items)
-        related_products = Product.objects.filter(
-            category__in=ordered_categories,
-            is_active=True
-        ).exclude(
-            id__in=order.items.values_list('product_id', flat=True)
-        ).distinct().order_by('?')[:8]  # Get 8 random related products
-        
-        # If not enough related products, get some random products
-        if related_products.count() < 4:
-            additional_products = Product.objects.filter(
-                is_active=True
-            ).exclude(
-                id__in=order.items.values_list('product_id', flat=True)
-            ).exclude(
-                id__in=related_products.values_list('id', flat=True)
-            ).order_by('?')[:8 - related_products.count()]
-            related_products = list(related_products) + list(additional_products)
+        # Products often bought with the ordered ones
+        related_products = get_recommendations(
+            [item.product for item in order.items.select_related('product')], limit=8
+        )
         
         context = {
             'order': order,
             'shipping_cost': shipping_cost,
             'tax': tax.quantize(Decimal('0.01')),
             'total_with_shipping': (order.total_amount + shipping_cost + tax).quantize(Decimal('0.01')),
-            'related_products': related_products[:8],  # Ensure we don't return more than 8 products
+            'related_products': related_products,
         }
         
         return render(request, 'store/order_confirmation.html', context)
@@ -3303,7 +3071,17 @@ class StaffProductListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         return redirect('store:home')
 
 
-class BlogPostListView(ListView):
+class BlogSidebarMixin:
+    """
+    Adds the cached blog sidebar (store.blog_cache) to the context
+    """
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(get_sidebar_context())
+        return context
+
+
+class BlogPostListView(BlogSidebarMixin, ListView):
     """
     View for displaying a list of blog posts
     """
@@ -3333,21 +3111,6 @@ class BlogPostListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Add categories for sidebar
-        context['categories'] = BlogCategory.objects.filter(is_active=True).annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status=BlogPost.PUBLISHED))
-        ).filter(post_count__gt=0)
-        
-        # Add popular tags
-        context['popular_tags'] = BlogTag.objects.annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status=BlogPost.PUBLISHED))
-        ).filter(post_count__gt=0).order_by('-post_count')[:10]
-        
-        # Add archive dates
-        context['archive_dates'] = BlogPost.objects.filter(
-            status=BlogPost.PUBLISHED
-        ).dates('publish_date', 'month', order='DESC')
-        
         # Add current filters
         context['current_category'] = self.kwargs.get('category_slug')
         context['current_tag'] = self.kwargs.get('tag_slug')
@@ -3355,7 +3118,7 @@ class BlogPostListView(ListView):
         return context
 
 
-class BlogPostDetailView(DetailView):
+class BlogPostDetailView(BlogSidebarMixin, DetailView):
     """
     View for displaying a single blog post
     """
@@ -3378,26 +3141,23 @@ class BlogPostDetailView(DetailView):
         
         try:
             post = get_object_or_404(
-                BlogPost,
+                queryset if queryset is not None else self.get_queryset(),
                 publish_date__year=year,
                 publish_date__month=month,
                 publish_date__day=day,
-                slug=slug,
-                status=BlogPost.PUBLISHED
+                slug=slug
             )
-            
-            # Increment view count
-            post.view_count += 1
-            post.save(update_fields=['view_count'])
-            
-            return post
-            
         except (ValueError, Http404):
             raise Http404("Post not found")
+        
+        # Buffered; written in batches by store.counters
+        blog_post_views.increment(post.pk)
+        post.view_count = blog_post_views.displayed(post)
+        return post
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        post = self.get_object()
+        post = self.object
         
         # Add related posts (same category)
         related_posts = BlogPost.objects.filter(
@@ -3411,15 +3171,6 @@ class BlogPostDetailView(DetailView):
             'meta_title': post.meta_title or post.title,
             'meta_description': post.meta_description or post.excerpt_text,
             'meta_image': post.featured_image.url if post.featured_image else None,
-            'categories': BlogCategory.objects.filter(is_active=True).annotate(
-                post_count=Count('blog_posts', filter=Q(blog_posts__status=BlogPost.PUBLISHED))
-            ).filter(post_count__gt=0),
-            'popular_tags': BlogTag.objects.annotate(
-                post_count=Count('blog_posts', filter=Q(blog_posts__status=BlogPost.PUBLISHED))
-            ).filter(post_count__gt=0).order_by('-post_count')[:10],
-            'archive_dates': BlogPost.objects.filter(
-                status=BlogPost.PUBLISHED
-            ).dates('publish_date', 'month', order='DESC'),
         })
         
         return context
@@ -3455,7 +3206,7 @@ class BlogTagView(BlogPostListView):
 
 from django.views.generic.dates import YearArchiveView, MonthArchiveView, DayArchiveView
 
-class BlogYearArchiveView(YearArchiveView):
+class BlogYearArchiveView(BlogSidebarMixin, YearArchiveView):
     """
     View for displaying blog posts filtered by year
     """
@@ -3473,30 +3224,10 @@ class BlogYearArchiveView(YearArchiveView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = f"Archive: {self.get_year()}"
-        
-        # Add sidebar data
-        self._add_sidebar_context(context)
         return context
-    
-    def _add_sidebar_context(self, context):
-        """Helper method to add sidebar context"""
-        # Add categories for sidebar
-        context['categories'] = BlogCategory.objects.filter(is_active=True).annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status=BlogPost.PUBLISHED))
-        ).filter(post_count__gt=0)
-        
-        # Add popular tags
-        context['popular_tags'] = BlogTag.objects.annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status=BlogPost.PUBLISHED))
-        ).filter(post_count__gt=0).order_by('-post_count')[:10]
-        
-        # Add archive dates
-        context['archive_dates'] = BlogPost.objects.filter(
-            status=BlogPost.PUBLISHED
-        ).dates('publish_date', 'month', order='DESC')
 
 
-class BlogMonthArchiveView(MonthArchiveView):
+class BlogMonthArchiveView(BlogSidebarMixin, MonthArchiveView):
     """
     View for displaying blog posts filtered by year and month
     """
@@ -3515,24 +3246,4 @@ class BlogMonthArchiveView(MonthArchiveView):
         context = super().get_context_data(**kwargs)
         month_name = self.get_date().strftime("%B %Y")
         context['title'] = f"Archive: {month_name}"
-        
-        # Add sidebar data
-        self._add_sidebar_context(context)
         return context
-    
-    def _add_sidebar_context(self, context):
-        """Helper method to add sidebar context"""
-        # Add categories for sidebar
-        context['categories'] = BlogCategory.objects.filter(is_active=True).annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status=BlogPost.PUBLISHED))
-        ).filter(post_count__gt=0)
-        
-        # Add popular tags
-        context['popular_tags'] = BlogTag.objects.annotate(
-            post_count=Count('blog_posts', filter=Q(blog_posts__status=BlogPost.PUBLISHED))
-        ).filter(post_count__gt=0).order_by('-post_count')[:10]
-        
-        # Add archive dates
-        context['archive_dates'] = BlogPost.objects.filter(
-            status=BlogPost.PUBLISHED
-        ).dates('publish_date', 'month', order='DESC')
@@ -0,0 +1,219 @@
+"""
+Wishlist writes and the per-user wishlist count.
+
+Each user's profile stores the number of items on their wishlist. Every
+write in this module adjusts it with an ``F()`` UPDATE in the same
+transaction as the insert or delete, and the count is cached per user, so
+the header badge and the wishlist API never count the user's rows.
+
+``remove_products()`` and ``move_products_to_cart()`` delete any number of
+products with one DELETE. ``add_products()`` looks up the missing products
+in one query and inserts each in a savepoint, so a row added concurrently
+by another request is skipped rather than counted twice.
+Deleting a product cascades to its wishlist items, so a pre_delete signal
+calls ``release_deleted_product()`` to adjust the counts first. Other writes
+that bypass this module (the admin, queryset deletes of wishlist items)
+leave the count stale until ``rebuild_wishlist_counts()`` repairs it.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+from .cart_utils import bulk_add_to_cart
+from .models import Product, Profile, Wishlist
+
+logger = logging.getLogger(__name__)
+
+WISHLIST_COUNT_KEY = 'wishlist:count:{user_id}'
+
+
+def _count_key(user_id):
+    return WISHLIST_COUNT_KEY.format(user_id=user_id)
+
+
+def adjust_wishlist_count(user_id, delta):
+    """
+    Add ``delta`` to a user's stored wishlist count.
+
+    Call inside the transaction that adds or removes the items; the cached
+    count is dropped once it commits.
+    """
+    if not delta:
+        return
+    Profile.objects.filter(user_id=user_id).update(
+        wishlist_count=Greatest(F('wishlist_count') + delta, Value(0))
+    )
+    transaction.on_commit(lambda: cache.delete(_count_key(user_id)))
+
+
+def get_wishlist_count(user):
+    """
+    Return the number of items on a user's wishlist, reading the cache first.
+
+    Args:
+        user: authenticated User
+
+    Returns:
+        int: wishlist item count
+    """
+    key = _count_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Profile.objects.filter(user_id=user.pk).values_list('wishlist_count', flat=True).first()
+        if count is None:
+            # No profile to keep the count on
+            count = Wishlist.objects.filter(user=user).count()
+        cache.set(key, count, getattr(settings, 'WISHLIST_COUNT_CACHE_TIMEOUT', 60 * 60))
+    return count
+
+
+def toggle_wishlist(user, product):
+    """
+    Add a product to the user's wishlist, or remove it if it is already there.
+
+    Tries the DELETE first and only inserts when it removed nothing, instead
+    of looking the item up beforehand.
+
+    Returns:
+        bool: True if the product was added, False if it was removed
+    """
+    with transaction.atomic():
+        deleted, _ = Wishlist.objects.filter(user=user, product=product).delete()
+        if deleted:
+            adjust_wishlist_count(user.pk, -deleted)
+            return False
+        try:
+            with transaction.atomic():
+                Wishlist.objects.create(user=user, product=product, quantity=1)
+        except IntegrityError:
+            # Added by a concurrent request, which counted it
+            return True
+        adjust_wishlist_count(user.pk, 1)
+        return True
+
+
+def add_products(user, product_ids):
+    """
+    Add several products to the user's wishlist.
+
+    Inactive products and products already on the wishlist are skipped.
+
+    Args:
+        user: authenticated User
+        product_ids: iterable of Product IDs
+
+    Returns:
+        list: IDs of the products added
+    """
+    with transaction.atomic():
+        missing = (
+            Product.objects.filter(pk__in=set(product_ids), is_active=True)
+            .exclude(wishlist_items__user=user)
+            .only('pk')
+            .order_by('pk')
+        )
+        new_ids = []
+        for product in missing:
+            try:
+                with transaction.atomic():
+                    Wishlist.objects.create(user=user, product=product, quantity=1)
+            except IntegrityError:
+                # Added by a concurrent request, which counted it
+                continue
+            new_ids.append(product.pk)
+        adjust_wishlist_count(user.pk, len(new_ids))
+    return new_ids
+
+
+def remove_products(user, product_ids):
+    """
+    Remove several products from the user's wishlist in one DELETE.
+
+    Returns:
+        int: number of wishlist items removed
+    """
+    with transaction.atomic():
+        deleted, _ = Wishlist.objects.filter(user=user, product_id__in=set(product_ids)).delete()
+        adjust_wishlist_count(user.pk, -deleted)
+    return deleted
+
+
+def move_products_to_cart(user, product_ids, cart):
+    """
+    Move several wishlist items into a cart.
+
+    Each item's wishlist quantity is added to the cart, capped to tracked
+    stock, by ``bulk_add_to_cart()``. Items for inactive or out-of-stock
+    products stay on the wishlist; the moved ones are removed with one DELETE.
+
+    Args:
+        user: authenticated User
+        product_ids: iterable of Product IDs
+        cart: the user's active Cart
+
+    Returns:
+        list: IDs of the products moved
+    """
+    with transaction.atomic():
+        quantities = dict(
+            Wishlist.objects.filter(user=user, product_id__in=set(product_ids))
+            .values_list('product_id', 'quantity')
+        )
+        moved = bulk_add_to_cart(cart, quantities) if quantities else []
+        if moved:
+            remove_products(user, moved)
+
+    logger.info(f"Moved {len(moved)} of {len(quantities)} wishlist items to cart {cart.pk} for user {user.pk}")
+    return moved
+
+
+def release_deleted_product(product_id):
+    """
+    Decrement the count of every user whose wishlist holds a product that is
+    being deleted; the cascade that removes the items bypasses this module.
+
+    Call inside the transaction that deletes the product.
+
+    Returns:
+        int: number of profiles adjusted
+    """
+    # A product is on each wishlist at most once
+    user_ids = list(
+        Wishlist.objects.filter(product_id=product_id, user__isnull=False).values_list('user_id', flat=True)
+    )
+    if not user_ids:
+        return 0
+    Profile.objects.filter(user_id__in=user_ids).update(
+        wishlist_count=Greatest(F('wishlist_count') - 1, Value(0))
+    )
+    transaction.on_commit(lambda: cache.delete_many([_count_key(user_id) for user_id in user_ids]))
+    return len(user_ids)
+
+
+def rebuild_wishlist_counts():
+    """
+    Recompute every profile's wishlist count from the wishlist items.
+
+    Returns:
+        int: number of profiles whose count changed
+    """
+    with transaction.atomic():
+        counts = dict(
+            Wishlist.objects.filter(user__isnull=False).values('user').annotate(n=Count('id'))
+            .order_by().values_list('user', 'n')
+        )
+        changed = []
+        for profile in Profile.objects.select_for_update().only('id', 'user', 'wishlist_count'):
+            count = counts.get(profile.user_id, 0)
+            if profile.wishlist_count != count:
+                profile.wishlist_count = count
+                changed.append(profile)
+        Profile.objects.bulk_update(changed, ['wishlist_count'], batch_size=500)
+
+    cache.delete_many([_count_key(profile.user_id) for profile in changed])
+    logger.info(f"Rebuilt wishlist counts: {len(changed)} profiles changed")
+    return len(changed)
@@ -0,0 +1,86 @@
+"""
+Database-backed work queues with leases and retries.
+
+The email outbox (``store.email_utils``) and the Razorpay webhook inbox
+(``payment.webhooks``) are tables of work items with ``status``,
+``attempts``, ``last_error`` and ``next_attempt_at`` columns and a nested
+``Status`` with PENDING and FAILED values. Workers claim due rows with
+``claim_due()``, which locks them with SKIP LOCKED and leases them by moving
+``next_attempt_at`` forward, so a crashed worker's rows become due again
+once the lease runs out. ``record_failure()`` schedules a retry with
+exponential backoff, or gives up after the maximum number of attempts.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def get_retry_delay(attempts, base, cap):
+    """
+    Return the backoff before retry number ``attempts`` (1-based).
+
+    Exponential from ``base`` seconds, capped at ``cap`` seconds, with up to
+    10% jitter so failed batches don't retry in lockstep.
+    """
+    delay = min(cap, base * (2 ** (attempts - 1)))
+    return timedelta(seconds=delay * (1 + random.random() * 0.1))
+
+
+def claim_due(queryset, claimed_status, lease, batch_size):
+    """
+    Claim a batch of due rows for this worker.
+
+    Args:
+        queryset: the queue's rows, optionally with select_related()
+        claimed_status: status marking a row as taken; rows in it whose
+            lease expired are claimed again
+        lease: seconds a claim lasts
+        batch_size: maximum number of rows claimed
+
+    Returns:
+        list: the claimed rows, oldest due first
+    """
+    model = queryset.model
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update(skip_locked=True).filter(
+                status__in=[model.Status.PENDING, claimed_status],
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        if rows:
+            model.objects.filter(pk__in=[row.pk for row in rows]).update(
+                status=claimed_status,
+                next_attempt_at=now + timedelta(seconds=lease)
+            )
+    return rows
+
+
+def record_failure(row, error, max_attempts, retry_delay, label):
+    """
+    Count a failed attempt and schedule the retry, or mark the row failed.
+
+    Args:
+        row: the claimed row
+        error: error message stored in ``last_error``
+        max_attempts: attempts before the row is marked failed
+        retry_delay: callable returning the backoff for an attempt number
+        label: how the row is named in log messages
+    """
+    status = type(row).Status
+    row.attempts += 1
+    row.last_error = error
+    if row.attempts >= max_attempts:
+        row.status = status.FAILED
+        logger.error(f"Giving up on {label} after {row.attempts} attempts: {error}")
+    else:
+        row.status = status.PENDING
+        row.next_attempt_at = timezone.now() + retry_delay(row.attempts)
+        logger.warning(f"{label} failed (attempt {row.attempts}), retrying at {row.next_attempt_at}: {error}")
+    row.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])